@@ -1,7 +1,9 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from modules.card import Suit, CardNumber, Card
-from modules.calculator import calc_odds
+from modules.calculator import iter_odds
+from modules.engine import CalculationEngine
+from modules.result_cache import ResultCache
 from modules.utils import check_validity, get_results_str
 import multiprocessing as mp
 import time
@@ -19,6 +21,11 @@ class PokerCalculatorGUI:
         self.players_cards = []
         self.table_cards = []
         self.progress_var = tk.DoubleVar(value=0)
+        # Warm worker pool, created on the first calculation and reused by all later ones
+        self.engine = None
+        # Spots calculated before (also with other suits / player order) are shown instantly
+        self.cache = ResultCache()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
         self.create_frames()
         
@@ -235,9 +242,9 @@ class PokerCalculatorGUI:
         
         return all_player_cards, table_cards
     
-    def display_results(self, all_player_cards, total_win_percentages, total_tie_percentages, total_player_wins, total_player_ties):
+    def display_results(self, all_player_cards, total_win_percentages, total_tie_percentages, total_player_wins, total_player_ties, total_equities):
         self.results_text.delete(1.0, tk.END)
-        result = get_results_str(all_player_cards, total_win_percentages, total_tie_percentages, total_player_wins, total_player_ties)
+        result = get_results_str(all_player_cards, total_win_percentages, total_tie_percentages, total_player_wins, total_player_ties, total_equities)
         self.results_text.insert(tk.END, result)
     
     def update_progress(self, current, total):
@@ -265,48 +272,14 @@ class PokerCalculatorGUI:
         try:
             
             check_validity(all_player_cards, table_cards)
-            # Moving average only needed for 0 table cards, otherwise its overhead outweighs the benefits
-            if len(table_cards) != 0:
-                division = 1
-            
-            # Initial calculation
-            current_amount = 1
-            prev_max_numerator = 0
-            numerators_to_check = [prev_max_numerator]
-            
-            total_win_percentages, total_tie_percentages, total_player_wins, total_player_ties = calc_odds(
-                all_player_cards, table_cards, division=division, numerators_to_check=numerators_to_check
-            )
-            
-            # Display initial results
-            self.root.after(0, lambda: self.display_results(
-                all_player_cards, total_win_percentages, total_tie_percentages, total_player_wins, total_player_ties
-            ))
-            self.root.after(0, lambda: self.update_progress(prev_max_numerator+1, division))
-            
-            # Iterative calculations for better accuracy
-            while prev_max_numerator < division - 1:
-                current_max_numerator = prev_max_numerator + current_amount
-                current_numerators_to_check = list(range(prev_max_numerator + 1, current_max_numerator + 1))
-                
-                win_percentages, tie_percentages, player_wins, player_ties = calc_odds(
-                    all_player_cards, table_cards, division=division, numerators_to_check=current_numerators_to_check
-                )
-                
-                for j in range(len(all_player_cards)):
-                    total_win_percentages[j] = (total_win_percentages[j] * (current_amount-1) + win_percentages[j] * current_amount) / (current_amount*2-1)
-                    total_tie_percentages[j] = (total_tie_percentages[j] * (current_amount-1) + tie_percentages[j] * current_amount) / (current_amount*2-1)
-                    total_player_wins[j] = total_player_wins[j] + player_wins[j]
-                    total_player_ties[j] = total_player_ties[j] + player_ties[j]
-                
-                prev_max_numerator = current_max_numerator
-                current_amount *= 2
-                
+            if self.engine is None:
+                self.engine = CalculationEngine()
+            # Progressive results, each snapshot holds everything counted so far
+            for snapshot in iter_odds(all_player_cards, table_cards, division=division, engine=self.engine, cache=self.cache):
                 # Update UI
-                self.root.after(0, lambda win=total_win_percentages, tie=total_tie_percentages, 
-                                        p_win=total_player_wins, p_tie=total_player_ties: 
-                                self.display_results(all_player_cards, win, tie, p_win, p_tie))
-                self.root.after(0, lambda curr=prev_max_numerator+1, tot=division: 
+                self.root.after(0, lambda snap=snapshot:
+                                self.display_results(all_player_cards, snap.win_percentages, snap.tie_percentages, snap.player_wins, snap.player_ties, snap.equities))
+                self.root.after(0, lambda curr=snapshot.numerators_done, tot=snapshot.division:
                                 self.update_progress(curr, tot))
             
             end_time = time.time()
@@ -317,6 +290,11 @@ class PokerCalculatorGUI:
             messagebox.showerror("Error", f"{e}")
             return None, None
 
+    def on_close(self):
+        if self.engine is not None:
+            self.engine.terminate()
+        self.root.destroy()
+
 def main():
     # This is required for multiprocessing to work correctly on Windows
     mp.freeze_support()
@@ -1,33 +1,44 @@
-from typing import List, Dict, Tuple
-from .card import Suit, CardNumber, Card
-import itertools
+from typing import List, Dict, Tuple, Iterable, Iterator
+from .card import Suit, CardNumber, Card, FULL_DECK_MASK, mask_to_ids, popcount
+from .combinatorics import unrank_combination, iter_combination_masks, get_index_ranges
 import random
 import math
-from typing import List, Tuple, Dict, Optional
+
+# Boards are card set masks (see card.py), dicts map board mask -> (board mask, count)
 
 def get_all_cards() -> List[Card]:
     return [Card(card_number, suit) for card_number in CardNumber for suit in Suit]
 
-def get_all_possible_table_cards(current_table_cards: List[Card], all_unused_cards: List[Card]) -> Dict[Tuple[Tuple[int, int], ...], Tuple[List[Card], int]]:
-    """ 
+def get_available_card_masks(current_table_mask: int, all_unused_mask: int) -> List[int]:
+    """
+    Single-card masks of all cards that can still come on the table, in card id order.
+    """
+    return [1 << card_id for card_id in mask_to_ids(all_unused_mask & ~current_table_mask)]
+
+def get_runout_cards(table_mask: int, dead_masks: Iterable[int] = ()) -> Tuple[List[int], int]:
+    """
+    (single-card masks that can still come, amount of table cards still to come) for runouts of table_mask,
+    with every card of table_mask and of the dead masks (e.g. the players' hands) excluded.
+    """
+    dead_mask = table_mask
+    for mask in dead_masks:
+        dead_mask |= mask
+    return get_available_card_masks(table_mask, FULL_DECK_MASK & ~dead_mask), 5 - popcount(table_mask)
+
+def get_all_possible_table_cards(current_table_mask: int, all_unused_mask: int) -> Dict[int, Tuple[int, int]]:
+    """
     Still very inefficient compared to itertools.combinations, but homemade = cooler
     """
-    remaining_cards = 5 - len(current_table_cards)
+    remaining_cards = 5 - popcount(current_table_mask)
 
     if remaining_cards <= 0:
-        sorted_cards = sorted(current_table_cards, key=lambda card: (card.number, card.suit))
-        key = tuple((card.number, card.suit) for card in sorted_cards)
-        return {key: (sorted_cards, 1)}
-
-    available_cards = [card for card in all_unused_cards if card not in current_table_cards]
-
-    current_possible_table_cards_dict: Dict[Tuple[Tuple[int, int], ...], Tuple[List[Card], int]] = {}
-    
-    # Create a copy to avoid modifying the original list
-    sorted_cards = sorted(current_table_cards, key=lambda card: (card.number, card.suit))
-    table_cards_key = tuple((card.number, card.suit) for card in sorted_cards)
-    current_possible_table_cards_dict[table_cards_key] = (sorted_cards.copy(), 1)
-    
+        return {current_table_mask: (current_table_mask, 1)}
+
+    available_cards = get_available_card_masks(current_table_mask, all_unused_mask)
+
+    # The board mask is already a standardized key, no sorting needed
+    current_possible_table_cards_dict: Dict[int, Tuple[int, int]] = {current_table_mask: (current_table_mask, 1)}
+
     last_possible_table_cards_dict = {}
 
     # Add to table cards one at a time
@@ -35,114 +46,90 @@ def get_all_possible_table_cards(current_table_cards: List[Card], all_unused_car
         print(f"{remaining_cards - i} cards remaining")
         last_possible_table_cards_dict = current_possible_table_cards_dict.copy()
         current_possible_table_cards_dict.clear()
-        
-        # Go over all unique last table cards
+
+        # Go over all unique last table cards
         for j, key in enumerate(last_possible_table_cards_dict.keys()):
-            cards_tuple = last_possible_table_cards_dict[key]
-            current_cards = cards_tuple[0]
-            count = cards_tuple[1]
-            
-            for unused_card in all_unused_cards:
+            current_cards, count = last_possible_table_cards_dict[key]
+
+            for unused_card in available_cards:
                 # Check if unused card is already used in current table cards
-                if unused_card not in current_cards:
+                if not current_cards & unused_card:
                     # Add card to table
-                    new_cards = current_cards.copy() + [unused_card]
-                    
-                    # Create standardized key for table cards using tuples (more efficient than strings)
-                    sorted_cards = sorted(new_cards, key=lambda card: (card.number, card.suit))
-                    new_key = tuple((card.number, card.suit) for card in sorted_cards)
-                    
-                    # Update dict -> add new unique table hand or inc existing
+                    new_key = current_cards | unused_card
+
+                    # Update dict -> add new unique table hand or inc existing
                     if new_key not in current_possible_table_cards_dict:
-                        current_possible_table_cards_dict[new_key] = (sorted_cards, count)
+                        current_possible_table_cards_dict[new_key] = (new_key, count)
                     else:
                         existing_tuple = current_possible_table_cards_dict[new_key]
-                        current_possible_table_cards_dict[new_key] = (existing_tuple[0], existing_tuple[1] + count)
-            
+                        current_possible_table_cards_dict[new_key] = (new_key, existing_tuple[1] + count)
+
             if j % 10000 == 0:
                 print(f"Processed {round((j+1) / len(last_possible_table_cards_dict) * 100, 2)}% of possible table cards from last step.")
 
     return current_possible_table_cards_dict
 
 def get_sampled_table_cards(
-    current_table_cards: List[Card],
-    all_unused_cards: List[Card],
+    current_table_mask: int,
+    all_unused_mask: int,
     sample_size: int = 100000
-) -> Dict[Tuple[Tuple[int, int], ...], Tuple[List[Card], int]]:
+) -> Dict[int, Tuple[int, int]]:
     """
     Samples a specific amount of random table combinations.
     """
 
-    remaining_cards = 5 - len(current_table_cards)
+    remaining_cards = 5 - popcount(current_table_mask)
 
     if remaining_cards <= 0:
-        sorted_cards = sorted(current_table_cards, key=lambda card: (card.number, card.suit))
-        key = tuple((card.number, card.suit) for card in sorted_cards)
-        return {key: (sorted_cards, 1)}
+        return {current_table_mask: (current_table_mask, 1)}
 
-    available_cards = [card for card in all_unused_cards if card not in current_table_cards]
+    available_cards = get_available_card_masks(current_table_mask, all_unused_mask)
 
     total_combinations = math.comb(len(available_cards), remaining_cards)
     actual_sample_size = min(sample_size, total_combinations)
 
-    # Generate random indices for sampling
+    # Generate random indices for sampling, and build each sampled table directly from its index
     chosen_indices = sorted(random.sample(range(total_combinations), actual_sample_size))
     sampled_combinations_dict = {}
 
-    # Initialize iterator and first target index
-    target_indices_iter = iter(chosen_indices)
-    next_target_index = next(target_indices_iter, None) # Get the first target index
+    for index in chosen_indices:
+        positions = unrank_combination(index, len(available_cards), remaining_cards)
+        key = current_table_mask | sum(available_cards[position] for position in positions)
+        sampled_combinations_dict[key] = (key, 1)
 
-    combinations_iterator = itertools.combinations(available_cards, remaining_cards)
-
-    for i, additional_cards_tuple in enumerate(combinations_iterator):
-        # Check if we reached next target index
-        if i == next_target_index:
-            full_table = current_table_cards + list(additional_cards_tuple)
+    return sampled_combinations_dict
 
-            # Use a tuple of (number, suit) pairs as key - more efficient than strings
-            sorted_cards = sorted(full_table, key=lambda card: (card.number, card.suit))
-            key = tuple((card.number, card.suit) for card in sorted_cards)
 
-            sampled_combinations_dict[key] = (sorted_cards, 1)
-            next_target_index = next(target_indices_iter, None)
+def iter_sampled_table_cards_by_division(
+    current_table_mask: int,
+    all_unused_mask: int,
+    division: int,
+    numerators_to_check: List[int]
+) -> Iterator[int]:
+    """
+    Lazily yields the table masks get_sampled_table_cards_by_division would return, in combination index order.
+    """
+    remaining_cards = 5 - popcount(current_table_mask)
 
-            # Stop if all samples collected
-            if next_target_index is None:
-                break
+    if remaining_cards <= 0:
+        yield current_table_mask
+        return
 
-    return sampled_combinations_dict
+    available_cards = get_available_card_masks(current_table_mask, all_unused_mask)
 
+    # Only generate the combinations at the target indices
+    total_combinations = math.comb(len(available_cards), remaining_cards)
+    for start, end in get_index_ranges(total_combinations, division, numerators_to_check):
+        for additional_cards_mask in iter_combination_masks(available_cards, remaining_cards, start, end):
+            yield current_table_mask | additional_cards_mask
 
 def get_sampled_table_cards_by_division(
-    current_table_cards: List[Card],
-    all_unused_cards: List[Card],
+    current_table_mask: int,
+    all_unused_mask: int,
     division: int,
-    numerators_to_check: List[int],
-    previously_sampled_indices: Optional[set] = set()
-) -> Dict[Tuple[Tuple[int, int], ...], Tuple[List[Card], int]]:
+    numerators_to_check: List[int]
+) -> Dict[int, Tuple[int, int]]:
     """
     Samples table combinations at specific fractional intervals.
-    """    
-    remaining_cards = 5 - len(current_table_cards)
-    result_dict = {}
-
-    if remaining_cards <= 0:
-        sorted_cards = sorted(current_table_cards, key=lambda card: (card.number, card.suit))
-        key = tuple((card.number, card.suit) for card in sorted_cards)
-        return {key: (sorted_cards, 1)}
-
-    available_cards = [card for card in all_unused_cards if card not in current_table_cards]
-    
-    # Get the combination at the target index
-    for i, additional_cards_tuple in enumerate(itertools.combinations(available_cards, remaining_cards)):
-        if i % division in numerators_to_check:
-            # Create the full table and sort the cards
-            full_table = current_table_cards + list(additional_cards_tuple)
-            sorted_cards = sorted(full_table, key=lambda card: (card.number, card.suit))
-            key = tuple((card.number, card.suit) for card in sorted_cards)
-            
-            # Add to the result dictionary
-            result_dict[key] = (sorted_cards, 1)
-    
-    return result_dict
\ No newline at end of file
+    """
+    return {key: (key, 1) for key in iter_sampled_table_cards_by_division(current_table_mask, all_unused_mask, division, numerators_to_check)}
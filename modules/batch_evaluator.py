@@ -0,0 +1,133 @@
+"""
+Vectorised NumPy evaluator for many boards x players at once (numpy is optional, only this module needs it).
+
+Same tables as evaluator.py, applied to whole arrays: every (board, player) hand becomes 4 suit rank masks,
+the flush table is looked up per suit, the base-5 rank keys are summed over the suits and looked up in the
+rank-pattern table (sorted keys + searchsorted), and winners / ties come from a max / equality over the players.
+"""
+from typing import List, Sequence, Tuple
+from .card import SUIT_BITS
+from .evaluator import get_lookup_tables
+from .all_cards import get_runout_cards
+from .combinatorics import iter_combination_masks
+from .utils import TIE_SHARE_UNIT
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SUIT_MASK = (1 << SUIT_BITS) - 1
+# Boards evaluated per array operation, bounds the temporary arrays to a few MB per player
+BOARD_CHUNK_SIZE = 65536
+
+_tables = None
+
+
+def require_numpy():
+    if np is None:
+        raise ImportError("The numpy evaluator needs numpy, install it with 'pip install numpy'")
+
+def _get_tables():
+    global _tables
+    if _tables is None:
+        require_numpy()
+        rank_keys, flush_table, rank_table = get_lookup_tables()
+        sorted_keys = np.array(sorted(rank_table), dtype=np.int64)
+        sorted_strengths = np.array([rank_table[key] for key in sorted_keys.tolist()], dtype=np.int64)
+        _tables = (np.array(rank_keys, dtype=np.int64), np.array(flush_table, dtype=np.int64), sorted_keys, sorted_strengths)
+    return _tables
+
+def _strengths_from_suit_masks(suit_masks):
+    """Strengths for an array of hands given as (..., 4) suit rank masks."""
+    rank_keys, flush_table, sorted_keys, sorted_strengths = _get_tables()
+    flush_strengths = flush_table[suit_masks].max(axis=-1)
+    keys = rank_keys[suit_masks].sum(axis=-1)
+    rank_strengths = sorted_strengths[np.searchsorted(sorted_keys, keys)]
+    return np.where(flush_strengths > 0, flush_strengths, rank_strengths)
+
+def card_ids_to_suit_masks(card_ids):
+    """(..., k) array of card ids 0-51 -> (..., 4) suit rank masks."""
+    require_numpy()
+    card_ids = np.asarray(card_ids, dtype=np.int64)
+    suits = card_ids // SUIT_BITS
+    bits = np.left_shift(1, card_ids % SUIT_BITS)
+    # Cards are distinct, so summing the bits per suit is the same as or-ing them
+    return np.stack([np.where(suits == suit, bits, 0).sum(axis=-1) for suit in range(4)], axis=-1)
+
+def masks_to_suit_masks(masks):
+    """Array of card set masks -> (..., 4) suit rank masks."""
+    require_numpy()
+    masks = np.asarray(masks, dtype=np.int64)
+    return np.stack([(masks >> (suit * SUIT_BITS)) & SUIT_MASK for suit in range(4)], axis=-1)
+
+
+def evaluate_boards(board_card_ids, hole_card_ids):
+    """
+    Strengths of every (board, player) pair, shape (boards, players).
+    board_card_ids: (boards, 5) card ids, hole_card_ids: (players, 2) card ids.
+    """
+    board_suit_masks = card_ids_to_suit_masks(board_card_ids)
+    player_suit_masks = card_ids_to_suit_masks(hole_card_ids)
+    return _strengths_from_suit_masks(board_suit_masks[:, None, :] | player_suit_masks[None, :, :])
+
+def evaluate_board_masks(board_masks, all_player_masks: Sequence[int]):
+    """Same as evaluate_boards, for board masks and player hole card masks."""
+    board_suit_masks = masks_to_suit_masks(board_masks)
+    player_suit_masks = masks_to_suit_masks(list(all_player_masks))
+    return _strengths_from_suit_masks(board_suit_masks[:, None, :] | player_suit_masks[None, :, :])
+
+def count_results(strengths, card_amounts=None) -> Tuple[List[int], List[int], List[int], int]:
+    """
+    Win / tie counts and tie shares per player from a (boards, players) strength array, boards weighted by card_amounts.
+    """
+    require_numpy()
+    if card_amounts is None:
+        card_amounts = np.ones(strengths.shape[0], dtype=np.int64)
+    card_amounts = np.asarray(card_amounts, dtype=np.int64)
+    is_best = strengths == strengths.max(axis=1, keepdims=True)
+    best_amounts = is_best.sum(axis=1)
+    is_single_winner = best_amounts == 1
+    wins = (is_best & is_single_winner[:, None]).T @ card_amounts
+    ties = (is_best & ~is_single_winner[:, None]).T @ card_amounts
+    tie_shares = (is_best & ~is_single_winner[:, None]).T @ (card_amounts * (TIE_SHARE_UNIT // best_amounts))
+    return wins.tolist(), ties.tolist(), tie_shares.tolist(), int(card_amounts.sum())
+
+def count_board_masks(board_masks, all_player_masks: Sequence[int], card_amounts=None) -> Tuple[List[int], List[int], List[int], int]:
+    """Win / tie counts and tie shares per player over an array of board masks, evaluated BOARD_CHUNK_SIZE boards at a time."""
+    require_numpy()
+    total_wins = [0] * len(all_player_masks)
+    total_ties = [0] * len(all_player_masks)
+    total_tie_shares = [0] * len(all_player_masks)
+    total_card_amount = 0
+    for start in range(0, len(board_masks), BOARD_CHUNK_SIZE):
+        strengths = evaluate_board_masks(board_masks[start:start + BOARD_CHUNK_SIZE], all_player_masks)
+        chunk_amounts = None if card_amounts is None else card_amounts[start:start + BOARD_CHUNK_SIZE]
+        wins, ties, tie_shares, card_amount = count_results(strengths, chunk_amounts)
+        total_wins = [total + win for total, win in zip(total_wins, wins)]
+        total_ties = [total + tie for total, tie in zip(total_ties, ties)]
+        total_tie_shares = [total + tie_share for total, tie_share in zip(total_tie_shares, tie_shares)]
+        total_card_amount += card_amount
+    return total_wins, total_ties, total_tie_shares, total_card_amount
+
+
+def process_job_batch_numpy(job_context, batch_items):
+    """process_job_batch with the numpy evaluator, all boards of the batch are evaluated at once."""
+    all_player_masks, table_mask = job_context
+    if not batch_items:
+        return [0] * len(all_player_masks), [0] * len(all_player_masks), [0] * len(all_player_masks), 0
+    board_masks, card_amounts = zip(*batch_items)
+    return count_board_masks(np.array(board_masks, dtype=np.int64), all_player_masks, np.array(card_amounts, dtype=np.int64))
+
+def process_job_index_ranges_numpy(job_context, index_ranges):
+    """process_job_index_ranges with the numpy evaluator."""
+    all_player_masks, table_mask = job_context
+    available_cards, remaining_cards = get_runout_cards(table_mask, all_player_masks)
+
+    board_amount = sum(end - start for start, end in index_ranges)
+    board_masks = np.fromiter(
+        (table_mask | additional_cards_mask for start, end in index_ranges
+         for additional_cards_mask in iter_combination_masks(available_cards, remaining_cards, start, end)),
+        dtype=np.int64, count=board_amount
+    )
+    return count_board_masks(board_masks, all_player_masks)
@@ -0,0 +1,282 @@
+"""
+Batch runner: reads scenarios as JSON lines and writes one JSON result line per scenario as soon as it finishes.
+
+One warm engine serves the whole batch. Small scenarios (rivers, turns, coarse Monte Carlo) are grouped into tasks of
+several scenarios and each task runs whole on one worker, so thousands of them don't each pay for a separate job.
+Tasks are pulled by free workers, which balances uneven scenarios. Large scenarios are kept back and run one at a time
+after the small ones, each spread over the entire pool like a normal calc_odds call.
+
+Scenario line:
+  {"id": "spot-1", "players": ["AhKh", "QsQd"], "board": "2h9hTs", "mode": "exact"}
+  {"id": "spot-2", "players": ["AhKh", "QsQd", "7c8c"], "board": "", "mode": "monte_carlo", "precision": 0.1, "seed": 1}
+mode is "exact" (default) or "monte_carlo", precision is the Monte Carlo confidence interval half-width in percentage points.
+max_samples and time_budget are passed on to monte_carlo_odds. id defaults to the line number.
+Result lines hold the id, win / tie percentages, equities and counts, or an "error" message for invalid or failed scenarios.
+
+Usage: python -m modules.batch_runner [scenarios.jsonl] [--output results.jsonl] [--processes N]
+Reads stdin / writes stdout without the file arguments. Progress output goes to stderr.
+"""
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+import argparse
+import contextlib
+import io
+import json
+import math
+import sys
+import time
+from .card import Card, cards_from_str, cards_to_mask, popcount
+from .calculator import calc_counts
+from .monte_carlo import monte_carlo_odds
+from .engine import CalculationEngine, SerialEngine
+from .planner import SERIAL, SERIAL_MAX_EVALUATIONS
+from .utils import check_validity, get_equities
+
+EXACT = "exact"
+MONTE_CARLO = "monte_carlo"
+MODES = (EXACT, MONTE_CARLO)
+DEFAULT_PRECISION = 0.1
+
+# Scenarios up to this many evaluations (boards x players) run whole on one worker
+SMALL_SCENARIO_EVALUATIONS = SERIAL_MAX_EVALUATIONS
+# Small scenarios are grouped into tasks of about this many evaluations, at most MAX_TASK_SCENARIOS scenarios each
+TASK_EVALUATIONS = 20_000
+MAX_TASK_SCENARIOS = 256
+# Job context of the small scenario tasks, they carry everything they need themselves
+BATCH_JOB_CONTEXT = ("batch_runner",)
+
+
+class Scenario:
+    def __init__(self, scenario_id: Any, all_player_cards, table_cards, mode: str = EXACT, precision: Optional[float] = DEFAULT_PRECISION,
+                 max_samples: Optional[int] = 10_000_000, time_budget: Optional[float] = None, seed: Optional[int] = None):
+        self.id = scenario_id
+        self.all_player_cards = all_player_cards
+        self.table_cards = table_cards
+        self.mode = mode
+        self.precision = precision
+        self.max_samples = max_samples
+        self.time_budget = time_budget
+        self.seed = seed
+
+    def estimate_evaluations(self) -> int:
+        """Rough job size, the same measure the execution planner uses."""
+        player_amount = len(self.all_player_cards)
+        if self.mode == MONTE_CARLO:
+            if len(self.table_cards) == 5:
+                return player_amount
+            samples = self.max_samples or 10_000_000
+            if self.precision is not None:
+                # Worst case equity variance of 0.25 at 95% confidence
+                samples = min(samples, math.ceil((1.96 * 0.5 * 100 / self.precision) ** 2))
+            return samples * player_amount
+        used_amount = popcount(cards_to_mask(self.table_cards) | cards_to_mask(card for player_cards in self.all_player_cards for card in player_cards))
+        return math.comb(52 - used_amount, 5 - len(self.table_cards)) * player_amount
+
+
+def _parse_cards(value: Any, field: str) -> List[Card]:
+    """Cards from "AhKd" or ["Ah", "Kd"]."""
+    if isinstance(value, str):
+        return cards_from_str(value)
+    if isinstance(value, list) and all(isinstance(text, str) for text in value):
+        return [card for text in value for card in cards_from_str(text)]
+    raise ValueError(f"\"{field}\" must be a card string like \"AhKd\" or a list of card strings")
+
+def _get_optional_number(data: Dict[str, Any], field: str, default: Any, integer: bool = False, positive: bool = True) -> Any:
+    value = data.get(field, default)
+    if value is None:
+        return None
+    # bool is an int subclass, but true / false are no numbers here
+    if isinstance(value, bool) or not isinstance(value, int if integer else (int, float)) or not math.isfinite(value) or (positive and value <= 0):
+        kind = "integer" if integer else "number"
+        raise ValueError(f"\"{field}\" must be {'a positive ' if positive else 'an ' if integer else 'a '}{kind} or null")
+    return value
+
+def parse_scenario(line: str, line_number: int) -> Scenario:
+    """Scenario from one JSON line, raises ValueError for anything invalid."""
+    try:
+        data = json.loads(line)
+    except json.JSONDecodeError as error:
+        raise ValueError(f"Invalid JSON: {error}")
+    if not isinstance(data, dict):
+        raise ValueError("A scenario must be a JSON object")
+    if "players" not in data:
+        raise ValueError("A scenario needs \"players\"")
+    if not isinstance(data["players"], list):
+        raise ValueError("\"players\" must be a list with the cards of every player")
+    all_player_cards = [_parse_cards(player, f"players[{j}]") for j, player in enumerate(data["players"])]
+    table_cards = _parse_cards(data.get("board", ""), "board")
+    if len(all_player_cards) < 2:
+        raise ValueError("A scenario needs at least 2 players")
+    check_validity(all_player_cards, table_cards)
+
+    mode = data.get("mode", EXACT)
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode {mode}, expected one of {MODES}")
+    return Scenario(
+        data.get("id", line_number), all_player_cards, table_cards, mode=mode,
+        precision=_get_optional_number(data, "precision", DEFAULT_PRECISION),
+        max_samples=_get_optional_number(data, "max_samples", 10_000_000, integer=True),
+        time_budget=_get_optional_number(data, "time_budget", None),
+        seed=_get_optional_number(data, "seed", None, integer=True, positive=False)
+    )
+
+def get_exact_result(scenario: Scenario, counts: Tuple[List[int], List[int], List[int], int], elapsed: float) -> Dict[str, Any]:
+    """Result dict of an exact scenario from its calc_counts counters."""
+    player_wins, player_ties, player_tie_shares, total = counts
+    win_percentages = [win / total * 100 for win in player_wins]
+    tie_percentages = [tie / total * 100 for tie in player_ties]
+    return {
+        "id": scenario.id,
+        "mode": EXACT,
+        "win_percentages": win_percentages,
+        "tie_percentages": tie_percentages,
+        "equities": get_equities(player_wins, player_tie_shares, total),
+        "player_wins": player_wins,
+        "player_ties": player_ties,
+        "player_tie_shares": player_tie_shares,
+        "total": total,
+        "elapsed": elapsed,
+    }
+
+def run_scenario(scenario: Scenario, engine=None, backend: Optional[str] = None) -> Dict[str, Any]:
+    """Result dict of one scenario (the calculators' progress output is discarded)."""
+    start_time = time.time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if scenario.mode == EXACT:
+            counts = calc_counts(scenario.all_player_cards, scenario.table_cards, 1, [0], engine=engine, backend=backend, sharded=True)
+            return get_exact_result(scenario, counts, time.time() - start_time)
+        else:
+            monte_carlo_result = monte_carlo_odds(
+                scenario.all_player_cards, scenario.table_cards, target_precision=scenario.precision, time_budget=scenario.time_budget,
+                max_samples=scenario.max_samples, seed=scenario.seed, engine=engine, backend=backend
+            )
+            result = {
+                "win_percentages": monte_carlo_result.win_percentages,
+                "tie_percentages": monte_carlo_result.tie_percentages,
+                "equities": monte_carlo_result.equities,
+                "standard_errors": monte_carlo_result.standard_errors,
+                "player_wins": monte_carlo_result.player_wins,
+                "player_ties": monte_carlo_result.player_ties,
+                "samples": monte_carlo_result.samples,
+                "stop_reason": monte_carlo_result.stop_reason,
+                "seed": monte_carlo_result.seed,
+            }
+    return {"id": scenario.id, "mode": scenario.mode, **result, "elapsed": time.time() - start_time}
+
+def get_error_result(scenario_id: Any, error: Exception) -> Dict[str, Any]:
+    """Result dict of a scenario that failed, invalid input (ValueError) or an unexpected error."""
+    return {"id": scenario_id, "error": str(error) if isinstance(error, ValueError) else f"{type(error).__name__}: {error}"}
+
+def run_scenario_safely(scenario: Scenario, engine=None, backend: Optional[str] = None) -> Dict[str, Any]:
+    """run_scenario, returning an error result instead of raising, so one scenario can't stop the others."""
+    try:
+        return run_scenario(scenario, engine=engine, backend=backend)
+    except Exception as error:
+        return get_error_result(scenario.id, error)
+
+def process_job_scenarios(job_context, scenarios: List[Scenario]) -> List[Dict[str, Any]]:
+    """Worker task: runs a group of small scenarios one after another in the worker itself."""
+    return [run_scenario_safely(scenario, backend=SERIAL) for scenario in scenarios]
+
+
+def _iter_small_tasks(lines: Iterable[str], large_scenarios: List[Scenario], errors: List[Dict[str, Any]]) -> Iterator[List[Scenario]]:
+    """
+    Groups the small scenarios into tasks while reading, large ones are appended to large_scenarios
+    and invalid ones to errors, to be written by the caller.
+    """
+    task: List[Scenario] = []
+    task_evaluations = 0
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            scenario = parse_scenario(line, line_number)
+        except ValueError as error:
+            errors.append(get_error_result(line_number, error))
+            continue
+        evaluations = scenario.estimate_evaluations()
+        if evaluations > SMALL_SCENARIO_EVALUATIONS:
+            large_scenarios.append(scenario)
+            continue
+        task.append(scenario)
+        task_evaluations += evaluations
+        if task_evaluations >= TASK_EVALUATIONS or len(task) >= MAX_TASK_SCENARIOS:
+            yield task
+            task = []
+            task_evaluations = 0
+    if task:
+        yield task
+
+def run_batch(lines: Iterable[str], output: TextIO, engine=None) -> Tuple[int, int]:
+    """
+    Runs every scenario of lines and writes each result as a JSON line to output as it finishes.
+    Returns (results, errors).
+    """
+    owns_engine = engine is None
+    if engine is None:
+        engine = CalculationEngine()
+
+    result_amount = 0
+    error_amount = 0
+    errors: List[Dict[str, Any]] = []
+    large_scenarios: List[Scenario] = []
+
+    def write(result: Dict[str, Any]):
+        output.write(json.dumps(result) + "\n")
+        output.flush()
+
+    def write_errors():
+        nonlocal error_amount
+        while errors:
+            write(errors.pop(0))
+            error_amount += 1
+
+    try:
+        for results in engine.imap_unordered(process_job_scenarios, BATCH_JOB_CONTEXT, _iter_small_tasks(lines, large_scenarios, errors)):
+            write_errors()
+            for result in results:
+                write(result)
+                if "error" in result:
+                    error_amount += 1
+                else:
+                    result_amount += 1
+        write_errors()
+
+        for scenario in large_scenarios:
+            result = run_scenario_safely(scenario, engine=engine)
+            write(result)
+            if "error" in result:
+                error_amount += 1
+            else:
+                result_amount += 1
+    finally:
+        if owns_engine:
+            engine.close()
+    return result_amount, error_amount
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Run equity scenarios from a JSONL file (or stdin), one JSON result line per scenario")
+    parser.add_argument("input", nargs="?", help="Scenario JSONL file, stdin if left out")
+    parser.add_argument("--output", help="Result JSONL file, stdout if left out")
+    parser.add_argument("--processes", type=int, help="Worker processes, 0 runs everything in this process")
+    args = parser.parse_args(args)
+
+    start_time = time.time()
+    input_file = open(args.input) if args.input else sys.stdin
+    output_file = open(args.output, "w") if args.output else sys.stdout
+    engine = SerialEngine() if args.processes == 0 else CalculationEngine(args.processes)
+    try:
+        # Only result lines go to the output, anything else printed goes to stderr
+        with contextlib.redirect_stdout(sys.stderr):
+            result_amount, error_amount = run_batch(input_file, output_file, engine)
+    finally:
+        engine.close()
+        if args.input:
+            input_file.close()
+        if args.output:
+            output_file.close()
+    print(f"{result_amount} scenarios done, {error_amount} failed, in {round(time.time() - start_time, 2)}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
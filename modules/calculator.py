@@ -1,142 +1,472 @@
-from typing import List, Tuple, Callable, Optional
-from modules.card import Card
-from modules.hand import Hand, HandValue
-from modules.all_cards import get_all_cards, get_sampled_table_cards, get_sampled_table_cards_by_division
+from collections import Counter, defaultdict
+from typing import List, Tuple, AsyncIterator, Dict, Iterable, Iterator, Optional
+from .card import Card, FULL_DECK_MASK, card_from_id, cards_to_mask, mask_to_cards, mask_to_ids, popcount
+from .hand import Board, Hand
+from .evaluator import evaluate_players, get_rank_key
+from .all_cards import get_available_card_masks, get_runout_cards, get_sampled_table_cards_by_division, iter_sampled_table_cards_by_division
+from .combinatorics import count_indices, get_index_ranges, iter_combination_masks, split_index_ranges
+from .isomorphism import get_suit_blocks, get_symmetry_count, get_canonical_table_cards_by_division, iter_canonical_table_cards_by_division
+from .engine import CalculationEngine, engine_for_plan
+from .planner import plan_execution
+from .preflop_tables import lookup_preflop_counts
+from .checkpoint import CountsCheckpoint, DEFAULT_CHECKPOINT_INTERVAL
+from .result_cache import ResultCache
+from .session import count_winners, iter_runout_winners
+from .utils import get_equities, get_tie_share
+from .batch_evaluator import process_job_batch_numpy, process_job_index_ranges_numpy, require_numpy
+import asyncio
+import math
 import time
-import multiprocessing as mp
-from multiprocessing import Pool
-from functools import partial
-
-def compare_hands(all_player_hands: List[Hand]) -> List[Hand]:
-    winners = []
-    highest_win = HandValue(-1, -1, -1, [])
-
-    # Check for highest hand value
-    for i, hand in enumerate(all_player_hands):
-        value = hand._check_sf_flush_and_straight(highest_win_type = highest_win.type_value)
-        if value is not None:
-            if value > highest_win:
-                highest_win = value
-                winners = [i]
-            elif value == highest_win:
-                winners.append(i)
-
-    if winners != []:
-        return winners
-
-    # Check for highest hand value
-    for i, hand in enumerate(all_player_hands):
-        hand._initialize_rank_based_lookup()
-        value = hand._check_rank_based_hands(highest_win_type = highest_win.type_value)
-        if value is not None:
-            if value > highest_win:
-                highest_win = value
-                winners = [i]
-            elif value == highest_win:
-                winners.append(i)
-
-    if winners != []:
-        return winners
-    
-    # Check for highest hand value
-    for i, hand in enumerate(all_player_hands):
-        value = hand._check_high_card()
-        if value is not None:
-            if value > highest_win:
-                highest_win = value
-                winners = [i]
-            elif value == highest_win:
-                winners.append(i)
-
-    if winners != []:
-        return winners
-
-def get_table_results(table_cards, card_amount, all_player_cards):
-    all_player_hands = []
-        
-    player_wins = [0] * len(all_player_cards)
-    player_ties = [0] * len(all_player_cards)
-
-    # hand = combination of player cards and table cards
-    for player_cards in all_player_cards:
-        all_cards = player_cards + table_cards
-        current_player_hand = Hand(all_cards)
-        all_player_hands.append(current_player_hand)
-
-    # Find winner, if multiple -> increase their tie amount
-    best_hand_players = compare_hands(all_player_hands)
+
+LOOKUP_EVALUATOR = "lookup"
+NUMPY_EVALUATOR = "numpy"
+EVALUATORS = (LOOKUP_EVALUATOR, NUMPY_EVALUATOR)
+
+def compare_hands(all_player_hands: List[Hand]) -> List[int]:
+    """
+    Indices of the players with the best hand. Build the hands of one board with Hand.from_board,
+    so the board's structures are shared instead of rebuilt for every player.
+    """
+    # One HandValue per player, compared by its packed int in a single max / equality scan
+    return compare_hand_strengths([hand.check_hand_value().packed for hand in all_player_hands])
+
+def compare_hand_strengths(all_player_strengths: List[int]) -> List[int]:
+    """Indices of the players with the highest strength, for packed HandValues or lookup-table evaluator strengths."""
+    highest_strength = max(all_player_strengths)
+    return [i for i, strength in enumerate(all_player_strengths) if strength == highest_strength]
+
+def get_table_results(table_mask, card_amount, all_player_masks, use_lookup_evaluator=True, all_player_rank_keys=None):
+    player_wins = [0] * len(all_player_masks)
+    player_ties = [0] * len(all_player_masks)
+    player_tie_shares = [0] * len(all_player_masks)
+
+    # hand = combination of player cards and table cards, the table part is prepared once and shared by all players
+    if use_lookup_evaluator:
+        if all_player_rank_keys is None:
+            all_player_rank_keys = [get_rank_key(player_mask) for player_mask in all_player_masks]
+        all_player_strengths = evaluate_players(table_mask, all_player_masks, all_player_rank_keys)
+        best_hand_players = compare_hand_strengths(all_player_strengths)
+    else:
+        # Reference implementation, builds a full Hand per player on top of the shared Board
+        board = Board(mask_to_cards(table_mask))
+        all_player_hands = [Hand.from_board(board, mask_to_cards(player_mask)) for player_mask in all_player_masks]
+        best_hand_players = compare_hands(all_player_hands)
+
+    # Find winner, if multiple -> increase their tie amount and their share of the split pot
     if len(best_hand_players) == 1:
         player_wins[best_hand_players[0]] += card_amount
     else:
+        tie_share = get_tie_share(len(best_hand_players)) * card_amount
         for player_idx in best_hand_players:
             player_ties[player_idx] += card_amount
+            player_tie_shares[player_idx] += tie_share
 
-    return player_wins, player_ties
+    return player_wins, player_ties, player_tie_shares
     
 
-def process_batch(batch_items, all_player_cards):
-    """Process a batch of table card combinations and return win/tie counts."""
-    batch_wins = [0] * len(all_player_cards)
-    batch_ties = [0] * len(all_player_cards)
+def process_batch(batch_items, all_player_masks, use_lookup_evaluator=True):
+    """Process a batch of table card masks and return win/tie counts and tie shares."""
+    batch_wins = [0] * len(all_player_masks)
+    batch_ties = [0] * len(all_player_masks)
+    batch_tie_shares = [0] * len(all_player_masks)
     batch_card_amount = 0
+    all_player_rank_keys = [get_rank_key(player_mask) for player_mask in all_player_masks]
     
-    for table_cards, card_amount in batch_items:
-        player_wins, player_ties = get_table_results(table_cards, card_amount, all_player_cards)
+    for table_mask, card_amount in batch_items:
+        player_wins, player_ties, player_tie_shares = get_table_results(table_mask, card_amount, all_player_masks, use_lookup_evaluator, all_player_rank_keys)
         batch_wins = [total + player for total, player in zip(batch_wins, player_wins)]
         batch_ties = [total + player for total, player in zip(batch_ties, player_ties)]
+        batch_tie_shares = [total + player for total, player in zip(batch_tie_shares, player_tie_shares)]
         batch_card_amount += card_amount
-    return batch_wins, batch_ties, batch_card_amount
+    return batch_wins, batch_ties, batch_tie_shares, batch_card_amount
+
+def process_job_batch(job_context, batch_items):
+    """process_batch for engine tasks, the player masks come from the job context the workers already hold."""
+    all_player_masks, table_mask = job_context
+    return process_batch(batch_items, all_player_masks)
+
+def process_job_index_ranges(job_context, index_ranges):
+    """
+    Shared-nothing worker task: generates its own boards for the index ranges of the combination space
+    (same order as get_sampled_table_cards_by_division) and only returns the win/tie counters.
+    """
+    all_player_masks, table_mask = job_context
+    available_cards, remaining_cards = get_runout_cards(table_mask, all_player_masks)
+    all_player_rank_keys = [get_rank_key(player_mask) for player_mask in all_player_masks]
+
+    batch_wins = [0] * len(all_player_masks)
+    batch_ties = [0] * len(all_player_masks)
+    batch_tie_shares = [0] * len(all_player_masks)
+    batch_card_amount = 0
+    for start, end in index_ranges:
+        for additional_cards_mask in iter_combination_masks(available_cards, remaining_cards, start, end):
+            all_player_strengths = evaluate_players(table_mask | additional_cards_mask, all_player_masks, all_player_rank_keys)
+            best_hand_players = compare_hand_strengths(all_player_strengths)
+            if len(best_hand_players) == 1:
+                batch_wins[best_hand_players[0]] += 1
+            else:
+                tie_share = get_tie_share(len(best_hand_players))
+                for player_idx in best_hand_players:
+                    batch_ties[player_idx] += 1
+                    batch_tie_shares[player_idx] += tie_share
+            batch_card_amount += 1
+    return batch_wins, batch_ties, batch_tie_shares, batch_card_amount
+
+def process_job_indexed_shard(job_context, task):
+    """Worker task for checkpointed runs: (shard index, index ranges, index ranges function) -> (shard index, counters)."""
+    shard_index, index_ranges, index_ranges_func = task
+    return shard_index, index_ranges_func(job_context, index_ranges)
+
+def iter_table_card_chunks(table_cards: Iterable[Tuple[int, int]], chunk_size: int) -> Iterator[List[Tuple[int, int]]]:
+    """
+    Lazily groups (table mask, count) pairs into chunks of up to chunk_size tables, adding up repeated tables within a chunk.
+    """
+    chunk: Dict[int, int] = {}
+    for table_mask, card_amount in table_cards:
+        chunk[table_mask] = chunk.get(table_mask, 0) + card_amount
+        if len(chunk) >= chunk_size:
+            yield list(chunk.items())
+            chunk = {}
+    if chunk:
+        yield list(chunk.items())
+
+def calc_counts(all_player_cards: List[List[Card]], table_cards: List[Card], division: int, numerators_to_check: List[int], use_suit_isomorphism: bool = True, engine: Optional[CalculationEngine] = None, streaming: bool = False, stream_chunk_size: int = 20000, sharded: bool = False, backend: Optional[str] = None, evaluator: str = LOOKUP_EVALUATOR, use_preflop_table: bool = True, checkpoint_path: Optional[str] = None, checkpoint_interval: float = DEFAULT_CHECKPOINT_INTERVAL, cache: Optional[ResultCache] = None) -> Tuple[List[int], List[int], List[int], int]:
+    """
+    Win and tie counts per player, their tie shares (the part of the split pots they won, in utils.TIE_SHARE_UNIT)
+    plus the amount of table card combinations they were counted over.
+    The backend (serial / thread / process) is picked by the execution planner from the job size, unless given.
+    Pass a CalculationEngine to reuse its warm pool across calls, otherwise a temporary one is created if a process pool is needed.
+    With streaming, boards are generated lazily in chunks of stream_chunk_size and reduced as soon as a chunk is done,
+    so memory stays flat no matter how many boards are enumerated.
+    With sharded, workers only get index ranges of the combination space (about stream_chunk_size boards each)
+    and generate their own boards, nothing but counters goes through IPC. Suit isomorphism is not used in this mode.
+    evaluator "numpy" evaluates each batch of boards as arrays (needs numpy) instead of board by board with the lookup evaluator.
+    Complete heads-up preflop calculations are answered from the preflop table (see preflop_tables.py) if one has been built.
+    With a checkpoint_path the job runs sharded and flushes its finished shards and counters to that file every
+    checkpoint_interval seconds; running the same job again with the same path resumes it (see checkpoint.py).
+    With a ResultCache, repeated and equivalent (suit / player order permuted) calculations are answered from it.
+    """
+    if cache is not None:
+        cached_counts = cache.get(all_player_cards, table_cards, division, numerators_to_check)
+        if cached_counts is not None:
+            print("Answered from the result cache")
+            return cached_counts
+
+    if use_preflop_table and len(table_cards) == 0 and set(range(division)) <= set(numerators_to_check):
+        preflop_counts = lookup_preflop_counts(all_player_cards)
+        if preflop_counts is not None:
+            print("Answered from the preflop table")
+            return preflop_counts
+
+    if checkpoint_path is not None:
+        sharded = True
+    if evaluator not in EVALUATORS:
+        raise ValueError(f"Unknown evaluator {evaluator}, expected one of {EVALUATORS}")
+    if evaluator == NUMPY_EVALUATOR:
+        require_numpy()
+        batch_func, index_ranges_func = process_job_batch_numpy, process_job_index_ranges_numpy
+    else:
+        batch_func, index_ranges_func = process_job_batch, process_job_index_ranges
 
-def calc_odds(all_player_cards: List[List[Card]], table_cards: List[Card], division: int, numerators_to_check: List[int]) -> Tuple[List[float], List[float], List[int], List[int]]:
     # Win chances each player current situation
-    all_used_cards = table_cards + [card for player_cards in all_player_cards for card in player_cards]
-    all_unused_cards = [card for card in get_all_cards() if card not in all_used_cards]
-    
-    start_time = time.time()
-    all_possible_table_cards_dict = get_sampled_table_cards_by_division(table_cards, all_unused_cards, division=division, numerators_to_check=numerators_to_check)
-    end_time = time.time()
-    print(f"Time taken to calculate all possible table cards: {round(end_time - start_time, 2)}s")
-    print(f"Total possible table card combinations: {len(all_possible_table_cards_dict)}")
-    
-    # Convert dictionary items to list for processing
-    items_list = list(all_possible_table_cards_dict.values())
-    
+    table_mask = cards_to_mask(table_cards)
+    all_player_masks = [cards_to_mask(player_cards) for player_cards in all_player_cards]
+    all_used_mask = table_mask | cards_to_mask(card for player_cards in all_player_cards for card in player_cards)
+    all_unused_mask = FULL_DECK_MASK & ~all_used_mask
+    job_context = (tuple(all_player_masks), table_mask)
+
+    # Boards that only differ by swapping interchangeable suits are merged into one weighted board
+    suit_blocks = get_suit_blocks(all_player_masks + [table_mask])
+    use_suit_isomorphism = use_suit_isomorphism and get_symmetry_count(suit_blocks) > 1
+
     # Initialize counters
     total_player_wins = [0] * len(all_player_cards)
     total_player_ties = [0] * len(all_player_cards)
+    total_player_tie_shares = [0] * len(all_player_cards)
     total_card_amount = 0
-    
-    start_time = time.time()
 
-    # One core free, never 0 cores
-    num_cores = max(1, mp.cpu_count() - 1)
-    if num_cores <= 0:
-        num_cores = 1
-    print(f"Using {num_cores} CPU cores for processing")
-    
-    # Each core gets 1 chunk of work from original list
-    chunk_size = max(1, len(items_list) // num_cores)
-    chunks = []
-    
-    for i in range(0, len(items_list), chunk_size):
-        chunks.append(items_list[i:i + chunk_size])
-    
-    # Process chunks in parallel using a pool
-    with Pool(processes=num_cores) as pool:
-        # partial to fixate all_player_cards
-        process_func = partial(process_batch, all_player_cards=all_player_cards)
-        results = pool.map(process_func, chunks)
-        
-        # Combine results
-        for batch_wins, batch_ties, batch_card_amount in results:
+    # Estimate the job size and pick where to run it
+    available_amount = len(get_available_card_masks(table_mask, all_unused_mask))
+    total_combinations = math.comb(available_amount, 5 - len(table_cards))
+    estimated_boards = count_indices(total_combinations, division, numerators_to_check)
+    if use_suit_isomorphism and not sharded:
+        estimated_boards = max(1, estimated_boards // get_symmetry_count(suit_blocks))
+    plan = plan_execution(estimated_boards, len(all_player_cards), backend=backend, has_warm_engine=engine is not None)
+    print(f"Execution plan: {plan}")
+
+    with engine_for_plan(plan, engine) as engine:
+        num_cores = engine.processes
+        print(f"Using {num_cores} CPU cores for processing")
+
+        if sharded:
+            start_time = time.time()
+            index_ranges = get_index_ranges(total_combinations, division, numerators_to_check)
+            if checkpoint_path is None:
+                results = engine.imap_unordered(index_ranges_func, job_context, split_index_ranges(index_ranges, stream_chunk_size))
+            else:
+                # Shards are numbered in their deterministic order, finished ones are skipped when resuming
+                job_key = {
+                    "players": all_player_masks, "table": table_mask, "division": division,
+                    "numerators": sorted(set(numerators_to_check)), "shard_size": stream_chunk_size
+                }
+                checkpoint = CountsCheckpoint(checkpoint_path, job_key, len(all_player_masks), checkpoint_interval)
+                tasks = (
+                    (shard_index, shard, index_ranges_func) for shard_index, shard in enumerate(split_index_ranges(index_ranges, stream_chunk_size))
+                    if shard_index not in checkpoint.done_shards
+                )
+                results = checkpoint.track(engine.imap_unordered(process_job_indexed_shard, job_context, tasks))
+        elif streaming:
+            start_time = time.time()
+            if use_suit_isomorphism:
+                table_cards_iter = iter_canonical_table_cards_by_division(table_mask, all_unused_mask, division, numerators_to_check, suit_blocks)
+            else:
+                table_cards_iter = ((key, 1) for key in iter_sampled_table_cards_by_division(table_mask, all_unused_mask, division, numerators_to_check))
+            results = engine.imap_unordered(batch_func, job_context, iter_table_card_chunks(table_cards_iter, stream_chunk_size))
+        else:
+            start_time = time.time()
+            if use_suit_isomorphism:
+                all_possible_table_cards_dict = get_canonical_table_cards_by_division(table_mask, all_unused_mask, division=division, numerators_to_check=numerators_to_check, suit_blocks=suit_blocks)
+            else:
+                all_possible_table_cards_dict = get_sampled_table_cards_by_division(table_mask, all_unused_mask, division=division, numerators_to_check=numerators_to_check)
+            end_time = time.time()
+            print(f"Time taken to calculate all possible table cards: {round(end_time - start_time, 2)}s")
+            print(f"Total possible table card combinations: {len(all_possible_table_cards_dict)}")
+
+            # Convert dictionary items to list for processing
+            items_list = list(all_possible_table_cards_dict.values())
+
+            start_time = time.time()
+
+            # Each core gets 1 chunk of work from original list
+            chunk_size = max(1, len(items_list) // num_cores)
+            chunks = []
+
+            for i in range(0, len(items_list), chunk_size):
+                chunks.append(items_list[i:i + chunk_size])
+
+            # Process chunks in parallel, the workers get the players once per job instead of with every chunk
+            results = engine.map(batch_func, job_context, chunks)
+
+        # Combine results (as they arrive when streaming)
+        for batch_wins, batch_ties, batch_tie_shares, batch_card_amount in results:
             total_player_wins = [total + batch for total, batch in zip(total_player_wins, batch_wins)]
             total_player_ties = [total + batch for total, batch in zip(total_player_ties, batch_ties)]
+            total_player_tie_shares = [total + batch for total, batch in zip(total_player_tie_shares, batch_tie_shares)]
             total_card_amount += batch_card_amount
     
     end_time = time.time()
     print(f"Time taken to calculate player wins for all possible table cards: {round(end_time - start_time, 2)}s")
 
+    if cache is not None:
+        cache.put(all_player_cards, table_cards, division, numerators_to_check, (total_player_wins, total_player_ties, total_player_tie_shares, total_card_amount))
+    return total_player_wins, total_player_ties, total_player_tie_shares, total_card_amount
+
+def calc_odds(all_player_cards: List[List[Card]], table_cards: List[Card], division: int, numerators_to_check: List[int], use_suit_isomorphism: bool = True, engine: Optional[CalculationEngine] = None, streaming: bool = False, stream_chunk_size: int = 20000, sharded: bool = False, backend: Optional[str] = None, evaluator: str = LOOKUP_EVALUATOR, use_preflop_table: bool = True, checkpoint_path: Optional[str] = None, checkpoint_interval: float = DEFAULT_CHECKPOINT_INTERVAL, cache: Optional[ResultCache] = None) -> Tuple[List[float], List[float], List[int], List[int], List[float]]:
+    """
+    Win and tie percentages and counts per player plus their equities, see calc_counts for the options.
+    """
+    total_player_wins, total_player_ties, total_player_tie_shares, total_card_amount = calc_counts(
+        all_player_cards, table_cards, division, numerators_to_check, use_suit_isomorphism=use_suit_isomorphism, engine=engine,
+        streaming=streaming, stream_chunk_size=stream_chunk_size, sharded=sharded, backend=backend, evaluator=evaluator, use_preflop_table=use_preflop_table,
+        checkpoint_path=checkpoint_path, checkpoint_interval=checkpoint_interval, cache=cache
+    )
+
     win_percentages = [win / total_card_amount * 100 for win in total_player_wins]
     tie_percentages = [tie / total_card_amount * 100 for tie in total_player_ties]
+    equities = get_equities(total_player_wins, total_player_tie_shares, total_card_amount)
     
-    return win_percentages, tie_percentages, total_player_wins, total_player_ties
\ No newline at end of file
+    return win_percentages, tie_percentages, total_player_wins, total_player_ties, equities
+
+
+class OddsSnapshot:
+    """
+    Cumulative result after a refinement round of iter_odds.
+    Percentages are over all combinations counted so far, equities split every tied pot between the tied players.
+    """
+    def __init__(self, player_wins: List[int], player_ties: List[int], player_tie_shares: List[int], total_card_amount: int, numerators_done: int, division: int):
+        self.player_wins = player_wins
+        self.player_ties = player_ties
+        self.player_tie_shares = player_tie_shares
+        self.total_card_amount = total_card_amount
+        self.numerators_done = numerators_done
+        self.division = division
+        self.win_percentages = [win / total_card_amount * 100 for win in player_wins]
+        self.tie_percentages = [tie / total_card_amount * 100 for tie in player_ties]
+        self.equities = get_equities(player_wins, player_tie_shares, total_card_amount)
+        self.progress = numerators_done / division
+        self.is_final = numerators_done == division
+
+def get_progressive_numerators(division: int) -> List[List[int]]:
+    """
+    Numerators per refinement round: [0], [1], [2, 3], [4 .. 7], ... doubling until all of 0 .. division-1 are covered.
+    """
+    rounds = [[0]]
+    current_amount = 1
+    prev_max_numerator = 0
+    while prev_max_numerator < division - 1:
+        current_max_numerator = min(prev_max_numerator + current_amount, division - 1)
+        rounds.append(list(range(prev_max_numerator + 1, current_max_numerator + 1)))
+        prev_max_numerator = current_max_numerator
+        current_amount *= 2
+    return rounds
+
+def iter_odds(all_player_cards: List[List[Card]], table_cards: List[Card], division: int = 64, **calc_kwargs) -> Iterator[OddsSnapshot]:
+    """
+    Progressive calculation: yields a cumulative OddsSnapshot after every round of get_progressive_numerators.
+    Start with 1 and double each time, to get almost instant first estimate, getting better iteratively.
+    This is, because keeping it linear, you either get a slow first result or a slow final result due to overhead of doing it 64 times for a small list.
+    Rounds run one at a time, so stopping the iteration never throws away finished work. calc_kwargs go to calc_counts.
+    """
+    # Moving average only needed for 0 table cards, otherwise its overhead outweighs the benefits
+    if len(table_cards) != 0:
+        division = 1
+    # A preflop table hit is exact right away
+    elif calc_kwargs.get("use_preflop_table", True):
+        preflop_counts = lookup_preflop_counts(all_player_cards)
+        if preflop_counts is not None:
+            yield OddsSnapshot(*preflop_counts, numerators_done=1, division=1)
+            return
+
+    total_player_wins = [0] * len(all_player_cards)
+    total_player_ties = [0] * len(all_player_cards)
+    total_player_tie_shares = [0] * len(all_player_cards)
+    total_card_amount = 0
+    numerators_done = 0
+    checkpoint_path = calc_kwargs.pop("checkpoint_path", None)
+    for round_index, numerators_to_check in enumerate(get_progressive_numerators(division)):
+        if checkpoint_path is not None:
+            # Every round is its own job, so it gets its own checkpoint file
+            calc_kwargs["checkpoint_path"] = f"{checkpoint_path}.round{round_index}"
+        player_wins, player_ties, player_tie_shares, card_amount = calc_counts(all_player_cards, table_cards, division, numerators_to_check, **calc_kwargs)
+        total_player_wins = [total + wins for total, wins in zip(total_player_wins, player_wins)]
+        total_player_ties = [total + ties for total, ties in zip(total_player_ties, player_ties)]
+        total_player_tie_shares = [total + tie_shares for total, tie_shares in zip(total_player_tie_shares, player_tie_shares)]
+        total_card_amount += card_amount
+        numerators_done += len(numerators_to_check)
+        yield OddsSnapshot(total_player_wins, total_player_ties, total_player_tie_shares, total_card_amount, numerators_done, division)
+
+async def aiter_odds(all_player_cards: List[List[Card]], table_cards: List[Card], division: int = 64, **calc_kwargs) -> AsyncIterator[OddsSnapshot]:
+    """
+    asyncio version of iter_odds, every round runs in the default executor so the event loop stays responsive.
+    Cancelling while a round runs doesn't throw that round away: it is finished and its snapshot yielded,
+    the next step then raises the CancelledError. Cancelling again while waiting for it gives up on the round.
+    """
+    loop = asyncio.get_running_loop()
+    snapshots = iter_odds(all_player_cards, table_cards, division, **calc_kwargs)
+    pending = None
+    try:
+        while True:
+            pending = loop.run_in_executor(None, next, snapshots, None)
+            try:
+                # Shielded, so cancelling the consumer doesn't cancel the round's future
+                snapshot = await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                snapshot = await pending
+                if snapshot is not None:
+                    yield snapshot
+                raise
+            if snapshot is None:
+                return
+            yield snapshot
+    finally:
+        # If cancelled again while a round is running, let it finish in its thread and close the generator afterwards
+        if pending is not None and not pending.done():
+            pending.add_done_callback(lambda _: snapshots.close())
+        else:
+            snapshots.close()
+
+
+def process_job_next_card_index_ranges(job_context, index_ranges):
+    """
+    process_job_index_ranges that also attributes every runout's result to each of its cards,
+    returns the total counters plus {card id: (wins, ties, tie shares, total)} for the runouts containing that card.
+    """
+    player_amount = len(job_context[0])
+    # Runouts per bitmask of the players with the best hand, in total and per card, converted to counters once at the end
+    outcome_amounts: Counter = Counter()
+    card_outcome_amounts: Dict[int, Counter] = defaultdict(Counter)
+    for runout_mask, winners in iter_runout_winners(job_context, index_ranges):
+        outcome_amounts[winners] += 1
+        for card_id in mask_to_ids(runout_mask):
+            card_outcome_amounts[card_id][winners] += 1
+
+    card_counts = {card_id: count_winners(card_outcomes.items(), player_amount) for card_id, card_outcomes in card_outcome_amounts.items()}
+    return count_winners(outcome_amounts.items(), player_amount), card_counts
+
+def _get_equities(wins: List[int], ties: List[int], tie_shares: List[int], total: int) -> List[float]:
+    return get_equities(wins, tie_shares, total)
+
+def _add_counts(counts, other_counts):
+    """Sum of two (wins, ties, tie shares, total) counters."""
+    wins, ties, tie_shares, total = counts
+    other_wins, other_ties, other_tie_shares, other_total = other_counts
+    return (
+        [win + other for win, other in zip(wins, other_wins)],
+        [tie + other for tie, other in zip(ties, other_ties)],
+        [tie_share + other for tie_share, other in zip(tie_shares, other_tie_shares)],
+        total + other_total
+    )
+
+
+class NextCardBreakdown:
+    """
+    Equity per player for the current table and for every possible next card.
+    card_equities[card] is the equity over the runouts containing that card (the result if it's dealt next),
+    outs are the (card, new leader) pairs where that card hands the equity lead to another player.
+    """
+    def __init__(self, all_player_wins: List[int], all_player_ties: List[int], all_player_tie_shares: List[int], total_card_amount: int, card_counts: Dict[Card, Tuple[List[int], List[int], List[int], int]]):
+        self.player_wins = all_player_wins
+        self.player_ties = all_player_ties
+        self.player_tie_shares = all_player_tie_shares
+        self.total_card_amount = total_card_amount
+        self.equities = _get_equities(all_player_wins, all_player_ties, all_player_tie_shares, total_card_amount)
+        self.card_counts = card_counts
+        self.card_equities: Dict[Card, List[float]] = {card: _get_equities(*counts) for card, counts in card_counts.items()}
+        self.leader = max(range(len(self.equities)), key=lambda player_idx: self.equities[player_idx])
+        self.outs: List[Tuple[Card, int]] = []
+        for card, equities in self.card_equities.items():
+            new_leader = max(range(len(equities)), key=lambda player_idx: equities[player_idx])
+            if new_leader != self.leader and equities[new_leader] > equities[self.leader]:
+                self.outs.append((card, new_leader))
+
+    def get_outs(self, player_idx: int) -> List[Card]:
+        """Next cards that make player_idx the equity leader, while someone else leads now."""
+        return [card for card, new_leader in self.outs if new_leader == player_idx]
+
+    def __str__(self):
+        result_str = ''
+        for j, equity in enumerate(self.equities):
+            result_str += f'Player {j+1} total equity: {round(equity, 2)}%, outs: {" ".join(str(card) for card in self.get_outs(j)) or "-"}\n'
+        for card, equities in self.card_equities.items():
+            result_str += f'{card}: ' + ', '.join(f'{round(equity, 2)}%' for equity in equities) + '\n'
+        return result_str
+
+def calc_next_card_breakdown(all_player_cards: List[List[Card]], table_cards: List[Card], engine: Optional[CalculationEngine] = None, backend: Optional[str] = None, stream_chunk_size: int = 20000) -> NextCardBreakdown:
+    """
+    Equity for every possible next card plus the outs, from a single sharded enumeration:
+    every runout is evaluated once and its result is added to the total and to each of its cards.
+    Meant for the flop and turn, preflop every card of the flop counts as a possible next card.
+    """
+    if len(table_cards) not in (0, 3, 4):
+        raise ValueError("A next card breakdown needs 0, 3 or 4 table cards")
+    table_mask = cards_to_mask(table_cards)
+    all_player_masks = tuple(cards_to_mask(player_cards) for player_cards in all_player_cards)
+    all_used_mask = table_mask | cards_to_mask(card for player_cards in all_player_cards for card in player_cards)
+    job_context = (all_player_masks, table_mask)
+
+    available_amount = popcount(FULL_DECK_MASK & ~all_used_mask)
+    total_combinations = math.comb(available_amount, 5 - len(table_cards))
+    plan = plan_execution(total_combinations, len(all_player_cards), backend=backend, has_warm_engine=engine is not None)
+    print(f"Execution plan: {plan}")
+
+    player_amount = len(all_player_cards)
+    total_counts = ([0] * player_amount, [0] * player_amount, [0] * player_amount, 0)
+    card_counts: Dict[int, Tuple[List[int], List[int], List[int], int]] = {}
+    with engine_for_plan(plan, engine) as engine:
+        shards = split_index_ranges([(0, total_combinations)], stream_chunk_size)
+        for batch_counts, batch_card_counts in engine.imap_unordered(process_job_next_card_index_ranges, job_context, shards):
+            total_counts = _add_counts(total_counts, batch_counts)
+            for card_id, counts in batch_card_counts.items():
+                card_counts[card_id] = _add_counts(card_counts[card_id], counts) if card_id in card_counts else counts
+
+    return NextCardBreakdown(*total_counts, {card_from_id(card_id): counts for card_id, counts in sorted(card_counts.items())})
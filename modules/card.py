@@ -1,4 +1,5 @@
 from enum import IntEnum, auto
+from typing import Iterable, List
 
 class Suit(IntEnum):
     CLUBS = auto()
@@ -46,21 +47,89 @@ class CardNumber(IntEnum):
         else:
             return "A"
 
+# Card ids 0-51: suit-major, so a card set mask holds one 13-bit rank mask per suit
+# (bits 0-12 clubs, 13-25 diamonds, 26-38 hearts, 39-51 spades)
+SUIT_BITS = 13
+FULL_DECK_MASK = (1 << 52) - 1
+
 class Card:
-    def __init__(self, number: CardNumber, suit: Suit):
-        self.number = number
-        self.suit = suit
-    
+    """
+    Interned playing card: there are exactly 52 instances, Card(number, suit) always returns the same object.
+    """
+    __slots__ = ("number", "suit", "id", "mask")
+
+    def __new__(cls, number: CardNumber, suit: Suit):
+        return _ALL_CARDS[(Suit(suit) - 1) * SUIT_BITS + CardNumber(number) - 2]
+
+    @classmethod
+    def _create(cls, number: CardNumber, suit: Suit) -> "Card":
+        card = object.__new__(cls)
+        card.number = number
+        card.suit = suit
+        card.id = (suit - 1) * SUIT_BITS + number - 2
+        card.mask = 1 << card.id
+        return card
+
+    def __reduce__(self):
+        # Unpickling goes through __new__ again, keeping the cards interned across processes
+        return (Card, (self.number, self.suit))
+
     def __eq__(self, other):
-        if not isinstance(other, Card):
-            return False
-        return self.number == other.number and self.suit == other.suit
-    
+        return self is other
+
     def __hash__(self):
-        return hash((self.number, self.suit))
-    
+        return self.id
+
     def __str__(self):
         return f"{self.number}{self.suit.symbol()}"
     
     def __repr__(self):
-        return f"Card({self.number}, {self.suit})"
\ No newline at end of file
+        return f"Card({self.number}, {self.suit})"
+
+_ALL_CARDS: List[Card] = [Card._create(number, suit) for suit in Suit for number in CardNumber]
+
+
+def card_from_id(card_id: int) -> Card:
+    return _ALL_CARDS[card_id]
+
+def cards_to_mask(cards: Iterable[Card]) -> int:
+    mask = 0
+    for card in cards:
+        mask |= card.mask
+    return mask
+
+def mask_to_ids(mask: int) -> List[int]:
+    ids = []
+    while mask:
+        low_bit = mask & -mask
+        ids.append(low_bit.bit_length() - 1)
+        mask ^= low_bit
+    return ids
+
+def mask_to_cards(mask: int) -> List[Card]:
+    return [_ALL_CARDS[card_id] for card_id in mask_to_ids(mask)]
+
+def popcount(mask: int) -> int:
+    return bin(mask).count("1")
+
+
+# Short text notation: rank character + suit character, e.g. "Ah", "Td", "2c"
+RANK_CHARS = "23456789TJQKA"
+SUIT_CHARS = "cdhs"
+
+def card_from_str(text: str) -> Card:
+    if len(text) != 2 or text[0].upper() not in RANK_CHARS or text[1].lower() not in SUIT_CHARS:
+        raise ValueError(f"Invalid card {text}, expected a rank from {RANK_CHARS} and a suit from {SUIT_CHARS}, e.g. 'Ah'")
+    return _ALL_CARDS[SUIT_CHARS.index(text[1].lower()) * SUIT_BITS + RANK_CHARS.index(text[0].upper())]
+
+def cards_from_str(text: str) -> List[Card]:
+    """"AhKd" or "Ah Kd" -> [Card(ACE, HEARTS), Card(KING, DIAMONDS)]"""
+    text = text.replace(" ", "").replace(",", "")
+    return [card_from_str(text[i:i + 2]) for i in range(0, len(text), 2)]
+
+def card_to_str(card: Card) -> str:
+    return RANK_CHARS[card.number - 2] + SUIT_CHARS[card.suit - 1]
+
+def mask_to_str(mask: int) -> str:
+    # Highest rank first, like range notation ("AhKd")
+    return "".join(card_to_str(card) for card in sorted(mask_to_cards(mask), key=lambda card: (card.number, card.suit), reverse=True))
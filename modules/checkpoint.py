@@ -0,0 +1,80 @@
+"""
+Checkpoints for long enumerations: progress and partial counters are flushed to a local JSON file at intervals,
+so a job that dies can be restarted and continue from the shards it already finished.
+
+The file holds a job key describing the calculation. A checkpoint is only resumed by the exact same job,
+anything else raises instead of silently mixing counters of different calculations.
+Files are written to a temporary file first and renamed, so a crash mid-write never corrupts the last checkpoint.
+"""
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import json
+import os
+import time
+
+# 2: counters include the tie shares
+CHECKPOINT_VERSION = 2
+DEFAULT_CHECKPOINT_INTERVAL = 30.0
+
+
+def load_checkpoint(path: str, job_key: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The saved state of the job, None if there is no checkpoint yet."""
+    if not os.path.exists(path):
+        return None
+    with open(path) as file:
+        checkpoint = json.load(file)
+    if checkpoint.get("version") != CHECKPOINT_VERSION or checkpoint.get("job") != job_key:
+        raise ValueError(f"Checkpoint {path} belongs to a different job, delete it or use another checkpoint path")
+    return checkpoint["state"]
+
+def save_checkpoint(path: str, job_key: Dict[str, Any], state: Dict[str, Any]):
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w") as file:
+        json.dump({"version": CHECKPOINT_VERSION, "job": job_key, "state": state}, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_path, path)
+
+
+class CountsCheckpoint:
+    """
+    Win/tie counters and tie shares of a sharded calculation plus the indices of the shards they include.
+    Shards finish in any order, so the finished ones are kept as a set rather than a single position.
+    """
+    def __init__(self, path: str, job_key: Dict[str, Any], player_amount: int, interval: float = DEFAULT_CHECKPOINT_INTERVAL):
+        self.path = path
+        self.job_key = job_key
+        self.interval = interval
+        state = load_checkpoint(path, job_key)
+        if state is None:
+            state = {"done_shards": [], "wins": [0] * player_amount, "ties": [0] * player_amount, "tie_shares": [0] * player_amount, "card_amount": 0}
+        self.done_shards = set(state["done_shards"])
+        self.wins: List[int] = state["wins"]
+        self.ties: List[int] = state["ties"]
+        self.tie_shares: List[int] = state["tie_shares"]
+        self.card_amount: int = state["card_amount"]
+        self.last_flush = time.time()
+
+    def flush(self):
+        state = {"done_shards": sorted(self.done_shards), "wins": self.wins, "ties": self.ties, "tie_shares": self.tie_shares, "card_amount": self.card_amount}
+        save_checkpoint(self.path, self.job_key, state)
+        self.last_flush = time.time()
+
+    def track(self, shard_results: Iterable[Tuple[int, Tuple[List[int], List[int], List[int], int]]]) -> Iterator[Tuple[List[int], List[int], List[int], int]]:
+        """
+        Records (shard index, counters) results as they arrive and passes the counters on.
+        Yields the counters restored from the checkpoint first, so the totals come out the same as an uninterrupted run.
+        """
+        yield list(self.wins), list(self.ties), list(self.tie_shares), self.card_amount
+        try:
+            for shard_index, (wins, ties, tie_shares, card_amount) in shard_results:
+                self.wins = [total + win for total, win in zip(self.wins, wins)]
+                self.ties = [total + tie for total, tie in zip(self.ties, ties)]
+                self.tie_shares = [total + tie_share for total, tie_share in zip(self.tie_shares, tie_shares)]
+                self.card_amount += card_amount
+                self.done_shards.add(shard_index)
+                if time.time() - self.last_flush >= self.interval:
+                    self.flush()
+                yield wins, ties, tie_shares, card_amount
+        finally:
+            # Also on errors / interrupts, everything finished so far is kept
+            self.flush()
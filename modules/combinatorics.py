@@ -0,0 +1,138 @@
+"""
+Combinatorial number system for k-combinations of n items in itertools.combinations (lexicographic) order.
+Lets the i-th board be generated directly, instead of walking all combinations before it.
+"""
+from bisect import bisect_right
+from typing import Iterable, Iterator, List, Sequence, Tuple
+import itertools
+import math
+
+MAX_ITEMS = 52
+
+# _BINOMIALS[k][x] = C(x, k), non-decreasing in x, so the colex digits can be found by bisection
+_BINOMIALS: List[List[int]] = [[math.comb(x, k) for x in range(MAX_ITEMS + 1)] for k in range(MAX_ITEMS + 1)]
+
+
+def rank_combination(positions: Sequence[int], n: int) -> int:
+    """
+    Index of the sorted positions within itertools.combinations(range(n), len(positions)).
+    """
+    k = len(positions)
+    # Lexicographic rank of c = C(n, k) - 1 - colex rank of the mirrored combination (n-1-c reversed)
+    colex_rank = 0
+    for j in range(k):
+        colex_rank += _BINOMIALS[j + 1][n - 1 - positions[k - 1 - j]]
+    return _BINOMIALS[k][n] - 1 - colex_rank
+
+def unrank_combination(index: int, n: int, k: int) -> Tuple[int, ...]:
+    """
+    The index-th element of itertools.combinations(range(n), k), without generating the ones before it.
+    """
+    total = _BINOMIALS[k][n]
+    if not 0 <= index < total:
+        raise IndexError(f"Combination index {index} out of range for C({n}, {k}) = {total}")
+
+    colex_rank = total - 1 - index
+    mirrored = [0] * k
+    for j in range(k, 0, -1):
+        # Largest x with C(x, j) <= colex_rank
+        x = bisect_right(_BINOMIALS[j], colex_rank, 0, n) - 1
+        mirrored[j - 1] = x
+        colex_rank -= _BINOMIALS[j][x]
+    return tuple(n - 1 - mirrored[k - 1 - i] for i in range(k))
+
+
+def iter_combination_masks(card_masks: Sequence[int], k: int, start: int, end: int) -> Iterator[int]:
+    """
+    Yields the masks (sum of the chosen card masks) of the combinations with index start <= i < end.
+    Only the first combination is unranked, the rest are stepped to, so the cost scales with end - start.
+    """
+    n = len(card_masks)
+    end = min(end, _BINOMIALS[k][n])
+    if start >= end:
+        return
+    if k == 0:
+        yield 0
+        return
+    if start == 0 and end == _BINOMIALS[k][n]:
+        # Whole space, itertools is fastest
+        for combination in itertools.combinations(card_masks, k):
+            yield sum(combination)
+        return
+
+    positions = list(unrank_combination(start, n, k))
+    remaining = end - start
+    while True:
+        # The last position runs over the rest of the cards with the prefix fixed
+        prefix_mask = 0
+        for position in positions[:-1]:
+            prefix_mask |= card_masks[position]
+        last_cards = card_masks[positions[-1]:positions[-1] + remaining]
+        for card_mask in last_cards:
+            yield prefix_mask | card_mask
+        remaining -= len(last_cards)
+        if remaining <= 0:
+            return
+
+        # Advance the rightmost prefix position that still has room
+        i = k - 2
+        while positions[i] == n - k + i:
+            i -= 1
+        positions[i] += 1
+        for j in range(i + 1, k):
+            positions[j] = positions[j - 1] + 1
+
+def get_index_ranges(total: int, division: int, numerators_to_check: Sequence[int]) -> List[Tuple[int, int]]:
+    """
+    Index ranges [start, end) covering exactly the indices i < total with i % division in numerators_to_check.
+    """
+    numerators = sorted({numerator for numerator in numerators_to_check if 0 <= numerator < division})
+    if not numerators:
+        return []
+
+    # Merge consecutive numerators into runs, so each period contributes one range per run
+    runs: List[Tuple[int, int]] = []
+    run_start = previous = numerators[0]
+    for numerator in numerators[1:]:
+        if numerator != previous + 1:
+            runs.append((run_start, previous + 1))
+            run_start = numerator
+        previous = numerator
+    runs.append((run_start, previous + 1))
+
+    if runs == [(0, division)]:
+        return [(0, total)]
+
+    index_ranges = []
+    for period_start in range(0, total, division):
+        for run_start, run_end in runs:
+            start = period_start + run_start
+            if start >= total:
+                break
+            index_ranges.append((start, min(period_start + run_end, total)))
+    return index_ranges
+
+def count_indices(total: int, division: int, numerators_to_check: Sequence[int]) -> int:
+    """Amount of indices i < total with i % division in numerators_to_check, without building the ranges."""
+    numerators = {numerator for numerator in numerators_to_check if 0 <= numerator < division}
+    return sum((total - numerator + division - 1) // division for numerator in numerators if numerator < total)
+
+def split_index_ranges(index_ranges: Iterable[Tuple[int, int]], shard_size: int) -> Iterator[List[Tuple[int, int]]]:
+    """
+    Regroups index ranges into shards covering about shard_size indices each:
+    long ranges get split, short ones (e.g. from a large division) get bundled.
+    """
+    shard: List[Tuple[int, int]] = []
+    shard_amount = 0
+    for start, end in index_ranges:
+        while start < end:
+            take = min(end - start, shard_size - shard_amount)
+            shard.append((start, start + take))
+            shard_amount += take
+            start += take
+            if shard_amount >= shard_size:
+                yield shard
+                shard = []
+                shard_amount = 0
+    if shard:
+        yield shard
@@ -0,0 +1,329 @@
+"""
+Distributed enumeration over several machines: a coordinator splits the board combination space into index-range
+work units and hands them to workers over TCP, the workers count wins / ties of their units with their own engine.
+
+The index ranges are the ones calc_counts uses in sharded mode (get_index_ranges over the same combination order as
+get_sampled_table_cards_by_division), so division / numerators_to_check select the same boards as calc_odds.
+Every worker holds up to a few units at a time. Units of a worker that disconnects go back to the queue,
+and units a worker holds longer than unit_timeout are also handed to another worker; whichever result arrives first counts.
+
+Protocol, one JSON object per line:
+  worker -> coordinator  {"type": "hello", "name": ..., "capacity": units it wants to hold}
+  coordinator -> worker  {"type": "job", "players": [player masks], "table": table mask, "evaluator": "lookup"}
+  coordinator -> worker  {"type": "unit", "unit": unit index, "ranges": [[start, end], ...]}
+  worker -> coordinator  {"type": "result", "unit": unit index, "wins": [...], "ties": [...], "tie_shares": [...], "boards": n}
+  coordinator -> worker  {"type": "done"}
+
+Usage:
+  python -m modules.distributed coordinator --players AhKh,QsQd,JcJd [--board 2h9hTs] [--division 64 --numerators 0,1] [--host 0.0.0.0] [--port 9750]
+  python -m modules.distributed worker --host COORDINATOR_HOST [--port 9750] [--processes N]
+There is no authentication, only run the coordinator on a trusted network.
+"""
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing as mp
+import os
+import socket
+import time
+from .card import Card, FULL_DECK_MASK, cards_from_str, cards_to_mask
+from .all_cards import get_available_card_masks
+from .combinatorics import count_indices, get_index_ranges, split_index_ranges
+from .engine import CalculationEngine, SerialEngine
+from .calculator import EVALUATORS, LOOKUP_EVALUATOR, NUMPY_EVALUATOR, process_job_index_ranges
+from .batch_evaluator import process_job_index_ranges_numpy, require_numpy
+from .utils import check_validity, get_equities, get_results_str
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 9750
+# Boards per work unit
+DEFAULT_UNIT_SIZE = 200_000
+# Seconds after which a unit that is still out is also given to another worker
+DEFAULT_UNIT_TIMEOUT = 120.0
+DEFAULT_CAPACITY = 2
+# How often idle connections check for reassignable units
+POLL_INTERVAL = 0.2
+
+
+def _send(writer, message: Dict[str, Any]):
+    writer.write(json.dumps(message).encode() + b"\n")
+
+
+class Coordinator:
+    """
+    Runs one distributed enumeration. run() serves workers until every unit is counted and returns the
+    calc_odds result shape (win percentages, tie percentages, wins, ties, equities).
+    """
+    def __init__(self, all_player_cards: List[List[Card]], table_cards: List[Card], division: int = 1, numerators_to_check: Optional[List[int]] = None,
+                 host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, unit_size: int = DEFAULT_UNIT_SIZE, unit_timeout: float = DEFAULT_UNIT_TIMEOUT,
+                 evaluator: str = LOOKUP_EVALUATOR):
+        check_validity(all_player_cards, table_cards)
+        if evaluator not in EVALUATORS:
+            raise ValueError(f"Unknown evaluator {evaluator}, expected one of {EVALUATORS}")
+        if numerators_to_check is None:
+            numerators_to_check = list(range(division))
+        self.host = host
+        self.port = port
+        self.unit_timeout = unit_timeout
+        self.player_amount = len(all_player_cards)
+        self.all_player_masks = [cards_to_mask(player_cards) for player_cards in all_player_cards]
+        self.table_mask = cards_to_mask(table_cards)
+        self.evaluator = evaluator
+
+        dead_mask = self.table_mask
+        for player_mask in self.all_player_masks:
+            dead_mask |= player_mask
+        available_amount = len(get_available_card_masks(self.table_mask, FULL_DECK_MASK & ~dead_mask))
+        total_combinations = math.comb(available_amount, 5 - len(table_cards))
+        self.expected_boards = count_indices(total_combinations, division, numerators_to_check)
+        self.units: List[List[Tuple[int, int]]] = list(split_index_ranges(get_index_ranges(total_combinations, division, numerators_to_check), unit_size))
+
+        self.player_wins = [0] * self.player_amount
+        self.player_ties = [0] * self.player_amount
+        self.player_tie_shares = [0] * self.player_amount
+        self.board_amount = 0
+        self.reassigned_units = 0
+        self.workers_seen = 0
+        self._pending: Deque[int] = deque(range(len(self.units)))
+        # unit -> {connection id: time it was handed out}
+        self._outstanding: Dict[int, Dict[int, float]] = {}
+        self._done: Set[int] = set()
+        self._finished: Optional[asyncio.Event] = None
+
+    def _next_unit(self, connection_id: int) -> Optional[int]:
+        """A pending unit, otherwise an overdue unit this connection doesn't hold yet, otherwise None."""
+        while self._pending:
+            unit = self._pending.popleft()
+            if unit not in self._done:
+                return unit
+        now = time.time()
+        overdue = [
+            (len(holders), unit) for unit, holders in self._outstanding.items()
+            if connection_id not in holders and holders and now - min(holders.values()) >= self.unit_timeout
+        ]
+        if not overdue:
+            return None
+        self.reassigned_units += 1
+        return min(overdue)[1]
+
+    def _add_result(self, message: Dict[str, Any]):
+        unit = message["unit"]
+        self._outstanding.pop(unit, None)
+        if unit in self._done:
+            # A reassigned unit finished twice, the first result already counts
+            return
+        self._done.add(unit)
+        self.player_wins = [total + win for total, win in zip(self.player_wins, message["wins"])]
+        self.player_ties = [total + tie for total, tie in zip(self.player_ties, message["ties"])]
+        self.player_tie_shares = [total + tie_share for total, tie_share in zip(self.player_tie_shares, message["tie_shares"])]
+        self.board_amount += message["boards"]
+        print(f"Coordinator: {len(self._done)}/{len(self.units)} units done")
+        if len(self._done) == len(self.units):
+            self._finished.set()
+
+    async def _handle_worker(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        connection_id = self.workers_seen
+        self.workers_seen += 1
+        messages: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue()
+
+        async def read_messages():
+            try:
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    await messages.put(json.loads(line))
+            except (ConnectionError, ValueError):
+                pass
+            await messages.put(None)
+
+        reader_task = asyncio.ensure_future(read_messages())
+        held: Set[int] = set()
+        try:
+            hello = await asyncio.wait_for(messages.get(), self.unit_timeout)
+            if not hello or hello.get("type") != "hello":
+                return
+            capacity = max(1, int(hello.get("capacity", DEFAULT_CAPACITY)))
+            print(f"Coordinator: worker {hello.get('name', connection_id)} connected")
+            _send(writer, {"type": "job", "players": self.all_player_masks, "table": self.table_mask, "evaluator": self.evaluator})
+
+            while not self._finished.is_set():
+                held -= self._done
+                while len(held) < capacity:
+                    unit = self._next_unit(connection_id)
+                    if unit is None:
+                        break
+                    held.add(unit)
+                    self._outstanding.setdefault(unit, {})[connection_id] = time.time()
+                    _send(writer, {"type": "unit", "unit": unit, "ranges": self.units[unit]})
+                await writer.drain()
+
+                try:
+                    message = await asyncio.wait_for(messages.get(), POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    continue
+                if message is None:
+                    print(f"Coordinator: worker {hello.get('name', connection_id)} disconnected")
+                    break
+                if message.get("type") == "result":
+                    held.discard(message["unit"])
+                    self._add_result(message)
+
+            if self._finished.is_set():
+                _send(writer, {"type": "done"})
+                await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            # Units only this worker held go back to the front of the queue
+            for unit in held - self._done:
+                holders = self._outstanding.get(unit, {})
+                holders.pop(connection_id, None)
+                if not holders:
+                    self._outstanding.pop(unit, None)
+                    self._pending.appendleft(unit)
+            reader_task.cancel()
+            writer.close()
+
+    async def run_async(self, on_listening: Optional[Callable[[int], None]] = None) -> Tuple[List[float], List[float], List[int], List[int], List[float]]:
+        self._finished = asyncio.Event()
+        if not self.units:
+            self._finished.set()
+        server = await asyncio.start_server(self._handle_worker, host=self.host, port=self.port)
+        self.port = server.sockets[0].getsockname()[1]
+        print(f"Coordinator: {len(self.units)} units of {self.expected_boards} boards, listening on {self.host}:{self.port}")
+        if on_listening is not None:
+            on_listening(self.port)
+        start_time = time.time()
+        async with server:
+            await self._finished.wait()
+            # Let the connection handlers send "done"
+            await asyncio.sleep(POLL_INTERVAL * 2)
+        print(f"Time taken for the distributed enumeration: {round(time.time() - start_time, 2)}s, {self.reassigned_units} units reassigned")
+
+        if self.board_amount != self.expected_boards:
+            raise RuntimeError(f"Counted {self.board_amount} boards, expected {self.expected_boards}")
+        win_percentages = [win / self.board_amount * 100 for win in self.player_wins]
+        tie_percentages = [tie / self.board_amount * 100 for tie in self.player_ties]
+        equities = get_equities(self.player_wins, self.player_tie_shares, self.board_amount)
+        return win_percentages, tie_percentages, self.player_wins, self.player_ties, equities
+
+    def run(self, on_listening: Optional[Callable[[int], None]] = None) -> Tuple[List[float], List[float], List[int], List[int], List[float]]:
+        """Blocks until the enumeration is done, on_listening(port) is called once workers can connect."""
+        return asyncio.run(self.run_async(on_listening))
+
+
+def run_worker(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, processes: Optional[int] = None, capacity: int = DEFAULT_CAPACITY,
+               name: Optional[str] = None, connect_timeout: float = 30.0, shard_size: int = 20000) -> int:
+    """
+    Connects to a coordinator and counts the units it gets with a local engine (processes=0 counts in this process),
+    until the coordinator reports the job done or goes away. Returns the amount of units counted.
+    """
+    deadline = time.time() + connect_timeout
+    while True:
+        try:
+            connection = socket.create_connection((host, port))
+            break
+        except OSError:
+            if time.time() >= deadline:
+                raise
+            time.sleep(0.2)
+
+    engine = SerialEngine() if processes == 0 else CalculationEngine(processes)
+    unit_amount = 0
+    try:
+        with connection, connection.makefile("rwb") as stream:
+            def send(message: Dict[str, Any]):
+                stream.write(json.dumps(message).encode() + b"\n")
+                stream.flush()
+
+            send({"type": "hello", "name": name or f"{socket.gethostname()}:{os.getpid()}", "capacity": capacity})
+            job_context = None
+            index_ranges_func = process_job_index_ranges
+            for line in stream:
+                message = json.loads(line)
+                if message["type"] == "job":
+                    job_context = (tuple(message["players"]), message["table"])
+                    if message.get("evaluator") == NUMPY_EVALUATOR:
+                        require_numpy()
+                        index_ranges_func = process_job_index_ranges_numpy
+                elif message["type"] == "unit":
+                    wins = [0] * len(job_context[0])
+                    ties = [0] * len(job_context[0])
+                    tie_shares = [0] * len(job_context[0])
+                    board_amount = 0
+                    shards = split_index_ranges([tuple(index_range) for index_range in message["ranges"]], shard_size)
+                    for batch_wins, batch_ties, batch_tie_shares, batch_board_amount in engine.imap_unordered(index_ranges_func, job_context, shards):
+                        wins = [total + win for total, win in zip(wins, batch_wins)]
+                        ties = [total + tie for total, tie in zip(ties, batch_ties)]
+                        tie_shares = [total + tie_share for total, tie_share in zip(tie_shares, batch_tie_shares)]
+                        board_amount += batch_board_amount
+                    send({"type": "result", "unit": message["unit"], "wins": wins, "ties": ties, "tie_shares": tie_shares, "boards": board_amount})
+                    unit_amount += 1
+                elif message["type"] == "done":
+                    break
+    except ConnectionError:
+        pass
+    finally:
+        engine.close()
+    return unit_amount
+
+
+def calc_odds_distributed(all_player_cards: List[List[Card]], table_cards: List[Card], division: int = 1, numerators_to_check: Optional[List[int]] = None,
+                          host: str = DEFAULT_HOST, port: int = 0, local_workers: int = 0, unit_size: int = DEFAULT_UNIT_SIZE,
+                          unit_timeout: float = DEFAULT_UNIT_TIMEOUT, evaluator: str = LOOKUP_EVALUATOR) -> Tuple[List[float], List[float], List[int], List[int], List[float]]:
+    """
+    calc_odds through a Coordinator. local_workers starts that many single-process workers on this machine
+    (e.g. to test on localhost), remote workers can connect to host:port as well.
+    """
+    coordinator = Coordinator(all_player_cards, table_cards, division, numerators_to_check, host=host, port=port,
+                              unit_size=unit_size, unit_timeout=unit_timeout, evaluator=evaluator)
+    workers: List[mp.Process] = []
+
+    def start_local_workers(listening_port: int):
+        for i in range(local_workers):
+            worker = mp.Process(target=run_worker, args=(host, listening_port), kwargs={"processes": 0, "name": f"local-{i}"}, daemon=True)
+            worker.start()
+            workers.append(worker)
+
+    try:
+        return coordinator.run(start_local_workers)
+    finally:
+        for worker in workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distributed exact enumeration: one coordinator, any amount of workers")
+    subparsers = parser.add_subparsers(dest="role", required=True)
+    coordinator_parser = subparsers.add_parser("coordinator")
+    coordinator_parser.add_argument("--players", required=True, help="Comma separated hole cards, e.g. AhKh,QsQd,JcJd")
+    coordinator_parser.add_argument("--board", default="")
+    coordinator_parser.add_argument("--division", type=int, default=1)
+    coordinator_parser.add_argument("--numerators", help="Comma separated numerators to check, all of them if left out")
+    coordinator_parser.add_argument("--host", default=DEFAULT_HOST)
+    coordinator_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    coordinator_parser.add_argument("--unit-size", type=int, default=DEFAULT_UNIT_SIZE)
+    coordinator_parser.add_argument("--unit-timeout", type=float, default=DEFAULT_UNIT_TIMEOUT)
+    coordinator_parser.add_argument("--local-workers", type=int, default=0)
+    worker_parser = subparsers.add_parser("worker")
+    worker_parser.add_argument("--host", default=DEFAULT_HOST)
+    worker_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    worker_parser.add_argument("--processes", type=int, help="Local worker processes, 0 counts in this process")
+    args = parser.parse_args()
+
+    if args.role == "worker":
+        print(f"Worker counted {run_worker(args.host, args.port, args.processes)} units")
+    else:
+        all_player_cards = [cards_from_str(player) for player in args.players.split(",")]
+        numerators = [int(numerator) for numerator in args.numerators.split(",")] if args.numerators else None
+        win_percentages, tie_percentages, player_wins, player_ties, equities = calc_odds_distributed(
+            all_player_cards, cards_from_str(args.board), args.division, numerators, host=args.host, port=args.port,
+            local_workers=args.local_workers, unit_size=args.unit_size, unit_timeout=args.unit_timeout
+        )
+        print(get_results_str(all_player_cards, win_percentages, tie_percentages, player_wins, player_ties, equities))
@@ -0,0 +1,258 @@
+"""
+Long-lived calculation engine that owns a warm process pool.
+
+Creating a Pool per calc_odds call means every refinement round pays for process startup and imports again.
+The engine keeps one pool alive instead. The job context (players, table) is pickled once per job into a file in the
+engine's job directory, and tasks only carry the job id. Every worker loads a context the first time it sees its id
+and keeps it, so a worker that is busy, new or restarted by the pool simply loads the context with its next task.
+"""
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Optional
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import itertools
+import multiprocessing as mp
+import os
+import pickle
+import queue
+import shutil
+import tempfile
+import threading
+import weakref
+from multiprocessing import Pool
+from .planner import PROCESS, SERIAL, THREAD
+
+# Amount of job contexts every worker keeps loaded (and the engine keeps on disk), oldest gets dropped first.
+# Workers load a dropped context again if needed, the engine only drops the files of jobs without running tasks
+MAX_JOB_CONTEXTS = 64
+
+_NO_ITEM = object()
+
+# Set in every worker by the pool initializer
+_worker_job_directory: Optional[str] = None
+_worker_job_contexts: "OrderedDict[int, Any]" = OrderedDict()
+
+def _get_job_path(job_directory: str, job_id: int) -> str:
+    return os.path.join(job_directory, f"{job_id}.pickle")
+
+def _init_worker(job_directory: str):
+    global _worker_job_directory
+    _worker_job_directory = job_directory
+
+def _get_worker_job_context(job_id: int) -> Any:
+    if job_id in _worker_job_contexts:
+        _worker_job_contexts.move_to_end(job_id)
+        return _worker_job_contexts[job_id]
+    with open(_get_job_path(_worker_job_directory, job_id), "rb") as file:
+        context = pickle.load(file)
+    _worker_job_contexts[job_id] = context
+    while len(_worker_job_contexts) > MAX_JOB_CONTEXTS:
+        _worker_job_contexts.popitem(last=False)
+    return context
+
+def _run_job_task(task):
+    func, job_id, item = task
+    return func(_get_worker_job_context(job_id), item)
+
+
+class CalculationEngine:
+    """
+    Owns a warm worker pool, reused across calculations until close() is called.
+    Tasks are functions taking (job context, item), the context is sent to every worker once per job, not with every task.
+    """
+    def __init__(self, processes: Optional[int] = None):
+        # One core free, never 0 cores
+        self.processes = processes if processes else max(1, mp.cpu_count() - 1)
+        self._job_directory = tempfile.mkdtemp(prefix="poker_engine_")
+        self._remove_job_directory = weakref.finalize(self, shutil.rmtree, self._job_directory, True)
+        self._pool = Pool(processes=self.processes, initializer=_init_worker, initargs=(self._job_directory,))
+        self._job_counter = itertools.count()
+        # context -> job id, and the amount of running map / imap_unordered calls per job id
+        self._jobs: "OrderedDict[Hashable, int]" = OrderedDict()
+        self._job_users: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _use_job(self, context: Hashable) -> Iterator[int]:
+        """Job id of the context while its tasks run, the context is pickled only the first time it's used."""
+        with self._lock:
+            job_id = self._jobs.get(context)
+            if job_id is None:
+                job_id = next(self._job_counter)
+                # Renamed once complete, so workers never see a partly written file
+                path = _get_job_path(self._job_directory, job_id)
+                with open(path + ".tmp", "wb") as file:
+                    pickle.dump(context, file, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(path + ".tmp", path)
+                self._jobs[context] = job_id
+            self._jobs.move_to_end(context)
+            self._job_users[job_id] = self._job_users.get(job_id, 0) + 1
+        try:
+            yield job_id
+        finally:
+            with self._lock:
+                self._job_users[job_id] -= 1
+                if not self._job_users[job_id]:
+                    del self._job_users[job_id]
+                self._drop_old_jobs()
+
+    def _drop_old_jobs(self):
+        # Oldest first, jobs with running tasks are kept even if that means more than MAX_JOB_CONTEXTS
+        for context, job_id in list(self._jobs.items()):
+            if len(self._jobs) <= MAX_JOB_CONTEXTS:
+                return
+            if job_id not in self._job_users:
+                del self._jobs[context]
+                os.remove(_get_job_path(self._job_directory, job_id))
+
+    def map(self, func: Callable[[Any, Any], Any], context: Hashable, items: Iterable[Any]) -> List[Any]:
+        with self._use_job(context) as job_id:
+            return self._pool.map(_run_job_task, [(func, job_id, item) for item in items])
+
+    def imap_unordered(self, func: Callable[[Any, Any], Any], context: Hashable, items: Iterable[Any], max_in_flight: Optional[int] = None) -> Iterator[Any]:
+        """
+        Yields results as they finish. Unlike Pool.imap_unordered, items are only pulled from the (lazy) iterable
+        when a task slot frees up, so at most max_in_flight items exist at the same time.
+        """
+        with self._use_job(context) as job_id:
+            if max_in_flight is None:
+                max_in_flight = self.processes * 2
+            finished: "queue.Queue" = queue.Queue()
+            items_iterator = iter(items)
+            items_left = True
+            pending = 0
+
+            while True:
+                while items_left and pending < max_in_flight:
+                    item = next(items_iterator, _NO_ITEM)
+                    if item is _NO_ITEM:
+                        items_left = False
+                        break
+                    self._pool.apply_async(
+                        _run_job_task, ((func, job_id, item),),
+                        callback=lambda result: finished.put((True, result)),
+                        error_callback=lambda error: finished.put((False, error))
+                    )
+                    pending += 1
+
+                if pending == 0:
+                    return
+                succeeded, result = finished.get()
+                pending -= 1
+                if not succeeded:
+                    raise result
+                yield result
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+        self._remove_job_directory()
+
+    def terminate(self):
+        self._pool.terminate()
+        self._pool.join()
+        self._remove_job_directory()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
+
+
+class SerialEngine:
+    """
+    Same interface as CalculationEngine, but runs every task in the calling thread.
+    For jobs so small that handing them to other workers costs more than the work itself.
+    """
+    processes = 1
+
+    def map(self, func: Callable[[Any, Any], Any], context: Hashable, items: Iterable[Any]) -> List[Any]:
+        return [func(context, item) for item in items]
+
+    def imap_unordered(self, func: Callable[[Any, Any], Any], context: Hashable, items: Iterable[Any], max_in_flight: Optional[int] = None) -> Iterator[Any]:
+        for item in items:
+            yield func(context, item)
+
+    def close(self):
+        pass
+
+    def terminate(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ThreadEngine:
+    """
+    Same interface as CalculationEngine, backed by a thread pool: no process startup and no pickling,
+    but only runs in parallel where the GIL is released (or disabled).
+    """
+    def __init__(self, threads: Optional[int] = None):
+        self.processes = threads if threads else max(1, mp.cpu_count() - 1)
+        self._executor = ThreadPoolExecutor(max_workers=self.processes)
+
+    def map(self, func: Callable[[Any, Any], Any], context: Hashable, items: Iterable[Any]) -> List[Any]:
+        return list(self._executor.map(lambda item: func(context, item), items))
+
+    def imap_unordered(self, func: Callable[[Any, Any], Any], context: Hashable, items: Iterable[Any], max_in_flight: Optional[int] = None) -> Iterator[Any]:
+        if max_in_flight is None:
+            max_in_flight = self.processes * 2
+        items_iterator = iter(items)
+        items_left = True
+        pending = set()
+
+        while True:
+            while items_left and len(pending) < max_in_flight:
+                item = next(items_iterator, _NO_ITEM)
+                if item is _NO_ITEM:
+                    items_left = False
+                    break
+                pending.add(self._executor.submit(func, context, item))
+
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def terminate(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
+
+
+@contextmanager
+def engine_for_plan(plan, engine: Optional[CalculationEngine] = None):
+    """
+    Engine to run a planned job on. Process plans use the given warm engine and leave it open,
+    everything else (and process plans without an engine) gets a new engine of the planned backend, closed on exit.
+    """
+    if plan.backend == PROCESS and engine is not None:
+        yield engine
+        return
+    if plan.backend == SERIAL:
+        new_engine = SerialEngine()
+    elif plan.backend == THREAD:
+        new_engine = ThreadEngine()
+    else:
+        new_engine = CalculationEngine()
+    with new_engine:
+        yield new_engine
@@ -0,0 +1,129 @@
+"""
+Hand-vs-hand equity matrix: the equity of each of the 1326 hole card combos against every other combo on a fixed flop or turn.
+
+The runouts are enumerated once. For each runout all 1326 combos are evaluated at once with the numpy evaluator,
+and the pairwise win counts are accumulated in a single comparison of every combo against every other.
+Only wins are stored. For two compatible combos every runout is a win, loss or tie, so ties = runouts - wins - the reverse wins.
+Needs numpy.
+"""
+from typing import Dict, List, Optional
+import itertools
+import math
+import time
+from .card import Card, cards_to_mask, popcount
+from .all_cards import get_runout_cards
+from .combinatorics import iter_combination_masks, split_index_ranges
+from .batch_evaluator import evaluate_board_masks, np, require_numpy
+from .engine import CalculationEngine, engine_for_plan
+from .planner import plan_execution
+
+# All 1326 combos in id order, the row / column order of the matrix
+ALL_COMBOS: List[int] = [(1 << card1) | (1 << card2) for card1, card2 in itertools.combinations(range(52), 2)]
+_COMBO_INDICES: Dict[int, int] = {combo: i for i, combo in enumerate(ALL_COMBOS)}
+
+# Runouts evaluated per array operation
+RUNOUT_CHUNK_SIZE = 64
+
+
+def get_combo_index(cards: List[Card]) -> int:
+    """Row / column of a two card hand in the matrix."""
+    return _COMBO_INDICES[cards_to_mask(cards)]
+
+
+class EquityMatrix:
+    """
+    wins[i, j] = runouts on which combo i beats combo j (uint16, rows / columns in ALL_COMBOS order),
+    runouts = amount of runouts every compatible pair is dealt. Pairs sharing a card with each other or the table stay 0.
+    """
+    def __init__(self, table_mask: int, wins, runouts: int, elapsed: float = 0.0):
+        self.table_mask = table_mask
+        self.wins = wins
+        self.runouts = runouts
+        self.elapsed = elapsed
+
+    def get_compatible(self):
+        """Boolean matrix, True where both combos can be dealt together on this table."""
+        combos = np.array(ALL_COMBOS, dtype=np.int64)
+        live = (combos & self.table_mask) == 0
+        return ((combos[:, None] & combos[None, :]) == 0) & live[:, None] & live[None, :]
+
+    def get_ties(self):
+        compatible = self.get_compatible()
+        ties = self.runouts - self.wins.astype(np.int32) - self.wins.T.astype(np.int32)
+        return np.where(compatible, ties, 0).astype(np.uint16)
+
+    def get_equities(self):
+        """Equity of the row combo against the column combo in percent (float32), NaN for incompatible pairs."""
+        equities = (self.wins.astype(np.float32) + self.get_ties() / 2) / self.runouts * 100
+        return np.where(self.get_compatible(), equities, np.nan).astype(np.float32)
+
+    def get_equity(self, player_cards: List[Card], opponent_cards: List[Card]) -> float:
+        i, j = get_combo_index(player_cards), get_combo_index(opponent_cards)
+        ties = self.runouts - int(self.wins[i, j]) - int(self.wins[j, i])
+        return (int(self.wins[i, j]) + ties / 2) / self.runouts * 100
+
+    def save(self, path: str):
+        np.savez_compressed(path, wins=self.wins, table_mask=np.array(self.table_mask, dtype=np.int64), runouts=np.array(self.runouts))
+
+def load_equity_matrix(path: str) -> EquityMatrix:
+    require_numpy()
+    with np.load(path) as data:
+        return EquityMatrix(int(data["table_mask"]), data["wins"], int(data["runouts"]))
+
+
+def process_job_matrix_runouts(job_context, index_ranges):
+    """Worker task: win counts of every combo against every combo over the runouts of the index ranges."""
+    table_mask, = job_context
+    available_cards, remaining_cards = get_runout_cards(table_mask)
+    combos = np.array(ALL_COMBOS, dtype=np.int64)
+    # Rows that can't be dealt never beat anything, columns that can't be dealt are never beaten
+    dead_row = np.int32(-1)
+    dead_column = np.int32(1 << 30)
+
+    wins = np.zeros((len(ALL_COMBOS), len(ALL_COMBOS)), dtype=np.uint16)
+    runouts = np.fromiter(
+        (table_mask | additional_cards_mask for start, end in index_ranges
+         for additional_cards_mask in iter_combination_masks(available_cards, remaining_cards, start, end)),
+        dtype=np.int64
+    )
+    for chunk_start in range(0, len(runouts), RUNOUT_CHUNK_SIZE):
+        board_masks = runouts[chunk_start:chunk_start + RUNOUT_CHUNK_SIZE]
+        all_strengths = evaluate_board_masks(board_masks, ALL_COMBOS).astype(np.int32)
+        for board_mask, strengths in zip(board_masks, all_strengths):
+            dead = (combos & board_mask) != 0
+            row_strengths = np.where(dead, dead_row, strengths)
+            column_strengths = np.where(dead, dead_column, strengths)
+            np.add(wins, row_strengths[:, None] > column_strengths[None, :], out=wins, casting="unsafe")
+    # Combos sharing a card are never dealt together
+    wins[(combos[:, None] & combos[None, :]) != 0] = 0
+    return wins, len(runouts)
+
+
+def equity_matrix(table_cards: List[Card], engine: Optional[CalculationEngine] = None, backend: Optional[str] = None) -> EquityMatrix:
+    """
+    EquityMatrix for a flop or turn (3 or 4 table cards). Each worker sums the wins of its share of the runouts.
+    """
+    require_numpy()
+    table_mask = cards_to_mask(table_cards)
+    if len(table_cards) not in (3, 4) or popcount(table_mask) != len(table_cards):
+        raise ValueError("equity_matrix needs 3 or 4 different table cards")
+
+    total_runouts = math.comb(52 - len(table_cards), 5 - len(table_cards))
+    plan = plan_execution(total_runouts, len(ALL_COMBOS), backend=backend, has_warm_engine=engine is not None)
+    print(f"Execution plan: {plan}")
+
+    start_time = time.time()
+    wins = np.zeros((len(ALL_COMBOS), len(ALL_COMBOS)), dtype=np.uint16)
+    runouts_done = 0
+    with engine_for_plan(plan, engine) as engine:
+        # One share of the runouts per worker, every task returns a whole matrix
+        shard_size = max(1, math.ceil(total_runouts / engine.processes))
+        for task_wins, task_runouts in engine.imap_unordered(process_job_matrix_runouts, (table_mask,), split_index_ranges([(0, total_runouts)], shard_size)):
+            wins += task_wins
+            runouts_done += task_runouts
+    if runouts_done != total_runouts:
+        raise RuntimeError(f"Counted {runouts_done} runouts, expected {total_runouts}")
+
+    # Every compatible pair is dealt on the runouts avoiding both combos
+    pair_runouts = math.comb(52 - len(table_cards) - 4, 5 - len(table_cards))
+    return EquityMatrix(table_mask, wins, pair_runouts, time.time() - start_time)
@@ -0,0 +1,180 @@
+"""
+Lookup-table hand evaluator.
+
+Hands are card set masks (see card.py): bits 0-12 hold the clubs (two to ace),
+bits 13-25 the diamonds, 26-38 the hearts and 39-51 the spades. A 5, 6 or 7 card
+hand is evaluated with a handful of table lookups:
+- each 13-bit suit mask is looked up in a flush table (0 if the suit has fewer than 5 cards)
+- otherwise the rank multiset of the hand is turned into an additive base-5 key
+  (one lookup per suit mask) and looked up in the rank-pattern table.
+
+The result is a single integer strength, higher is better, equal means tie.
+Strength layout (4 bits per field, same fields as HandValue):
+type << 24 | high_card_in_type << 20 | second_high_card_in_type << 16 | high_cards[0..3]
+"""
+from typing import Dict, List, Sequence, Tuple
+from .card import Card, SUIT_BITS, cards_to_mask
+from .hand_value import HandType, pack_strength
+
+SUIT_MASK = (1 << SUIT_BITS) - 1
+
+def get_strength_type(strength: int) -> HandType:
+    return HandType(strength >> 24)
+
+
+def _ranks_desc(rank_mask: int) -> List[int]:
+    # Rank values (2-14) present in a 13-bit rank mask, highest first
+    return [i + 2 for i in range(SUIT_BITS - 1, -1, -1) if rank_mask >> i & 1]
+
+def _straight_high(rank_mask: int) -> int:
+    # Highest card of the best straight in a 13-bit rank mask, 0 if there is none
+    for high in range(SUIT_BITS - 1, 3, -1):
+        window = 0b11111 << (high - 4)
+        if rank_mask & window == window:
+            return high + 2
+    # Wheel (A,5,4,3,2)
+    wheel = (1 << 12) | 0b1111
+    if rank_mask & wheel == wheel:
+        return 5
+    return 0
+
+def _flush_strength(suit_mask: int) -> int:
+    straight_flush_high = _straight_high(suit_mask)
+    if straight_flush_high:
+        hand_type = HandType.ROYAL_FLUSH if straight_flush_high == 14 else HandType.STRAIGHT_FLUSH
+        return pack_strength(hand_type.value, straight_flush_high, 0, [])
+    flush_ranks = _ranks_desc(suit_mask)[:5]
+    return pack_strength(HandType.FLUSH.value, flush_ranks[0], 0, flush_ranks[1:])
+
+def _rank_pattern_strength(rank_counts: List[int]) -> int:
+    """
+    Best non-flush hand for a multiset of ranks, rank_counts[i] being the amount of cards of rank i + 2.
+    """
+    ranks_by_count: Dict[int, List[int]] = {1: [], 2: [], 3: [], 4: []}
+    present_ranks: List[int] = []
+    rank_mask = 0
+    for i in range(SUIT_BITS - 1, -1, -1):
+        if rank_counts[i]:
+            ranks_by_count[rank_counts[i]].append(i + 2)
+            present_ranks.append(i + 2)
+            rank_mask |= 1 << i
+
+    def kickers(excluded, amount):
+        return [rank for rank in present_ranks if rank not in excluded][:amount]
+
+    quads, trips, pairs = ranks_by_count[4], ranks_by_count[3], ranks_by_count[2]
+    if quads:
+        return pack_strength(HandType.FOUR_OF_A_KIND.value, quads[0], 0, kickers([quads[0]], 1))
+    if trips and (len(trips) > 1 or pairs):
+        pair_rank = max(trips[1:] + pairs[:1])
+        return pack_strength(HandType.FULL_HOUSE.value, trips[0], pair_rank, [])
+    straight_high = _straight_high(rank_mask)
+    if straight_high:
+        return pack_strength(HandType.STRAIGHT.value, straight_high, 0, [])
+    if trips:
+        return pack_strength(HandType.THREE_OF_A_KIND.value, trips[0], 0, kickers([trips[0]], 2))
+    if len(pairs) >= 2:
+        return pack_strength(HandType.TWO_PAIR.value, pairs[0], pairs[1], kickers(pairs[:2], 1))
+    if pairs:
+        return pack_strength(HandType.PAIR.value, pairs[0], 0, kickers([pairs[0]], 3))
+    return pack_strength(HandType.HIGH_CARD.value, present_ranks[0], 0, present_ranks[1:5])
+
+
+def _build_tables():
+    rank_weights = [5 ** i for i in range(SUIT_BITS)]
+
+    # Per 13-bit suit mask: its contribution to the base-5 rank key and its flush strength
+    rank_keys = [0] * (1 << SUIT_BITS)
+    flush_table = [0] * (1 << SUIT_BITS)
+    for mask in range(1, 1 << SUIT_BITS):
+        low_bit = (mask & -mask).bit_length() - 1
+        rank_keys[mask] = rank_keys[mask & (mask - 1)] + rank_weights[low_bit]
+        if bin(mask).count("1") >= 5:
+            flush_table[mask] = _flush_strength(mask)
+
+    # Every multiset of 5 to 7 ranks with at most 4 cards per rank
+    rank_table: Dict[int, int] = {}
+    rank_counts = [0] * SUIT_BITS
+
+    def fill(rank_index: int, cards_left: int, key: int, total: int):
+        if rank_index == SUIT_BITS:
+            if total >= 5:
+                rank_table[key] = _rank_pattern_strength(rank_counts)
+            return
+        for count in range(min(4, cards_left) + 1):
+            rank_counts[rank_index] = count
+            fill(rank_index + 1, cards_left - count, key + count * rank_weights[rank_index], total + count)
+        rank_counts[rank_index] = 0
+
+    fill(0, 7, 0, 0)
+    return rank_keys, flush_table, rank_table
+
+_RANK_KEYS, _FLUSH_TABLE, _RANK_TABLE = _build_tables()
+_SUIT_CARD_COUNTS = [bin(mask).count("1") for mask in range(1 << SUIT_BITS)]
+
+def get_lookup_tables():
+    """
+    (rank key per 13-bit suit mask, flush strength per 13-bit suit mask, rank key -> strength), for other evaluator backends.
+    """
+    return _RANK_KEYS, _FLUSH_TABLE, _RANK_TABLE
+
+
+def evaluate_mask(mask: int) -> int:
+    """
+    Strength of the best 5-card hand within a card set of 5 to 7 cards.
+    """
+    clubs = mask & SUIT_MASK
+    diamonds = (mask >> 13) & SUIT_MASK
+    hearts = (mask >> 26) & SUIT_MASK
+    spades = mask >> 39
+    flush = _FLUSH_TABLE[clubs] or _FLUSH_TABLE[diamonds] or _FLUSH_TABLE[hearts] or _FLUSH_TABLE[spades]
+    if flush:
+        return flush
+    return _RANK_TABLE[_RANK_KEYS[clubs] + _RANK_KEYS[diamonds] + _RANK_KEYS[hearts] + _RANK_KEYS[spades]]
+
+def evaluate(cards: List[Card]) -> int:
+    return evaluate_mask(cards_to_mask(cards))
+
+
+def get_rank_key(mask: int) -> int:
+    """Additive base-5 rank key of a card set, the key of a union of disjoint sets is the sum of their keys."""
+    return _RANK_KEYS[mask & SUIT_MASK] + _RANK_KEYS[(mask >> 13) & SUIT_MASK] + _RANK_KEYS[(mask >> 26) & SUIT_MASK] + _RANK_KEYS[mask >> 39]
+
+def prepare_board(board_mask: int) -> Tuple[int, int, int]:
+    """
+    Everything about a board of up to 5 cards that evaluate_with_board needs, computed once per board:
+    (rank key, bit offset of the only suit that can still become a flush with 2 hole cards or -1, that suit's rank mask).
+    """
+    rank_key = 0
+    flush_shift = -1
+    flush_suit_mask = 0
+    for shift in (0, 13, 26, 39):
+        suit_mask = (board_mask >> shift) & SUIT_MASK
+        rank_key += _RANK_KEYS[suit_mask]
+        # A flush needs at least 3 of the suit on the board, with up to 5 board cards only one suit can have that
+        if _SUIT_CARD_COUNTS[suit_mask] >= 3:
+            flush_shift = shift
+            flush_suit_mask = suit_mask
+    return rank_key, flush_shift, flush_suit_mask
+
+def evaluate_with_board(prepared_board: Tuple[int, int, int], hole_mask: int, hole_rank_key: int) -> int:
+    """
+    Same as evaluate_mask(board_mask | hole_mask), with the board part from prepare_board and hole_rank_key = get_rank_key(hole_mask):
+    at most one flush lookup plus one rank lookup per player.
+    """
+    rank_key, flush_shift, flush_suit_mask = prepared_board
+    if flush_shift >= 0:
+        flush = _FLUSH_TABLE[flush_suit_mask | (hole_mask >> flush_shift) & SUIT_MASK]
+        if flush:
+            return flush
+    return _RANK_TABLE[rank_key + hole_rank_key]
+
+def evaluate_players(board_mask: int, all_player_masks: Sequence[int], all_player_rank_keys: Sequence[int]) -> List[int]:
+    """Strengths of all players on one board, the board is prepared once and each player's hole cards are applied to it."""
+    rank_key, flush_shift, flush_suit_mask = prepare_board(board_mask)
+    if flush_shift < 0:
+        return [_RANK_TABLE[rank_key + player_rank_key] for player_rank_key in all_player_rank_keys]
+    return [
+        _FLUSH_TABLE[flush_suit_mask | (player_mask >> flush_shift) & SUIT_MASK] or _RANK_TABLE[rank_key + player_rank_key]
+        for player_mask, player_rank_key in zip(all_player_masks, all_player_rank_keys)
+    ]
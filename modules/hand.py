@@ -3,6 +3,41 @@ from collections import Counter, defaultdict
 from .card import Suit, CardNumber, Card
 from .hand_value import HandValue, HandType
 
+def _insert_descending(cards: List[Card], card: Card):
+    # Keeps a list sorted by rank (descending), lists are at most 7 cards long
+    number = card.number
+    i = 0
+    while i < len(cards) and cards[i].number >= number:
+        i += 1
+    cards.insert(i, card)
+
+def _copy_counter(counter: Counter) -> Counter:
+    # dict.update skips Counter's Python-level update, copying is a large part of building a Hand from a Board
+    copied: Counter = Counter()
+    dict.update(copied, counter)
+    return copied
+
+
+class Board:
+    """
+    The table cards shared by all players, with the rank / suit structures of Hand built once per board.
+    Hand.from_board then only applies a player's 2 hole cards to copies of them.
+    """
+    def __init__(self, cards : List[Card]):
+        self.cards: List[Card] = sorted(cards, key=lambda card: card.number, reverse=True)
+        self.rank_counts: Counter[CardNumber] = Counter(card.number for card in self.cards)
+        self.suit_counts: Counter[Suit] = Counter(card.suit for card in self.cards)
+        # self.cards is already sorted, so every suit list is too
+        self.cards_by_suit: Dict[Suit, List[Card]] = defaultdict(list)
+        for card in self.cards:
+            self.cards_by_suit[card.suit].append(card)
+        self.unique_ranks: List[CardNumber] = sorted(self.rank_counts.keys(), reverse=True)
+        # Bit i set if rank i + 2 is present, for the straight check
+        self.rank_mask = 0
+        for card in self.cards:
+            self.rank_mask |= 1 << (card.number - 2)
+
+
 class Hand:
     def __init__(self, cards : List[Card]):
         if len(cards) != 7:
@@ -24,10 +59,44 @@ class Hand:
 
         # Unique ranks present, sorted descending
         self.unique_ranks: List[CardNumber] = sorted(self.rank_counts.keys(), reverse=True)
+        self.rank_mask = 0
+        for rank in self.unique_ranks:
+            self.rank_mask |= 1 << (rank - 2)
 
         # Initialize lookup for rank-based hands (will be populated only if needed)
         self.counts_to_values: Optional[Dict[int, List[CardNumber]]] = None
 
+    @classmethod
+    def from_board(cls, board: Board, hole_cards: List[Card]) -> "Hand":
+        """
+        Same Hand as Hand(hole_cards + board.cards), built from the board's precomputed structures:
+        only the 2 hole cards are inserted, the suit lists they don't touch are shared with the board.
+        """
+        if len(board.cards) + len(hole_cards) != 7:
+            raise ValueError("Hold'em requires 7 cards for evaluation")
+        hand = cls.__new__(cls)
+        hand.cards = board.cards.copy()
+        hand.rank_counts = _copy_counter(board.rank_counts)
+        hand.suit_counts = _copy_counter(board.suit_counts)
+        hand.cards_by_suit = defaultdict(list, board.cards_by_suit)
+        hand.unique_ranks = board.unique_ranks.copy()
+        hand.rank_mask = board.rank_mask
+        for card in hole_cards:
+            _insert_descending(hand.cards, card)
+            if card.number not in hand.rank_counts:
+                i = 0
+                while i < len(hand.unique_ranks) and hand.unique_ranks[i] > card.number:
+                    i += 1
+                hand.unique_ranks.insert(i, card.number)
+            hand.rank_counts[card.number] += 1
+            hand.suit_counts[card.suit] += 1
+            suit_cards = hand.cards_by_suit[card.suit].copy()
+            _insert_descending(suit_cards, card)
+            hand.cards_by_suit[card.suit] = suit_cards
+            hand.rank_mask |= 1 << (card.number - 2)
+        hand.counts_to_values = None
+        return hand
+
 
     def _initialize_rank_based_lookup(self):
         """
@@ -79,6 +148,21 @@ class Hand:
         return False, None
 
 
+    def _check_straight_mask(self, rank_mask: int) -> Tuple[bool, Optional[CardNumber]]:
+        # Same as _check_straight, on a rank mask (bit i = rank i + 2): one AND per possible straight
+        for high in range(14, 5, -1):
+            window = 0b11111 << (high - 6)
+            if rank_mask & window == window:
+                return True, CardNumber(high)
+
+        # Check for (A,5,4,3,2)
+        wheel = (1 << 12) | 0b1111
+        if rank_mask & wheel == wheel:
+            return True, CardNumber.FIVE
+
+        return False, None
+
+
     def _check_sf_flush_and_straight(self, highest_win_type : HandType) -> Optional[HandValue]:
         for suit in self.suit_counts:
             if self.suit_counts[suit] >= 5:
@@ -102,8 +186,8 @@ class Hand:
         if highest_win_type >= HandType.FLUSH:
             return None
 
-        # No flush found, check for regular Straight using all unique ranks
-        is_straight, straight_high_card = self._check_straight(self.unique_ranks)
+        # No flush found, check for regular Straight using the mask of all unique ranks
+        is_straight, straight_high_card = self._check_straight_mask(self.rank_mask)
         if is_straight:
             return HandValue(HandType.STRAIGHT.value, straight_high_card, None, [])
 
@@ -19,36 +19,38 @@ class HandType(IntEnum):
         # Map the enum value to the corresponding poker hand name
         return str(poker_hands[self.value + 1])
 
+def pack_strength(type_value: int, high_card_in_type: int, second_high_card_in_type: int, high_cards: List[int]) -> int:
+    """
+    Packs a hand value into one int (4 bits per field), so comparing two hands is a single int comparison:
+    type << 24 | high_card_in_type << 20 | second_high_card_in_type << 16 | high_cards[0..3]
+    """
+    strength = (type_value << 24) | (high_card_in_type << 20) | (second_high_card_in_type << 16)
+    for i, rank in enumerate(high_cards):
+        strength |= rank << (12 - 4 * i)
+    return strength
+
 class HandValue:
+    __slots__ = ("type_value", "high_card_in_type_value", "second_high_card_in_type_value", "high_cards", "packed")
     type_value : int
     high_card_in_type_value : int
     second_high_card_in_type_value : int
     high_cards : List[int]
+    packed : int
     def __init__(self, type_value : int, high_card_in_type_value : int, second_high_card_in_type_value : int, high_cards : List[int]):
         self.type_value = type_value
         self.high_card_in_type_value = high_card_in_type_value
         # For 2 pairs and full house
         self.second_high_card_in_type_value = second_high_card_in_type_value
         self.high_cards = high_cards
+        # Same layout as the lookup-table evaluator's strengths, the fields above are kept for display
+        self.packed = pack_strength(type_value, high_card_in_type_value or 0, second_high_card_in_type_value or 0, high_cards)
 
-    def compare_high_card_lists(self, list1, list2):
-        for i in range(len(list1)):
-            if list1[i] != list2[i]:
-                return list1[i] - list2[i]
-        return 0
-
-    def compare_to(self, other) -> float:
-        if self.type_value != other.type_value:
-            return self.type_value - other.type_value
-        if self.high_card_in_type_value != other.high_card_in_type_value:
-            return self.high_card_in_type_value - other.high_card_in_type_value
-        if self.second_high_card_in_type_value != other.second_high_card_in_type_value:
-            return self.second_high_card_in_type_value - other.second_high_card_in_type_value
-        return self.compare_high_card_lists(self.high_cards, other.high_cards)
+    def compare_to(self, other) -> int:
+        return self.packed - other.packed
     
     def __str__(self):
         Type = f'Type: {poker_hands[self.type_value].name}'
-        high_card_in_type = second_high_card_in_type = ''
+        high_card_in_type = second_high_card_in_type = high_cards = ''
         if self.high_card_in_type_value:
             high_card_in_type = f', High card in type: {CardNumber(self.high_card_in_type_value).name}'
         
@@ -59,19 +61,22 @@ class HandValue:
         return f'{Type}{high_card_in_type}{second_high_card_in_type}{high_cards}'
 
     def __eq__(self, other):
-        return self.compare_to(other) == 0
+        return self.packed == other.packed
     
     def __ne__(self, other):
-        return self.compare_to(other) != 0
+        return self.packed != other.packed
     
     def __lt__(self, other):
-        return self.compare_to(other) < 0
+        return self.packed < other.packed
     
     def __le__(self, other):
-        return self.compare_to(other) <= 0
+        return self.packed <= other.packed
     
     def __gt__(self, other):
-        return self.compare_to(other) > 0
+        return self.packed > other.packed
     
     def __ge__(self, other):
-        return self.compare_to(other) >= 0
+        return self.packed >= other.packed
+
+    def __hash__(self):
+        return self.packed
@@ -0,0 +1,154 @@
+"""
+Suit isomorphism for table cards.
+
+A suit permutation that maps every player's hole cards (and the current table cards) onto themselves
+can't change who wins, so all boards it maps onto each other give identical results.
+Those permutations are exactly the ones that only swap suits playing the same role,
+i.e. suits in which every player and the table hold the same ranks. Suits are grouped into such blocks,
+and a board is canonical when its 13-bit suit masks are non-increasing within each block.
+"""
+from typing import Dict, Iterator, List, Sequence, Tuple
+from math import factorial
+from .card import SUIT_BITS, popcount
+from .combinatorics import get_index_ranges
+from .all_cards import get_available_card_masks, iter_sampled_table_cards_by_division
+import itertools
+import math
+
+SUIT_MASK = (1 << SUIT_BITS) - 1
+
+
+def get_suit_chunks(mask: int) -> List[int]:
+    return [(mask >> (suit * SUIT_BITS)) & SUIT_MASK for suit in range(4)]
+
+def get_suit_blocks(fixed_masks: Sequence[int]) -> List[List[int]]:
+    """
+    Groups the suits (0-3) that are interchangeable given the fixed card sets (players' hole cards, table cards, dead cards).
+    """
+    blocks: Dict[Tuple[int, ...], List[int]] = {}
+    for suit in range(4):
+        signature = tuple((mask >> (suit * SUIT_BITS)) & SUIT_MASK for mask in fixed_masks)
+        blocks.setdefault(signature, []).append(suit)
+    return list(blocks.values())
+
+def get_symmetry_count(suit_blocks: List[List[int]]) -> int:
+    """Amount of suit permutations that fix all players, the largest possible shrink factor (1-24)."""
+    count = 1
+    for block in suit_blocks:
+        count *= factorial(len(block))
+    return count
+
+def canonicalize_board(board_mask: int, suit_blocks: List[List[int]]) -> int:
+    chunks = get_suit_chunks(board_mask)
+    canonical_mask = 0
+    for block in suit_blocks:
+        if len(block) == 1:
+            canonical_mask |= chunks[block[0]] << (block[0] * SUIT_BITS)
+            continue
+        for suit, chunk in zip(block, sorted((chunks[s] for s in block), reverse=True)):
+            canonical_mask |= chunk << (suit * SUIT_BITS)
+    return canonical_mask
+
+def get_orbit_size(canonical_mask: int, suit_blocks: List[List[int]]) -> int:
+    """Amount of distinct boards the canonical board stands for."""
+    chunks = get_suit_chunks(canonical_mask)
+    orbit_size = 1
+    for block in suit_blocks:
+        orbit_size *= factorial(len(block))
+        for group in itertools.groupby(chunks[suit] for suit in block):
+            orbit_size //= factorial(len(list(group[1])))
+    return orbit_size
+
+
+def iter_canonical_boards(current_table_mask: int, all_unused_mask: int, suit_blocks: List[List[int]]) -> Iterator[Tuple[int, int]]:
+    """
+    Yields (canonical board mask, orbit size) for every class of completed boards, without visiting the other members.
+    """
+    remaining_cards = 5 - popcount(current_table_mask)
+    if remaining_cards <= 0:
+        yield current_table_mask, 1
+        return
+
+    available_chunks = get_suit_chunks(all_unused_mask & ~current_table_mask)
+    suit_order = [suit for block in suit_blocks for suit in block]
+
+    # All subsets of each suit's available ranks with up to remaining_cards cards, highest mask first
+    subsets_by_chunk: Dict[int, List[List[int]]] = {}
+    for chunk in set(available_chunks):
+        rank_bits = [1 << i for i in range(SUIT_BITS) if chunk >> i & 1]
+        subsets_by_chunk[chunk] = [
+            sorted((sum(subset) for subset in itertools.combinations(rank_bits, size)), reverse=True)
+            for size in range(min(remaining_cards, len(rank_bits)) + 1)
+        ]
+
+    block_positions = [position for block in suit_blocks for position in range(1, len(block) + 1)]
+
+    # orbit is the multinomial j! / (run lengths!) of the current block so far, times the finished blocks
+    def place(position: int, cards_left: int, board_mask: int, previous_chunk: int, run_length: int, orbit: int):
+        suit = suit_order[position]
+        subsets = subsets_by_chunk[available_chunks[suit]]
+        is_last = position == 3
+        block_position = block_positions[position]
+        for size in range(len(subsets)):
+            if size > cards_left:
+                break
+            if is_last and size != cards_left:
+                continue
+            for chunk in subsets[size]:
+                # A new block has no ordering constraint, inside a block chunks must not increase
+                if block_position == 1:
+                    new_run_length = 1
+                elif chunk > previous_chunk:
+                    continue
+                elif chunk == previous_chunk:
+                    new_run_length = run_length + 1
+                else:
+                    new_run_length = 1
+                new_orbit = orbit * block_position // new_run_length
+                new_board_mask = board_mask | (chunk << (suit * SUIT_BITS))
+                if is_last:
+                    yield new_board_mask, new_orbit
+                else:
+                    yield from place(position + 1, cards_left - size, new_board_mask, chunk, new_run_length, new_orbit)
+
+    yield from place(0, remaining_cards, current_table_mask, SUIT_MASK, 0, 1)
+
+
+def iter_canonical_table_cards_by_division(
+    current_table_mask: int,
+    all_unused_mask: int,
+    division: int,
+    numerators_to_check: List[int],
+    suit_blocks: List[List[int]]
+) -> Iterator[Tuple[int, int]]:
+    """
+    Lazily yields (canonical board mask, count) for the boards get_sampled_table_cards_by_division would return.
+    A sampled canonical board can be yielded more than once, the counts add up.
+    """
+    remaining_cards = 5 - popcount(current_table_mask)
+    available_amount = len(get_available_card_masks(current_table_mask, all_unused_mask))
+    total_combinations = math.comb(available_amount, max(remaining_cards, 0))
+
+    # Whole combination space requested -> generate the classes directly
+    if get_index_ranges(total_combinations, division, numerators_to_check) == [(0, total_combinations)]:
+        yield from iter_canonical_boards(current_table_mask, all_unused_mask, suit_blocks)
+        return
+
+    for board_mask in iter_sampled_table_cards_by_division(current_table_mask, all_unused_mask, division, numerators_to_check):
+        yield canonicalize_board(board_mask, suit_blocks), 1
+
+def get_canonical_table_cards_by_division(
+    current_table_mask: int,
+    all_unused_mask: int,
+    division: int,
+    numerators_to_check: List[int],
+    suit_blocks: List[List[int]]
+) -> Dict[int, Tuple[int, int]]:
+    """
+    Same boards as get_sampled_table_cards_by_division, but merged into one weighted board per suit-isomorphism class.
+    """
+    canonical_dict: Dict[int, Tuple[int, int]] = {}
+    for canonical_mask, count in iter_canonical_table_cards_by_division(current_table_mask, all_unused_mask, division, numerators_to_check, suit_blocks):
+        existing_count = canonical_dict[canonical_mask][1] if canonical_mask in canonical_dict else 0
+        canonical_dict[canonical_mask] = (canonical_mask, existing_count + count)
+    return canonical_dict
@@ -0,0 +1,175 @@
+"""
+Hand strength and hand potential metrics for a hand on a flop or turn, against one random opponent:
+  HS    share of opponent hands the hand is ahead of right now (ties count half)
+  PPot  chance to get ahead by the river when behind now, NPot chance to fall behind when ahead now
+  EHS   effective hand strength, HS * (1 - NPot) + (1 - HS) * PPot
+All four are fractions between 0 and 1.
+
+PPot / NPot need every opponent hand x every runout. Each runout is evaluated once for all opponent combos,
+and any amount of hands on the same table are measured against those same strengths, so measuring a batch of hands
+costs little more than measuring one.
+"""
+from typing import List, Optional
+import math
+import time
+from .card import Card, cards_to_mask, popcount
+from .evaluator import evaluate_players, get_rank_key
+from .all_cards import get_runout_cards
+from .combinatorics import iter_combination_masks, split_index_ranges
+from .batch_evaluator import evaluate_board_masks, np, require_numpy
+from .equity_matrix import ALL_COMBOS
+from .engine import CalculationEngine, engine_for_plan
+from .planner import plan_execution
+from .calculator import EVALUATORS, LOOKUP_EVALUATOR, NUMPY_EVALUATOR
+
+# Indices into the potential table, from the measured hand's point of view
+AHEAD = 0
+TIED = 1
+BEHIND = 2
+
+# Runouts evaluated per array operation with the numpy evaluator
+RUNOUT_CHUNK_SIZE = 64
+
+
+class HandMetrics:
+    """
+    HS / EHS / PPot / NPot of one hand, plus the counts behind them:
+    now_counts[i] = opponent hands the hand is ahead of / tied with / behind now,
+    potential_counts[i][j] = (opponent hand, runout) pairs that are i now and j on the river.
+    """
+    def __init__(self, player_cards: List[Card], now_counts: List[int], potential_counts: List[List[int]]):
+        self.player_cards = player_cards
+        self.now_counts = now_counts
+        self.potential_counts = potential_counts
+
+        ahead, tied, behind = now_counts
+        self.hs = (ahead + tied / 2) / (ahead + tied + behind)
+        potential = potential_counts
+        totals = [sum(row) for row in potential]
+        ppot_base = totals[BEHIND] + totals[TIED] / 2
+        npot_base = totals[AHEAD] + totals[TIED] / 2
+        self.ppot = (potential[BEHIND][AHEAD] + potential[BEHIND][TIED] / 2 + potential[TIED][AHEAD] / 2) / ppot_base if ppot_base else 0.0
+        self.npot = (potential[AHEAD][BEHIND] + potential[TIED][BEHIND] / 2 + potential[AHEAD][TIED] / 2) / npot_base if npot_base else 0.0
+        self.ehs = self.hs * (1 - self.npot) + (1 - self.hs) * self.ppot
+
+    def __str__(self):
+        return f'{" ".join(str(card) for card in self.player_cards)}: HS {round(self.hs, 4)}, EHS {round(self.ehs, 4)}, PPot {round(self.ppot, 4)}, NPot {round(self.npot, 4)}'
+
+
+def _compare(strength: int, opponent_strength: int) -> int:
+    if strength > opponent_strength:
+        return AHEAD
+    return TIED if strength == opponent_strength else BEHIND
+
+def process_job_potential_runouts(job_context, index_ranges):
+    """
+    Worker task: potential counts (flattened 3 x 3 per measured hand) over the runouts of the index ranges.
+    Every runout is evaluated once for all combos, the measured hands are combos too and reuse those strengths.
+    """
+    player_masks, table_mask, combos, now_strengths, evaluator = job_context
+    available_cards, remaining_cards = get_runout_cards(table_mask)
+    runouts = [additional_cards_mask for start, end in index_ranges
+               for additional_cards_mask in iter_combination_masks(available_cards, remaining_cards, start, end)]
+    combo_indices = {combo: i for i, combo in enumerate(combos)}
+    player_indices = [combo_indices[player_mask] for player_mask in player_masks]
+
+    if evaluator == NUMPY_EVALUATOR:
+        combo_array = np.array(combos, dtype=np.int64)
+        now_array = np.array(now_strengths)
+        potential_counts = np.zeros((len(player_masks), 9), dtype=np.int64)
+        for chunk_start in range(0, len(runouts), RUNOUT_CHUNK_SIZE):
+            runout_array = np.array(runouts[chunk_start:chunk_start + RUNOUT_CHUNK_SIZE], dtype=np.int64)
+            river_strengths = evaluate_board_masks(runout_array | table_mask, combos)
+            live = (combo_array[None, :] & runout_array[:, None]) == 0
+            for h, (player_mask, player_index) in enumerate(zip(player_masks, player_indices)):
+                # Opponent hands sharing no card with the measured hand, on runouts sharing no card with either
+                opponents = (combo_array & player_mask) == 0
+                valid = live & opponents[None, :] & ((runout_array & player_mask) == 0)[:, None]
+                player_river_strengths = river_strengths[:, player_index][:, None]
+                river_classes = (
+                    (valid & (player_river_strengths > river_strengths)).sum(axis=0),
+                    (valid & (player_river_strengths == river_strengths)).sum(axis=0),
+                    (valid & (player_river_strengths < river_strengths)).sum(axis=0)
+                )
+                now_classes = (now_array[player_index] > now_array, now_array[player_index] == now_array, now_array[player_index] < now_array)
+                for i, now_class in enumerate(now_classes):
+                    for j, river_class in enumerate(river_classes):
+                        potential_counts[h, i * 3 + j] += int(river_class[now_class & opponents].sum())
+        return potential_counts.tolist()
+
+    combo_rank_keys = [get_rank_key(combo) for combo in combos]
+    potential_counts = [[0] * 9 for _ in player_masks]
+    for runout_mask in runouts:
+        live = [i for i, combo in enumerate(combos) if not combo & runout_mask]
+        live_strengths = evaluate_players(table_mask | runout_mask, [combos[i] for i in live], [combo_rank_keys[i] for i in live])
+        river_strengths = dict(zip(live, live_strengths))
+        for h, (player_mask, player_index) in enumerate(zip(player_masks, player_indices)):
+            if player_mask & runout_mask:
+                continue
+            player_strength = river_strengths[player_index]
+            player_now_strength = now_strengths[player_index]
+            counts = potential_counts[h]
+            for i in live:
+                if not combos[i] & player_mask:
+                    counts[_compare(player_now_strength, now_strengths[i]) * 3 + _compare(player_strength, river_strengths[i])] += 1
+    return potential_counts
+
+
+def batch_hand_metrics(all_player_cards: List[List[Card]], table_cards: List[Card], evaluator: Optional[str] = None,
+                       engine: Optional[CalculationEngine] = None, backend: Optional[str] = None) -> List[HandMetrics]:
+    """
+    HandMetrics for every hand in all_player_cards on the same flop or turn, in one pass over the runouts.
+    The hands are measured independently (each against a random opponent), they don't block each other's cards.
+    evaluator defaults to numpy when it is installed.
+    """
+    table_mask = cards_to_mask(table_cards)
+    if len(table_cards) not in (3, 4) or popcount(table_mask) != len(table_cards):
+        raise ValueError("Hand metrics need 3 or 4 different table cards")
+    player_masks = tuple(cards_to_mask(player_cards) for player_cards in all_player_cards)
+    for player_cards, player_mask in zip(all_player_cards, player_masks):
+        if len(player_cards) != 2 or popcount(player_mask) != 2 or player_mask & table_mask:
+            raise ValueError("Every hand needs 2 different cards that aren't on the table")
+    if evaluator is None:
+        evaluator = NUMPY_EVALUATOR if np is not None else LOOKUP_EVALUATOR
+    if evaluator not in EVALUATORS:
+        raise ValueError(f"Unknown evaluator {evaluator}, expected one of {EVALUATORS}")
+    if evaluator == NUMPY_EVALUATOR:
+        require_numpy()
+
+    # Strengths on the current table are shared by all hands and all workers
+    combos = [combo for combo in ALL_COMBOS if not combo & table_mask]
+    now_strengths = evaluate_players(table_mask, combos, [get_rank_key(combo) for combo in combos])
+    combo_indices = {combo: i for i, combo in enumerate(combos)}
+    now_counts = []
+    for player_mask in player_masks:
+        player_strength = now_strengths[combo_indices[player_mask]]
+        counts = [0, 0, 0]
+        for combo, strength in zip(combos, now_strengths):
+            if not combo & player_mask:
+                counts[_compare(player_strength, strength)] += 1
+        now_counts.append(counts)
+
+    total_runouts = math.comb(52 - len(table_cards), 5 - len(table_cards))
+    plan = plan_execution(total_runouts, len(combos), backend=backend, has_warm_engine=engine is not None)
+    print(f"Execution plan: {plan}")
+
+    start_time = time.time()
+    potential_counts = [[0] * 9 for _ in player_masks]
+    with engine_for_plan(plan, engine) as engine:
+        shard_size = max(1, math.ceil(total_runouts / (engine.processes * 4)))
+        job_context = (player_masks, table_mask, tuple(combos), tuple(now_strengths), evaluator)
+        for task_counts in engine.imap_unordered(process_job_potential_runouts, job_context, split_index_ranges([(0, total_runouts)], shard_size)):
+            for counts, new_counts in zip(potential_counts, task_counts):
+                for k in range(9):
+                    counts[k] += new_counts[k]
+    print(f"Time taken to measure {len(player_masks)} hands: {round(time.time() - start_time, 2)}s")
+
+    return [
+        HandMetrics(player_cards, counts, [potential[i * 3:i * 3 + 3] for i in range(3)])
+        for player_cards, counts, potential in zip(all_player_cards, now_counts, potential_counts)
+    ]
+
+def hand_metrics(player_cards: List[Card], table_cards: List[Card], evaluator: Optional[str] = None,
+                 engine: Optional[CalculationEngine] = None, backend: Optional[str] = None) -> HandMetrics:
+    """HS / EHS / PPot / NPot of one hand on a flop or turn."""
+    return batch_hand_metrics([player_cards], table_cards, evaluator=evaluator, engine=engine, backend=backend)[0]
@@ -0,0 +1,195 @@
+"""
+Monte Carlo equity: samples random boards instead of enumerating them, and reports how precise the answer is.
+
+Each task draws its boards from its own RNG stream, seeded from (seed, stream index), so results are reproducible
+and independent no matter which worker runs which task. Sampling stops as soon as the confidence interval of every
+player's equity is within the target precision, the time budget is used up, or max_samples is reached.
+"""
+from statistics import NormalDist
+from typing import List, Optional, Tuple
+import hashlib
+import math
+import os
+import random
+import time
+from .card import Card, cards_to_mask, popcount
+from .evaluator import evaluate_players, get_rank_key
+from .all_cards import get_runout_cards
+from .engine import CalculationEngine, engine_for_plan
+from .planner import plan_execution
+
+# The normal approximation behind the confidence interval needs a reasonable amount of samples first
+MIN_PRECISION_SAMPLES = 10_000
+
+
+class MonteCarloResult:
+    """
+    Percentages like calc_odds. Equity splits tied pots between the tied players,
+    confidence_intervals are (low, high) equity percentages per player.
+    """
+    def __init__(self, win_percentages: List[float], tie_percentages: List[float], equities: List[float],
+                 standard_errors: List[float], confidence_intervals: List[Tuple[float, float]], confidence: float,
+                 player_wins: List[int], player_ties: List[int], samples: int, elapsed: float, stop_reason: str, seed: int):
+        self.win_percentages = win_percentages
+        self.tie_percentages = tie_percentages
+        self.equities = equities
+        self.standard_errors = standard_errors
+        self.confidence_intervals = confidence_intervals
+        self.confidence = confidence
+        self.player_wins = player_wins
+        self.player_ties = player_ties
+        self.samples = samples
+        self.elapsed = elapsed
+        self.stop_reason = stop_reason
+        self.seed = seed
+
+    def __str__(self):
+        result_str = f'{self.samples} samples in {round(self.elapsed, 2)}s, stopped by {self.stop_reason}\n'
+        for j in range(len(self.equities)):
+            low, high = self.confidence_intervals[j]
+            result_str += f'Player {j+1} equity: {round(self.equities[j], 3)}% +- {round(self.standard_errors[j], 3)}% '
+            result_str += f'({round(self.confidence * 100)}% CI {round(low, 3)}% - {round(high, 3)}%)\n'
+        return result_str
+
+
+def get_stream_rng(seed: int, stream: int) -> random.Random:
+    """Independent RNG for one stream, derived by hashing, so neighbouring streams aren't correlated."""
+    digest = hashlib.sha256(f"{seed}:{stream}".encode()).digest()
+    return random.Random(int.from_bytes(digest, "big"))
+
+def sample_job_boards(job_context, task):
+    """
+    Worker task: evaluates sample_amount random boards from the task's RNG stream.
+    Returns per player wins, ties, equity sum and equity sum of squares, plus the amount of samples.
+    """
+    all_player_masks, table_mask = job_context
+    seed, stream, sample_amount = task
+    rng = get_stream_rng(seed, stream)
+
+    available_cards, remaining_cards = get_runout_cards(table_mask, all_player_masks)
+    all_player_rank_keys = [get_rank_key(player_mask) for player_mask in all_player_masks]
+
+    player_amount = len(all_player_masks)
+    wins = [0] * player_amount
+    ties = [0] * player_amount
+    equity_sums = [0.0] * player_amount
+    equity_square_sums = [0.0] * player_amount
+    for _ in range(sample_amount):
+        board_mask = table_mask | sum(rng.sample(available_cards, remaining_cards))
+        all_player_strengths = evaluate_players(board_mask, all_player_masks, all_player_rank_keys)
+        highest_strength = max(all_player_strengths)
+        best_hand_players = [i for i, strength in enumerate(all_player_strengths) if strength == highest_strength]
+        share = 1 / len(best_hand_players)
+        for player_idx in best_hand_players:
+            if share == 1:
+                wins[player_idx] += 1
+            else:
+                ties[player_idx] += 1
+            equity_sums[player_idx] += share
+            equity_square_sums[player_idx] += share * share
+    return wins, ties, equity_sums, equity_square_sums, sample_amount
+
+
+def monte_carlo_odds(
+    all_player_cards: List[List[Card]],
+    table_cards: List[Card],
+    target_precision: Optional[float] = 0.1,
+    confidence: float = 0.95,
+    time_budget: Optional[float] = None,
+    max_samples: Optional[int] = 10_000_000,
+    seed: Optional[int] = None,
+    batch_size: int = 5000,
+    engine: Optional[CalculationEngine] = None,
+    backend: Optional[str] = None
+) -> MonteCarloResult:
+    """
+    Samples boards until the confidence interval half-width of every player's equity is at most
+    target_precision percentage points (e.g. 0.1 -> +-0.1%), time_budget seconds have passed or max_samples are done.
+    At least one of the three limits has to be set.
+    """
+    if target_precision is None and time_budget is None and max_samples is None:
+        raise ValueError("monte_carlo_odds needs a target_precision, time_budget or max_samples")
+    if seed is None:
+        seed = int.from_bytes(os.urandom(8), "big")
+
+    table_mask = cards_to_mask(table_cards)
+    all_player_masks = tuple(cards_to_mask(player_cards) for player_cards in all_player_cards)
+    job_context = (all_player_masks, table_mask)
+    player_amount = len(all_player_masks)
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+
+    # Nothing left to sample on the river
+    if popcount(table_mask) == 5:
+        max_samples = 1
+
+    # Equity variance is at most 0.25, which bounds the samples needed for the precision
+    estimated_samples = max_samples or 10_000_000
+    if target_precision is not None:
+        estimated_samples = min(estimated_samples, math.ceil((z * 0.5 * 100 / target_precision) ** 2))
+    plan = plan_execution(estimated_samples, player_amount, backend=backend, has_warm_engine=engine is not None)
+    print(f"Execution plan: {plan}")
+
+    wins = [0] * player_amount
+    ties = [0] * player_amount
+    equity_sums = [0.0] * player_amount
+    equity_square_sums = [0.0] * player_amount
+    samples = 0
+    stop_reason = None
+    start_time = time.time()
+
+    def get_standard_errors() -> List[float]:
+        standard_errors = []
+        for j in range(player_amount):
+            mean = equity_sums[j] / samples
+            variance = max(0.0, equity_square_sums[j] / samples - mean * mean)
+            standard_errors.append(math.sqrt(variance / samples) * 100)
+        return standard_errors
+
+    def iter_tasks():
+        # One task per RNG stream, no new tasks once a limit is reached
+        stream = 0
+        submitted = 0
+        while stop_reason is None and (max_samples is None or submitted < max_samples):
+            sample_amount = batch_size if max_samples is None else min(batch_size, max_samples - submitted)
+            yield seed, stream, sample_amount
+            stream += 1
+            submitted += sample_amount
+
+    with engine_for_plan(plan, engine) as engine:
+        # Tasks already running when a limit is hit still get added, so no finished work is thrown away
+        for batch_wins, batch_ties, batch_equity_sums, batch_equity_square_sums, batch_samples in engine.imap_unordered(sample_job_boards, job_context, iter_tasks()):
+            for j in range(player_amount):
+                wins[j] += batch_wins[j]
+                ties[j] += batch_ties[j]
+                equity_sums[j] += batch_equity_sums[j]
+                equity_square_sums[j] += batch_equity_square_sums[j]
+            samples += batch_samples
+
+            if stop_reason is not None:
+                continue
+            enough_for_estimate = samples >= min(MIN_PRECISION_SAMPLES, max_samples or MIN_PRECISION_SAMPLES)
+            if target_precision is not None and enough_for_estimate and max(get_standard_errors()) * z <= target_precision:
+                stop_reason = "precision"
+            elif time_budget is not None and time.time() - start_time >= time_budget:
+                stop_reason = "time budget"
+
+    if stop_reason is None:
+        stop_reason = "max samples"
+    elapsed = time.time() - start_time
+
+    standard_errors = get_standard_errors() if samples > 1 else [0.0] * player_amount
+    equities = [equity_sum / samples * 100 for equity_sum in equity_sums]
+    return MonteCarloResult(
+        win_percentages=[win / samples * 100 for win in wins],
+        tie_percentages=[tie / samples * 100 for tie in ties],
+        equities=equities,
+        standard_errors=standard_errors,
+        confidence_intervals=[(max(0.0, equity - z * se), min(100.0, equity + z * se)) for equity, se in zip(equities, standard_errors)],
+        confidence=confidence,
+        player_wins=wins,
+        player_ties=ties,
+        samples=samples,
+        elapsed=elapsed,
+        stop_reason=stop_reason,
+        seed=seed
+    )
@@ -0,0 +1,73 @@
+"""
+Execution planner: picks the cheapest backend for a calculation from its estimated size.
+
+Handing a river (1 board) or turn (~44 boards) to a process pool costs far more than evaluating it,
+so small jobs run in-process, and a process pool is only used where the work outweighs its overhead.
+"""
+from collections import Counter
+from typing import Optional
+import sys
+
+SERIAL = "serial"
+THREAD = "thread"
+PROCESS = "process"
+BACKENDS = (SERIAL, THREAD, PROCESS)
+
+# Hand evaluations (boards * players) below which the job always runs in-process
+SERIAL_MAX_EVALUATIONS = 50_000
+# Without a warm engine, a new process pool is only worth its startup above this
+COLD_POOL_MIN_EVALUATIONS = 500_000
+
+# Monitoring: how often each backend was picked, and the latest plan
+backend_counts: Counter = Counter()
+last_execution_plan: Optional["ExecutionPlan"] = None
+
+
+class ExecutionPlan:
+    backend: str
+    estimated_boards: int
+    estimated_evaluations: int
+    reason: str
+    def __init__(self, backend: str, estimated_boards: int, estimated_evaluations: int, reason: str):
+        self.backend = backend
+        self.estimated_boards = estimated_boards
+        self.estimated_evaluations = estimated_evaluations
+        self.reason = reason
+
+    def __str__(self):
+        return f'{self.backend} backend for ~{self.estimated_boards} boards / ~{self.estimated_evaluations} evaluations ({self.reason})'
+
+    def __repr__(self):
+        return f"ExecutionPlan(backend='{self.backend}', estimated_boards={self.estimated_boards}, estimated_evaluations={self.estimated_evaluations})"
+
+
+def is_gil_enabled() -> bool:
+    # Free-threaded builds (3.13+) can run the thread backend in parallel
+    return getattr(sys, "_is_gil_enabled", lambda: True)()
+
+def plan_execution(estimated_boards: int, player_amount: int, backend: Optional[str] = None, has_warm_engine: bool = False) -> ExecutionPlan:
+    """
+    Picks serial, thread or process execution, backend overrides the automatic choice.
+    The plan is recorded in backend_counts / last_execution_plan.
+    """
+    global last_execution_plan
+    estimated_evaluations = estimated_boards * player_amount
+
+    if backend is not None:
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend {backend}, expected one of {BACKENDS}")
+        plan = ExecutionPlan(backend, estimated_boards, estimated_evaluations, "override")
+    elif estimated_evaluations <= SERIAL_MAX_EVALUATIONS:
+        plan = ExecutionPlan(SERIAL, estimated_boards, estimated_evaluations, "small job")
+    elif not is_gil_enabled():
+        plan = ExecutionPlan(THREAD, estimated_boards, estimated_evaluations, "free-threaded interpreter")
+    elif has_warm_engine:
+        plan = ExecutionPlan(PROCESS, estimated_boards, estimated_evaluations, "warm engine")
+    elif estimated_evaluations < COLD_POOL_MIN_EVALUATIONS:
+        plan = ExecutionPlan(SERIAL, estimated_boards, estimated_evaluations, "too small for a cold pool")
+    else:
+        plan = ExecutionPlan(PROCESS, estimated_boards, estimated_evaluations, "large job")
+
+    backend_counts[plan.backend] += 1
+    last_execution_plan = plan
+    return plan
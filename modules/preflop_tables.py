@@ -0,0 +1,245 @@
+"""
+Precomputed exact heads-up preflop equities, stored in a versioned binary file and read through mmap.
+
+Preflop results never change, so every heads-up matchup is enumerated once (with the regular calculator) and stored.
+Matchups that only differ by a suit permutation share one record: the key is the smallest packed form of the
+two hands over all 24 suit permutations and both player orders. The file also holds the 169x169 starting hand
+class equity matrix, each entry averaged over all compatible combo pairs of the two classes.
+
+File layout (little endian):
+  header   magic "PFEQ", version, matchup count, boards per matchup, records offset, class matrix offset (6 x uint32 after the magic)
+  records  matchup count x (key, player 1 wins, player 2 wins, ties) as uint32, sorted by key
+  classes  169 x 169 float32 equities in percent of the row class against the column class, NaN if not built
+
+Build it once with: python -m modules.preflop_tables [--output PATH] [--classes AA,KK,AKs] [--checkpoint PATH]
+"""
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+import argparse
+import itertools
+import math
+import mmap
+import os
+import struct
+import time
+from .card import Card, cards_to_mask, mask_to_cards, mask_to_ids
+from .ranges import get_class_combos, get_class_name
+from .checkpoint import DEFAULT_CHECKPOINT_INTERVAL, load_checkpoint, save_checkpoint
+from .utils import get_tie_share
+
+MAGIC = b"PFEQ"
+VERSION = 1
+_HEADER = struct.Struct("<4s5I")
+_RECORD = struct.Struct("<4I")
+DEFAULT_TABLE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "preflop_tables.bin")
+# Boards per heads-up matchup: C(48, 5)
+BOARDS_PER_MATCHUP = math.comb(48, 5)
+
+# The 169 starting hand classes (high, low, suited) in grid order: AA, AKs, AKo, AQs, ... 22
+PREFLOP_CLASSES: List[Tuple[int, int, Optional[bool]]] = [
+    hand_class for high in range(14, 1, -1) for low in range(high, 1, -1)
+    for hand_class in ([(high, low, None)] if high == low else [(high, low, True), (high, low, False)])
+]
+_CLASS_INDICES: Dict[str, int] = {get_class_name(*hand_class): i for i, hand_class in enumerate(PREFLOP_CLASSES)}
+
+# Card id -> card id under each of the 24 suit permutations
+_SUIT_PERMUTATIONS: List[List[int]] = [
+    [permutation[card_id // 13] * 13 + card_id % 13 for card_id in range(52)]
+    for permutation in itertools.permutations(range(4))
+]
+
+
+def _pack_hand(card1: int, card2: int) -> int:
+    return max(card1, card2) << 6 | min(card1, card2)
+
+@lru_cache(maxsize=1 << 16)
+def get_matchup_key(player1_mask: int, player2_mask: int) -> Tuple[int, bool]:
+    """(canonical record key, whether the record's player 1 is player2_mask)."""
+    (a1, a2), (b1, b2) = mask_to_ids(player1_mask), mask_to_ids(player2_mask)
+    best_key = 1 << 32
+    swapped = False
+    for permuted in _SUIT_PERMUTATIONS:
+        hand1 = _pack_hand(permuted[a1], permuted[a2])
+        hand2 = _pack_hand(permuted[b1], permuted[b2])
+        if hand1 << 12 | hand2 < best_key:
+            best_key, swapped = hand1 << 12 | hand2, False
+        if hand2 << 12 | hand1 < best_key:
+            best_key, swapped = hand2 << 12 | hand1, True
+    return best_key, swapped
+
+def _key_to_masks(key: int) -> Tuple[int, int]:
+    masks = []
+    for packed_hand in (key >> 12, key & 0xFFF):
+        masks.append((1 << (packed_hand >> 6)) | (1 << (packed_hand & 0x3F)))
+    return masks[0], masks[1]
+
+def get_class_index(class_name: str) -> int:
+    if class_name not in _CLASS_INDICES:
+        raise ValueError(f"Unknown starting hand class {class_name}, expected e.g. 'AA', 'AKs' or 'T9o'")
+    return _CLASS_INDICES[class_name]
+
+
+class PreflopTable:
+    """
+    Read-only view of a preflop table file. The file is memory mapped and records are found by binary search,
+    so lookups cost microseconds and nothing is loaded up front.
+    """
+    def __init__(self, path: str = DEFAULT_TABLE_PATH):
+        self.path = path
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.matchup_count, self.boards_per_matchup, self._records_offset, self._classes_offset = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a preflop table file")
+        if version != VERSION:
+            raise ValueError(f"{path} has preflop table version {version}, expected {VERSION}, rebuild it with python -m modules.preflop_tables")
+
+    def _find(self, key: int) -> Optional[Tuple[int, int, int]]:
+        low, high = 0, self.matchup_count
+        while low < high:
+            middle = (low + high) // 2
+            record_key, wins1, wins2, ties = _RECORD.unpack_from(self._mmap, self._records_offset + middle * _RECORD.size)
+            if record_key == key:
+                return wins1, wins2, ties
+            if record_key < key:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def lookup(self, player1_cards: List[Card], player2_cards: List[Card]) -> Optional[Tuple[List[int], List[int], List[int], int]]:
+        """(wins, ties, tie shares, boards) like calc_counts for an exact heads-up preflop matchup, None if it isn't in the table."""
+        key, swapped = get_matchup_key(cards_to_mask(player1_cards), cards_to_mask(player2_cards))
+        record = self._find(key)
+        if record is None:
+            return None
+        wins1, wins2, ties = record
+        wins = [wins2, wins1] if swapped else [wins1, wins2]
+        # Heads-up every tie splits the pot in half
+        return wins, [ties, ties], [ties * get_tie_share(2)] * 2, self.boards_per_matchup
+
+    def get_class_equity(self, class_name: str, opponent_class_name: str) -> float:
+        """Equity in percent of a starting hand class (e.g. 'AKs') against another, averaged over their combos."""
+        index = get_class_index(class_name) * len(PREFLOP_CLASSES) + get_class_index(opponent_class_name)
+        return struct.unpack_from("<f", self._mmap, self._classes_offset + index * 4)[0]
+
+    def close(self):
+        self._mmap.close()
+
+_loaded_tables: Dict[str, Optional[PreflopTable]] = {}
+
+def get_preflop_table(path: str = DEFAULT_TABLE_PATH) -> Optional[PreflopTable]:
+    """The table at path, mapped once per process, None if no table has been built there."""
+    if path not in _loaded_tables:
+        _loaded_tables[path] = PreflopTable(path) if os.path.exists(path) else None
+    return _loaded_tables[path]
+
+def lookup_preflop_counts(all_player_cards: List[List[Card]], path: str = DEFAULT_TABLE_PATH) -> Optional[Tuple[List[int], List[int], List[int], int]]:
+    """Table result for a heads-up preflop calculation, None if it can't be answered from the table."""
+    if len(all_player_cards) != 2:
+        return None
+    table = get_preflop_table(path)
+    if table is None:
+        return None
+    return table.lookup(all_player_cards[0], all_player_cards[1])
+
+
+def get_canonical_matchups(class_names: Optional[Iterable[str]] = None) -> List[int]:
+    """Sorted record keys of all heads-up matchups where both hands are in class_names (all 169 classes if None)."""
+    classes = PREFLOP_CLASSES if class_names is None else [PREFLOP_CLASSES[get_class_index(name)] for name in class_names]
+    combos = [combo for hand_class in classes for combo in get_class_combos(*hand_class)]
+    keys = set()
+    for hand_class in classes:
+        # Suit permutations map a class onto itself, so one representative combo per class covers all of them
+        representative = get_class_combos(*hand_class)[0]
+        for combo in combos:
+            if not combo & representative:
+                keys.add(get_matchup_key(representative, combo)[0])
+    return sorted(keys)
+
+def _get_class_pair_equity(combos: List[int], opponent_combos: List[int], results: Dict[int, Tuple[int, int, int]]) -> float:
+    equity_sum = 0.0
+    pairs = 0
+    for combo in combos:
+        for opponent_combo in opponent_combos:
+            if combo & opponent_combo:
+                continue
+            key, swapped = get_matchup_key(combo, opponent_combo)
+            if key not in results:
+                return math.nan
+            wins1, wins2, ties = results[key]
+            equity_sum += ((wins2 if swapped else wins1) + ties / 2) / BOARDS_PER_MATCHUP * 100
+            pairs += 1
+    return equity_sum / pairs
+
+def compute_class_matrix(results: Dict[int, Tuple[int, int, int]]) -> List[float]:
+    """169 x 169 class equities (row-major, percent) from matchup results, NaN where a matchup is missing."""
+    class_combos = [get_class_combos(*hand_class) for hand_class in PREFLOP_CLASSES]
+    return [_get_class_pair_equity(combos, opponent_combos, results) for combos in class_combos for opponent_combos in class_combos]
+
+def write_preflop_table(path: str, results: Dict[int, Tuple[int, int, int]]):
+    class_matrix = compute_class_matrix(results)
+    records_offset = _HEADER.size
+    classes_offset = records_offset + len(results) * _RECORD.size
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # Written next to the target and renamed, so readers never see a half written table
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "wb") as file:
+        file.write(_HEADER.pack(MAGIC, VERSION, len(results), BOARDS_PER_MATCHUP, records_offset, classes_offset))
+        for key in sorted(results):
+            file.write(_RECORD.pack(key, *results[key]))
+        file.write(struct.pack(f"<{len(class_matrix)}f", *class_matrix))
+    os.replace(temporary_path, path)
+    _loaded_tables.pop(path, None)
+
+def build_preflop_table(path: str = DEFAULT_TABLE_PATH, class_names: Optional[Iterable[str]] = None, engine=None,
+                        checkpoint_path: Optional[str] = None, checkpoint_interval: float = DEFAULT_CHECKPOINT_INTERVAL) -> int:
+    """
+    Enumerates every canonical heads-up matchup with calc_counts and writes the table, returns the amount of matchups.
+    All 169 classes take many CPU hours, class_names builds a partial table for just these classes.
+    With a checkpoint_path finished matchups are flushed there every checkpoint_interval seconds and skipped when the build is restarted.
+    """
+    from .calculator import calc_counts
+
+    class_names = None if class_names is None else list(class_names)
+    keys = get_canonical_matchups(class_names)
+    results: Dict[int, Tuple[int, int, int]] = {}
+    job_key = {"preflop_table_version": VERSION, "classes": class_names}
+    if checkpoint_path is not None:
+        state = load_checkpoint(checkpoint_path, job_key)
+        if state is not None:
+            results = {key: (wins1, wins2, ties) for key, wins1, wins2, ties in state["matchups"]}
+
+    def flush_checkpoint():
+        if checkpoint_path is not None:
+            save_checkpoint(checkpoint_path, job_key, {"matchups": [[key, *result] for key, result in results.items()]})
+
+    start_time = time.time()
+    last_flush = time.time()
+    try:
+        for i, key in enumerate(keys):
+            if key in results:
+                continue
+            player1_mask, player2_mask = _key_to_masks(key)
+            wins, ties, _, boards = calc_counts([mask_to_cards(player1_mask), mask_to_cards(player2_mask)], [], 1, [0], engine=engine, use_preflop_table=False)
+            results[key] = (wins[0], wins[1], ties[0])
+            print(f"Preflop table: {i + 1}/{len(keys)} matchups, {round(time.time() - start_time, 1)}s")
+            if time.time() - last_flush >= checkpoint_interval:
+                flush_checkpoint()
+                last_flush = time.time()
+    finally:
+        flush_checkpoint()
+    write_preflop_table(path, results)
+    return len(results)
+
+
+if __name__ == "__main__":
+    from .engine import CalculationEngine
+
+    parser = argparse.ArgumentParser(description="Build the exact heads-up preflop equity table")
+    parser.add_argument("--output", default=DEFAULT_TABLE_PATH)
+    parser.add_argument("--classes", help="Comma separated starting hand classes to build a partial table for, e.g. AA,KK,AKs")
+    parser.add_argument("--checkpoint", help="Checkpoint file, an interrupted build restarted with the same file continues where it stopped")
+    args = parser.parse_args()
+    with CalculationEngine() as engine:
+        build_preflop_table(args.output, args.classes.split(",") if args.classes else None, engine=engine, checkpoint_path=args.checkpoint)
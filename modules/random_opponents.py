@@ -0,0 +1,294 @@
+"""
+Equity of one known hand against unknown random opponents ("my hand vs 3 random hands") on a given table.
+
+Small spots are enumerated exactly: for every runout all live opponent combos are evaluated once, and the
+opponent deals are counted from how many combos are below / equal to the known hand. Two opponents can't share a card,
+so for two opponents the disjoint pairs of a combo set are counted by subtracting the pairs sharing each card.
+Larger spots are sampled: every trial deals the opponents and the rest of the board from the remaining deck as card masks.
+
+Results are counted per tie size, tie_counts[j - 1] = deals where the known hand splits the pot with j opponents,
+which is all that is needed for the equity and its variance.
+"""
+from statistics import NormalDist
+from typing import List, Optional
+import itertools
+import math
+import os
+import time
+from .card import Card, cards_to_mask, popcount
+from .evaluator import evaluate_players, get_rank_key
+from .all_cards import get_runout_cards
+from .combinatorics import iter_combination_masks, split_index_ranges
+from .batch_evaluator import evaluate_board_masks, np, require_numpy
+from .monte_carlo import MIN_PRECISION_SAMPLES, get_stream_rng
+from .engine import CalculationEngine, engine_for_plan
+from .planner import plan_execution
+from .calculator import EVALUATORS, LOOKUP_EVALUATOR, NUMPY_EVALUATOR
+
+# Exact counting is implemented for up to this many opponents
+MAX_EXACT_OPPONENTS = 2
+# Runouts x opponent combos above which exact=None samples instead
+EXACT_MAX_EVALUATIONS = 20_000_000
+# Runouts evaluated per array operation with the numpy evaluator
+RUNOUT_CHUNK_SIZE = 64
+
+
+class RandomOpponentsResult:
+    """
+    Win / tie / equity percentages of the known hand. standard_error and the confidence interval are 0 / the equity for exact results.
+    """
+    def __init__(self, opponent_amount: int, wins: int, tie_counts: List[int], deals: int, exact: bool,
+                 confidence: float, elapsed: float, stop_reason: str, seed: Optional[int]):
+        self.opponent_amount = opponent_amount
+        self.wins = wins
+        self.tie_counts = tie_counts
+        self.ties = sum(tie_counts)
+        self.deals = deals
+        self.exact = exact
+        self.elapsed = elapsed
+        self.stop_reason = stop_reason
+        self.seed = seed
+        self.confidence = confidence
+
+        self.win_percentage = wins / deals * 100
+        self.tie_percentage = self.ties / deals * 100
+        # The pot is split between the known hand and the j tied opponents
+        shares = wins + sum(tie_count / (j + 2) for j, tie_count in enumerate(tie_counts))
+        self.equity = shares / deals * 100
+        if exact or deals < 2:
+            self.standard_error = 0.0
+        else:
+            square_shares = wins + sum(tie_count / (j + 2) ** 2 for j, tie_count in enumerate(tie_counts))
+            mean = shares / deals
+            self.standard_error = math.sqrt(max(0.0, square_shares / deals - mean * mean) / deals) * 100
+        z = NormalDist().inv_cdf((1 + confidence) / 2)
+        self.confidence_interval = (max(0.0, self.equity - z * self.standard_error), min(100.0, self.equity + z * self.standard_error))
+
+    def __str__(self):
+        mode = 'exact' if self.exact else f'{self.deals} samples, stopped by {self.stop_reason}'
+        result_str = f'Against {self.opponent_amount} random opponent(s) ({mode}, {round(self.elapsed, 2)}s)\n'
+        result_str += f'Win: {round(self.win_percentage, 3)}%, tie: {round(self.tie_percentage, 3)}%, equity: {round(self.equity, 3)}%'
+        if not self.exact:
+            low, high = self.confidence_interval
+            result_str += f' +- {round(self.standard_error, 3)}% ({round(self.confidence * 100)}% CI {round(low, 3)}% - {round(high, 3)}%)'
+        return result_str + '\n'
+
+
+def _get_live_combos(dead_mask: int) -> List[int]:
+    live_cards = [1 << card_id for card_id in range(52) if not dead_mask >> card_id & 1]
+    return [card1 | card2 for card1, card2 in itertools.combinations(live_cards, 2)]
+
+def _count_disjoint_pairs(combos: List[int]) -> int:
+    """Unordered pairs of combos without a common card. Two different combos share at most one card."""
+    card_degrees = {}
+    for combo in combos:
+        low_card = combo & -combo
+        card_degrees[low_card] = card_degrees.get(low_card, 0) + 1
+        card_degrees[combo ^ low_card] = card_degrees.get(combo ^ low_card, 0) + 1
+    sharing_pairs = sum(degree * (degree - 1) for degree in card_degrees.values())
+    return (len(combos) * (len(combos) - 1) - sharing_pairs) // 2
+
+def _count_disjoint_pairs_numpy(combo_sets, card_incidence) -> int:
+    """_count_disjoint_pairs summed over the rows of a (runouts, combos) boolean array."""
+    sizes = combo_sets.sum(axis=1)
+    card_degrees = combo_sets.astype(np.int64) @ card_incidence
+    return int(((sizes * (sizes - 1) - (card_degrees * (card_degrees - 1)).sum(axis=1)) // 2).sum())
+
+def process_job_random_opponent_runouts(job_context, index_ranges):
+    """
+    Worker task for exact counting: (wins, tie counts, deals) of the known hand over the runouts of the index ranges,
+    every runout combined with every deal of the opponents.
+    """
+    player_mask, table_mask, opponent_amount, evaluator = job_context
+    available_cards, remaining_cards = get_runout_cards(table_mask, (player_mask,))
+    combos = _get_live_combos(player_mask | table_mask)
+    runouts = [additional_cards_mask for start, end in index_ranges
+               for additional_cards_mask in iter_combination_masks(available_cards, remaining_cards, start, end)]
+
+    wins = 0
+    tie_counts = [0] * opponent_amount
+    deals = 0
+    if evaluator == NUMPY_EVALUATOR:
+        combo_array = np.array(combos, dtype=np.int64)
+        # Combo x card incidence, for the card degrees of the two opponent case
+        card_incidence = ((combo_array[:, None] >> np.arange(52, dtype=np.int64)) & 1).astype(np.int64)
+        for chunk_start in range(0, len(runouts), RUNOUT_CHUNK_SIZE):
+            board_masks = np.array(runouts[chunk_start:chunk_start + RUNOUT_CHUNK_SIZE], dtype=np.int64) | table_mask
+            player_strengths = evaluate_board_masks(board_masks, [player_mask])[:, 0]
+            combo_strengths = evaluate_board_masks(board_masks, combos)
+            live = (combo_array[None, :] & board_masks[:, None]) == 0
+            below = live & (combo_strengths < player_strengths[:, None])
+            equal = live & (combo_strengths == player_strengths[:, None])
+            if opponent_amount == 1:
+                wins += int(below.sum())
+                tie_counts[0] += int(equal.sum())
+                deals += int(live.sum())
+            else:
+                below_pairs = _count_disjoint_pairs_numpy(below, card_incidence)
+                equal_pairs = _count_disjoint_pairs_numpy(equal, card_incidence)
+                wins += below_pairs
+                tie_counts[1] += equal_pairs
+                tie_counts[0] += _count_disjoint_pairs_numpy(below | equal, card_incidence) - below_pairs - equal_pairs
+                deals += _count_disjoint_pairs_numpy(live, card_incidence)
+        return wins, tie_counts, deals
+
+    combo_rank_keys = [get_rank_key(combo) for combo in combos]
+    player_rank_key = get_rank_key(player_mask)
+    for additional_cards_mask in runouts:
+        board_mask = table_mask | additional_cards_mask
+        live_combos = []
+        live_rank_keys = []
+        for combo, combo_rank_key in zip(combos, combo_rank_keys):
+            if not combo & additional_cards_mask:
+                live_combos.append(combo)
+                live_rank_keys.append(combo_rank_key)
+        # The known hand is evaluated last on the same prepared board
+        all_strengths = evaluate_players(board_mask, live_combos + [player_mask], live_rank_keys + [player_rank_key])
+        player_strength = all_strengths.pop()
+        below = [combo for combo, strength in zip(live_combos, all_strengths) if strength < player_strength]
+        equal = [combo for combo, strength in zip(live_combos, all_strengths) if strength == player_strength]
+        if opponent_amount == 1:
+            wins += len(below)
+            tie_counts[0] += len(equal)
+            deals += len(live_combos)
+        else:
+            below_pairs, equal_pairs = _count_disjoint_pairs(below), _count_disjoint_pairs(equal)
+            wins += below_pairs
+            tie_counts[1] += equal_pairs
+            tie_counts[0] += _count_disjoint_pairs(below + equal) - below_pairs - equal_pairs
+            deals += _count_disjoint_pairs(live_combos)
+    return wins, tie_counts, deals
+
+def sample_job_random_opponents(job_context, task):
+    """
+    Worker task for sampling: sample_amount trials from the task's RNG stream, each dealing the opponents
+    and the rest of the board from the remaining deck. Returns (wins, tie counts, trials).
+    """
+    player_mask, table_mask, opponent_amount, _ = job_context
+    seed, stream, sample_amount = task
+    rng = get_stream_rng(seed, stream)
+    available_cards, remaining_cards = get_runout_cards(table_mask, (player_mask,))
+    card_rank_keys = {card_mask: get_rank_key(card_mask) for card_mask in available_cards}
+    player_rank_key = get_rank_key(player_mask)
+    dealt_amount = 2 * opponent_amount + remaining_cards
+
+    wins = 0
+    tie_counts = [0] * opponent_amount
+    for _ in range(sample_amount):
+        dealt = rng.sample(available_cards, dealt_amount)
+        all_player_masks = [player_mask]
+        all_player_rank_keys = [player_rank_key]
+        for i in range(0, 2 * opponent_amount, 2):
+            all_player_masks.append(dealt[i] | dealt[i + 1])
+            all_player_rank_keys.append(card_rank_keys[dealt[i]] + card_rank_keys[dealt[i + 1]])
+        board_mask = table_mask | sum(dealt[2 * opponent_amount:])
+        all_player_strengths = evaluate_players(board_mask, all_player_masks, all_player_rank_keys)
+        player_strength = all_player_strengths[0]
+        highest_opponent_strength = max(all_player_strengths[1:])
+        if player_strength > highest_opponent_strength:
+            wins += 1
+        elif player_strength == highest_opponent_strength:
+            tie_counts[all_player_strengths.count(player_strength) - 2] += 1
+    return wins, tie_counts, sample_amount
+
+
+def random_opponents_odds(
+    player_cards: List[Card],
+    opponent_amount: int,
+    table_cards: List[Card],
+    exact: Optional[bool] = None,
+    target_precision: Optional[float] = 0.1,
+    confidence: float = 0.95,
+    time_budget: Optional[float] = None,
+    max_samples: Optional[int] = 10_000_000,
+    seed: Optional[int] = None,
+    batch_size: int = 5000,
+    evaluator: Optional[str] = None,
+    engine: Optional[CalculationEngine] = None,
+    backend: Optional[str] = None
+) -> RandomOpponentsResult:
+    """
+    Equity of player_cards against opponent_amount opponents with unknown hole cards.
+    exact=None enumerates when there are at most MAX_EXACT_OPPONENTS opponents and the work is below EXACT_MAX_EVALUATIONS,
+    otherwise trials are sampled with the same limits as monte_carlo_odds.
+    evaluator is only used for exact counting, the numpy one by default when numpy is installed.
+    """
+    player_mask = cards_to_mask(player_cards)
+    table_mask = cards_to_mask(table_cards)
+    if len(player_cards) != 2 or popcount(player_mask) != 2:
+        raise ValueError("The known hand needs 2 different cards")
+    if len(table_cards) > 5 or popcount(table_mask) != len(table_cards) or player_mask & table_mask:
+        raise ValueError("table_cards must be at most 5 unused, different cards")
+    remaining_cards = 5 - len(table_cards)
+    available_amount = 52 - 2 - len(table_cards)
+    if opponent_amount < 1 or 2 * opponent_amount + remaining_cards > available_amount:
+        raise ValueError(f"opponent_amount must be between 1 and {(available_amount - remaining_cards) // 2}")
+    if evaluator is None:
+        evaluator = NUMPY_EVALUATOR if np is not None else LOOKUP_EVALUATOR
+    if evaluator not in EVALUATORS:
+        raise ValueError(f"Unknown evaluator {evaluator}, expected one of {EVALUATORS}")
+    if evaluator == NUMPY_EVALUATOR:
+        require_numpy()
+
+    total_runouts = math.comb(available_amount, remaining_cards)
+    opponent_combos = math.comb(available_amount - remaining_cards, 2)
+    if exact is None:
+        exact = opponent_amount <= MAX_EXACT_OPPONENTS and total_runouts * opponent_combos <= EXACT_MAX_EVALUATIONS
+    if exact and opponent_amount > MAX_EXACT_OPPONENTS:
+        raise ValueError(f"Exact counting supports at most {MAX_EXACT_OPPONENTS} opponents, use exact=False")
+    if not exact and target_precision is None and time_budget is None and max_samples is None:
+        raise ValueError("Sampling needs a target_precision, time_budget or max_samples")
+
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    if exact:
+        plan = plan_execution(total_runouts, opponent_combos, backend=backend, has_warm_engine=engine is not None)
+    else:
+        seed = int.from_bytes(os.urandom(8), "big") if seed is None else seed
+        estimated_samples = max_samples or 10_000_000
+        if target_precision is not None:
+            estimated_samples = min(estimated_samples, math.ceil((z * 0.5 * 100 / target_precision) ** 2))
+        plan = plan_execution(estimated_samples, opponent_amount + 1, backend=backend, has_warm_engine=engine is not None)
+    print(f"Execution plan: {plan}")
+
+    job_context = (player_mask, table_mask, opponent_amount, evaluator)
+    wins = 0
+    tie_counts = [0] * opponent_amount
+    deals = 0
+    stop_reason = "exact" if exact else None
+    start_time = time.time()
+
+    def get_result() -> RandomOpponentsResult:
+        return RandomOpponentsResult(opponent_amount, wins, list(tie_counts), deals, exact, confidence, time.time() - start_time, stop_reason, seed)
+
+    def iter_tasks():
+        stream = 0
+        submitted = 0
+        while stop_reason is None and (max_samples is None or submitted < max_samples):
+            sample_amount = batch_size if max_samples is None else min(batch_size, max_samples - submitted)
+            yield seed, stream, sample_amount
+            stream += 1
+            submitted += sample_amount
+
+    with engine_for_plan(plan, engine) as engine:
+        if exact:
+            # A few shards per worker, so uneven runouts still balance
+            shard_size = max(1, math.ceil(total_runouts / (engine.processes * 4)))
+            results = engine.imap_unordered(process_job_random_opponent_runouts, job_context, split_index_ranges([(0, total_runouts)], shard_size))
+        else:
+            results = engine.imap_unordered(sample_job_random_opponents, job_context, iter_tasks())
+        for task_wins, task_tie_counts, task_deals in results:
+            wins += task_wins
+            tie_counts = [total + tie_count for total, tie_count in zip(tie_counts, task_tie_counts)]
+            deals += task_deals
+
+            if stop_reason is not None:
+                continue
+            enough_for_estimate = deals >= min(MIN_PRECISION_SAMPLES, max_samples or MIN_PRECISION_SAMPLES)
+            if target_precision is not None and enough_for_estimate and get_result().standard_error * z <= target_precision:
+                stop_reason = "precision"
+            elif time_budget is not None and time.time() - start_time >= time_budget:
+                stop_reason = "time budget"
+
+    if stop_reason is None:
+        stop_reason = "max samples"
+    return get_result()
@@ -0,0 +1,359 @@
+"""
+Hand ranges and hand-vs-range / range-vs-range equity.
+
+A range is a dict {combo mask: weight} of two-card holdings, parsed from the usual notation, e.g.
+"QQ+, AKs, AQo:0.5, A5s-A2s, KhQh" or "15%" (top 15% of starting hands by Chen score).
+
+Equity enumerates the runouts once. For every board each live combo of both ranges is evaluated once,
+all combos are sorted by strength and swept from weak to strong, so the weight a combo beats or ties is read
+from running sums instead of comparing every pair. Card removal uses per-card running sums: the weight of
+the combos sharing a hole card is subtracted per card, and the identical combo, subtracted twice, is added back.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+import math
+import time
+from .card import Card, FULL_DECK_MASK, RANK_CHARS, SUIT_BITS, SUIT_CHARS, card_from_str, cards_to_mask, mask_to_ids, mask_to_str, popcount
+from .evaluator import evaluate_players, get_rank_key
+from .all_cards import get_runout_cards
+from .combinatorics import iter_combination_masks, split_index_ranges
+from .engine import CalculationEngine, engine_for_plan
+from .planner import plan_execution
+
+TOTAL_COMBOS = 1326
+
+# combo mask -> weight
+Range = Dict[int, float]
+# Range notation, exact hole cards or an already parsed range
+RangeLike = Union[str, List[Card], Range]
+
+
+def get_class_combos(high: int, low: int, suited: Optional[bool] = None) -> List[int]:
+    """
+    Combo masks of a starting hand class (ranks 2-14, high >= low). suited None means suited and offsuit, ignored for pairs.
+    """
+    combos = []
+    for suit1 in range(4):
+        for suit2 in range(4):
+            if high == low and suit2 <= suit1:
+                continue
+            if high != low and suited is not None and (suit1 == suit2) != suited:
+                continue
+            combos.append((1 << (suit1 * SUIT_BITS + high - 2)) | (1 << (suit2 * SUIT_BITS + low - 2)))
+    return combos
+
+def get_class_name(high: int, low: int, suited: Optional[bool] = None) -> str:
+    name = RANK_CHARS[high - 2] + RANK_CHARS[low - 2]
+    if high == low or suited is None:
+        return name
+    return name + ("s" if suited else "o")
+
+def _chen_score(high: int, low: int, suited: bool) -> int:
+    score = {14: 10, 13: 8, 12: 7, 11: 6}.get(high, high / 2)
+    if high == low:
+        return math.ceil(max(5, score * 2))
+    if suited:
+        score += 2
+    gap = high - low - 1
+    score -= (0, 1, 2, 4)[gap] if gap < 4 else 5
+    if gap <= 1 and high < 12:
+        score += 1
+    return math.ceil(score)
+
+def get_hand_classes() -> List[Tuple[int, int, Optional[bool]]]:
+    """
+    The 169 starting hand classes (high, low, suited), pairs have suited None. Strongest first by Chen score,
+    ties broken by pairs first, then suited, then higher ranks. This is the order used by percentage ranges.
+    """
+    classes = []
+    for high in range(14, 1, -1):
+        for low in range(high, 1, -1):
+            if high == low:
+                classes.append((high, low, None))
+            else:
+                classes.append((high, low, True))
+                classes.append((high, low, False))
+    return sorted(classes, key=lambda hand_class: (
+        -_chen_score(hand_class[0], hand_class[1], bool(hand_class[2])), hand_class[2] is not None, not hand_class[2], -hand_class[0], -hand_class[1]
+    ))
+
+def get_top_range(percent: float, weight: float = 1.0) -> Range:
+    """Strongest hand classes (see get_hand_classes) until percent of all 1326 combos are covered."""
+    target = TOTAL_COMBOS * percent / 100
+    hand_range: Range = {}
+    for hand_class in get_hand_classes():
+        if len(hand_range) >= target:
+            break
+        for combo in get_class_combos(*hand_class):
+            hand_range[combo] = weight
+    return hand_range
+
+
+def _parse_rank(char: str, token: str) -> int:
+    if char.upper() not in RANK_CHARS:
+        raise ValueError(f"Invalid rank {char} in range token {token}")
+    return RANK_CHARS.index(char.upper()) + 2
+
+def _parse_class(text: str, token: str) -> Tuple[int, int, Optional[bool]]:
+    # "AKs" / "AKo" / "AK" / "QQ" -> (high, low, suited)
+    if len(text) not in (2, 3) or (len(text) == 3 and text[2].lower() not in "so"):
+        raise ValueError(f"Invalid hand class {text} in range token {token}")
+    first, second = _parse_rank(text[0], token), _parse_rank(text[1], token)
+    suited = None if len(text) == 2 else text[2].lower() == "s"
+    if first == second and suited is not None:
+        raise ValueError(f"Pairs can't be suited or offsuit in range token {token}")
+    return max(first, second), min(first, second), suited
+
+def _parse_range_item(item: str, token: str) -> List[int]:
+    if item.endswith("%"):
+        try:
+            return list(get_top_range(float(item[:-1])))
+        except ValueError:
+            raise ValueError(f"Invalid percentage in range token {token}") from None
+
+    # Exact combo, e.g. "AhKd"
+    if len(item) == 4 and item[1].lower() in SUIT_CHARS and item[3].lower() in SUIT_CHARS:
+        combo = card_from_str(item[:2]).mask | card_from_str(item[2:]).mask
+        if popcount(combo) != 2:
+            raise ValueError(f"Duplicate card in range token {token}")
+        return [combo]
+
+    if "-" in item:
+        # "88-55" or "A5s-A2s": same shape, only the pair rank / kicker changes
+        start, end = (_parse_class(part, token) for part in item.split("-", 1))
+        if start[2] != end[2] or (start[0] == start[1]) != (end[0] == end[1]) or (start[0] != start[1] and start[0] != end[0]):
+            raise ValueError(f"Invalid range {item} in range token {token}")
+        if start[0] == start[1]:
+            ranks = range(min(start[0], end[0]), max(start[0], end[0]) + 1)
+            return [combo for rank in ranks for combo in get_class_combos(rank, rank)]
+        kickers = range(min(start[1], end[1]), max(start[1], end[1]) + 1)
+        return [combo for kicker in kickers for combo in get_class_combos(start[0], kicker, start[2])]
+
+    if item.endswith("+"):
+        high, low, suited = _parse_class(item[:-1], token)
+        if high == low:
+            # "88+" -> 88 .. AA
+            return [combo for rank in range(low, 15) for combo in get_class_combos(rank, rank)]
+        # "ATs+" -> AT .. AK, the kicker goes up to just below the high card
+        return [combo for kicker in range(low, high) for combo in get_class_combos(high, kicker, suited)]
+
+    return get_class_combos(*_parse_class(item, token))
+
+def parse_range(notation: str) -> Range:
+    """
+    Parses comma / space separated range notation into {combo mask: weight}.
+    Supported: "AA", "AKs", "AKo", "AK", "QQ+", "ATs+", "88-55", "A5s-A2s", "AhKd", "15%", each with an optional ":weight".
+    Later tokens overwrite the weight of combos already in the range.
+    """
+    hand_range: Range = {}
+    for token in notation.replace(",", " ").split():
+        item, _, weight_text = token.partition(":")
+        try:
+            weight = float(weight_text) if weight_text else 1.0
+        except ValueError:
+            raise ValueError(f"Invalid weight in range token {token}") from None
+        for combo in _parse_range_item(item, token):
+            hand_range[combo] = weight
+    if not hand_range:
+        raise ValueError(f"Empty range {notation!r}")
+    return hand_range
+
+def to_range(range_like: RangeLike) -> Range:
+    """Range from notation, exact hole cards (weight 1) or an already parsed range."""
+    if isinstance(range_like, str):
+        return parse_range(range_like)
+    if isinstance(range_like, dict):
+        return dict(range_like)
+    if len(range_like) != 2:
+        raise ValueError("Exact hands must have exactly 2 cards")
+    return {cards_to_mask(range_like): 1.0}
+
+def remove_blocked_combos(hand_range: Range, dead_mask: int) -> Range:
+    """Drops the combos sharing a card with dead_mask (and combos with weight 0)."""
+    return {combo: weight for combo, weight in hand_range.items() if not combo & dead_mask and weight > 0}
+
+def range_to_str(hand_range: Range) -> str:
+    return ", ".join(mask_to_str(combo) + ("" if weight == 1 else f":{weight}") for combo, weight in hand_range.items())
+
+
+class RangeEquityResult:
+    """
+    Percentages over all (combo, combo, runout) deals, each deal weighted by the product of the two combo weights.
+    combo_equities holds the equity of every combo of each player's range against the other player's range.
+    """
+    def __init__(self, win_percentages: List[float], tie_percentages: List[float], equities: List[float],
+                 combo_equities: List[Dict[str, float]], boards: int, elapsed: float):
+        self.win_percentages = win_percentages
+        self.tie_percentages = tie_percentages
+        self.equities = equities
+        self.combo_equities = combo_equities
+        self.boards = boards
+        self.elapsed = elapsed
+
+    def __str__(self):
+        result_str = f'{self.boards} boards in {round(self.elapsed, 2)}s\n'
+        for j in range(len(self.equities)):
+            result_str += f'Player {j+1} wins {round(self.win_percentages[j], 2)}%, ties {round(self.tie_percentages[j], 2)}%, '
+            result_str += f'total equity: {round(self.equities[j], 2)}% ({len(self.combo_equities[j])} combos)\n'
+        return result_str
+
+
+def process_job_range_boards(job_context, index_ranges):
+    """
+    Worker task: sweeps the boards of the index ranges (runouts of the cards not on the table / in every combo of a range).
+    Returns per player and combo the summed weight of opposing combos it beat, tied and faced, plus the amount of boards.
+    """
+    all_range_combos, table_mask, dead_mask = job_context
+    available_cards, remaining_cards = get_runout_cards(table_mask, (dead_mask,))
+
+    results = [([0.0] * len(combos[0]), [0.0] * len(combos[0]), [0.0] * len(combos[0])) for combos in all_range_combos]
+    board_amount = 0
+    for start, end in index_ranges:
+        for additional_cards_mask in iter_combination_masks(available_cards, remaining_cards, start, end):
+            board_mask = table_mask | additional_cards_mask
+            board_amount += 1
+
+            # Live combos per side, each evaluated once: entries are (strength, side, combo index)
+            entries = []
+            live_totals = [0.0, 0.0]
+            live_card_sums = [[0.0] * 52, [0.0] * 52]
+            live_weights: List[Dict[int, float]] = [{}, {}]
+            for side, (masks, weights, rank_keys, combo_cards) in enumerate(all_range_combos):
+                live = [i for i, combo in enumerate(masks) if not combo & board_mask]
+                strengths = evaluate_players(board_mask, [masks[i] for i in live], [rank_keys[i] for i in live])
+                card_sums = live_card_sums[side]
+                for i, strength in zip(live, strengths):
+                    weight = weights[i]
+                    card1, card2 = combo_cards[i]
+                    live_totals[side] += weight
+                    card_sums[card1] += weight
+                    card_sums[card2] += weight
+                    live_weights[side][masks[i]] = weight
+                    entries.append((strength, side, i))
+            entries.sort()
+
+            # Sweep from weak to strong, one group of equal strength at a time
+            below_totals = [0.0, 0.0]
+            below_card_sums = [[0.0] * 52, [0.0] * 52]
+            group_start = 0
+            while group_start < len(entries):
+                strength = entries[group_start][0]
+                group_end = group_start
+                while group_end < len(entries) and entries[group_end][0] == strength:
+                    group_end += 1
+                group = entries[group_start:group_end]
+
+                group_totals = [0.0, 0.0]
+                group_card_sums: List[Dict[int, float]] = [{}, {}]
+                group_weights: List[Dict[int, float]] = [{}, {}]
+                for _, side, i in group:
+                    masks, weights, rank_keys, combo_cards = all_range_combos[side]
+                    weight = weights[i]
+                    card1, card2 = combo_cards[i]
+                    group_totals[side] += weight
+                    group_card_sums[side][card1] = group_card_sums[side].get(card1, 0.0) + weight
+                    group_card_sums[side][card2] = group_card_sums[side].get(card2, 0.0) + weight
+                    group_weights[side][masks[i]] = weight
+
+                for _, side, i in group:
+                    other = 1 - side
+                    masks, weights, rank_keys, combo_cards = all_range_combos[side]
+                    card1, card2 = combo_cards[i]
+                    combo = masks[i]
+                    # An identical combo always has the same strength, so it's never in the below sums
+                    beaten = below_totals[other] - below_card_sums[other][card1] - below_card_sums[other][card2]
+                    other_group_card_sums = group_card_sums[other]
+                    tied = group_totals[other] - other_group_card_sums.get(card1, 0.0) - other_group_card_sums.get(card2, 0.0) + group_weights[other].get(combo, 0.0)
+                    faced = live_totals[other] - live_card_sums[other][card1] - live_card_sums[other][card2] + live_weights[other].get(combo, 0.0)
+                    combo_beaten, combo_tied, combo_faced = results[side]
+                    combo_beaten[i] += beaten
+                    combo_tied[i] += tied
+                    combo_faced[i] += faced
+
+                for _, side, i in group:
+                    card1, card2 = all_range_combos[side][3][i]
+                    weight = all_range_combos[side][1][i]
+                    below_totals[side] += weight
+                    below_card_sums[side][card1] += weight
+                    below_card_sums[side][card2] += weight
+                group_start = group_end
+    return results, board_amount
+
+
+def range_equity(
+    ranges: Sequence[RangeLike],
+    table_cards: List[Card],
+    engine: Optional[CalculationEngine] = None,
+    backend: Optional[str] = None,
+    boards_per_task: int = 64
+) -> RangeEquityResult:
+    """
+    Exact equity of two players, each given as range notation, exact hole cards or a parsed range,
+    e.g. range_equity(["AKs", "15%"], flop) or range_equity([[Card(...), Card(...)], "QQ+, AK"], []).
+    Every board is evaluated once per live combo, so range vs range on a flop takes seconds.
+    Preflop means ~1.7M boards per sweep though, that is much slower.
+    """
+    if len(ranges) != 2:
+        raise ValueError("range_equity compares exactly two players (hand vs range or range vs range)")
+    table_mask = cards_to_mask(table_cards)
+    if popcount(table_mask) != len(table_cards) or len(table_cards) not in (0, 3, 4, 5):
+        raise ValueError("table_cards must be 0, 3, 4 or 5 different cards")
+    all_ranges = [remove_blocked_combos(to_range(range_like), table_mask) for range_like in ranges]
+    for j, hand_range in enumerate(all_ranges):
+        if not hand_range:
+            raise ValueError(f"Every combo of player {j+1}'s range is blocked by the table cards")
+
+    # Cards held by every combo of a range (e.g. an exact hand) can't be on the board
+    dead_mask = table_mask
+    for hand_range in all_ranges:
+        common_cards = FULL_DECK_MASK
+        for combo in hand_range:
+            common_cards &= combo
+        dead_mask |= common_cards
+    # (masks, weights, rank keys, card ids) per player, shared with the workers once per job
+    all_range_combos = tuple(
+        (tuple(hand_range), tuple(hand_range.values()), tuple(get_rank_key(combo) for combo in hand_range), tuple(tuple(mask_to_ids(combo)) for combo in hand_range))
+        for hand_range in all_ranges
+    )
+    job_context = (all_range_combos, table_mask, dead_mask)
+
+    available_amount = popcount(FULL_DECK_MASK & ~dead_mask)
+    total_boards = math.comb(available_amount, 5 - len(table_cards))
+    plan = plan_execution(total_boards, sum(len(hand_range) for hand_range in all_ranges), backend=backend, has_warm_engine=engine is not None)
+    print(f"Execution plan: {plan}")
+
+    start_time = time.time()
+    totals = [([0.0] * len(hand_range), [0.0] * len(hand_range), [0.0] * len(hand_range)) for hand_range in all_ranges]
+    boards = 0
+    with engine_for_plan(plan, engine) as engine:
+        tasks = split_index_ranges([(0, total_boards)], boards_per_task)
+        for results, board_amount in engine.imap_unordered(process_job_range_boards, job_context, tasks):
+            for side_totals, side_results in zip(totals, results):
+                for combo_totals, combo_results in zip(side_totals, side_results):
+                    for i, value in enumerate(combo_results):
+                        combo_totals[i] += value
+            boards += board_amount
+
+    # Weighted by the combo's own weight, the faced weight sums to the same total deal weight for both players
+    win_weights, tie_weights, deal_weights, combo_equities = [], [], [], []
+    for (masks, weights, _, _), (beaten, tied, faced) in zip(all_range_combos, totals):
+        win_weights.append(sum(weight * value for weight, value in zip(weights, beaten)))
+        tie_weights.append(sum(weight * value for weight, value in zip(weights, tied)))
+        deal_weights.append(sum(weight * value for weight, value in zip(weights, faced)))
+        combo_equities.append({
+            mask_to_str(combo): (combo_beaten + combo_tied / 2) / combo_faced * 100
+            for combo, combo_beaten, combo_tied, combo_faced in zip(masks, beaten, tied, faced) if combo_faced > 0
+        })
+    total_weight = deal_weights[0]
+    if total_weight == 0:
+        raise ValueError("The ranges have no compatible combos")
+
+    win_percentages = [win_weight / total_weight * 100 for win_weight in win_weights]
+    tie_percentages = [tie_weight / total_weight * 100 for tie_weight in tie_weights]
+    return RangeEquityResult(
+        win_percentages=win_percentages,
+        tie_percentages=tie_percentages,
+        equities=[win + tie / 2 for win, tie in zip(win_percentages, tie_percentages)],
+        combo_equities=combo_equities,
+        boards=boards,
+        elapsed=time.time() - start_time
+    )
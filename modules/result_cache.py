@@ -0,0 +1,116 @@
+"""
+Result cache in front of the calculator: an in-memory LRU with a size bound plus an optional sqlite store on disk.
+
+Keys are canonical, so equivalent spots share one entry: the players are sorted and, for complete enumerations,
+the suits are relabelled to the smallest form over all 24 suit permutations (suits don't change who wins how often).
+Partial runs (a subset of the numerators of a division) sample boards by their index, which depends on the suits,
+so those are only normalised by player order. Cached counters are stored in canonical player order and
+remapped to the caller's order on every hit.
+"""
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+import itertools
+import json
+import sqlite3
+import threading
+from .card import Card, SUIT_BITS, cards_to_mask
+
+SUIT_MASK = (1 << SUIT_BITS) - 1
+_SUIT_PERMUTATIONS = list(itertools.permutations(range(4)))
+_IDENTITY = [(0, 1, 2, 3)]
+
+def get_canonical_situation(all_player_masks: Sequence[int], table_mask: int, division: int, numerators_to_check: Sequence[int]) -> Tuple[str, List[int]]:
+    """
+    (cache key, player order) where player order[i] is the caller's index of the i-th player in the key.
+    """
+    numerators = sorted({numerator for numerator in numerators_to_check if 0 <= numerator < division})
+    is_complete = len(numerators) == division
+    # Suit chunks of every mask, table first, so each permutation is just a re-shift of 4 chunks per mask
+    all_chunks = [[(mask >> (suit * SUIT_BITS)) & SUIT_MASK for suit in range(4)] for mask in [table_mask, *all_player_masks]]
+    best = None
+    for permutation in (_SUIT_PERMUTATIONS if is_complete else _IDENTITY):
+        shifts = [permutation[suit] * SUIT_BITS for suit in range(4)]
+        permuted = [(chunks[0] << shifts[0]) | (chunks[1] << shifts[1]) | (chunks[2] << shifts[2]) | (chunks[3] << shifts[3]) for chunks in all_chunks]
+        players = sorted(zip(permuted[1:], range(len(all_player_masks))))
+        candidate = (permuted[0], tuple(mask for mask, _ in players))
+        if best is None or candidate < best[0]:
+            best = (candidate, [i for _, i in players])
+    (canonical_table, canonical_players), player_order = best
+    # A complete run gives the same counts for every division
+    mode = "all" if is_complete else f"{division}:{','.join(map(str, numerators))}"
+    key = f"{canonical_table}|{','.join(map(str, canonical_players))}|{mode}"
+    return key, player_order
+
+
+class ResultCache:
+    """
+    Maps canonical situations to (wins, ties, tie shares, total) counters. max_entries bounds the in-memory LRU,
+    with a path results are also kept in a sqlite file and survive restarts. Safe to share between threads.
+    """
+    def __init__(self, max_entries: int = 1024, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[List[int], List[int], List[int], int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+        if path is not None:
+            self._connection = sqlite3.connect(path, check_same_thread=False)
+            self._connection.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, counts TEXT NOT NULL)")
+            self._connection.commit()
+
+    def _remember(self, key: str, counts: Tuple[List[int], List[int], List[int], int]):
+        self._entries[key] = counts
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, all_player_cards: List[List[Card]], table_cards: List[Card], division: int, numerators_to_check: Sequence[int]) -> Optional[Tuple[List[int], List[int], List[int], int]]:
+        """Cached (wins, ties, tie shares, total) in the caller's player order, None on a miss."""
+        key, player_order = get_canonical_situation([cards_to_mask(cards) for cards in all_player_cards], cards_to_mask(table_cards), division, numerators_to_check)
+        with self._lock:
+            counts = self._entries.get(key)
+            if counts is None and self._connection is not None:
+                row = self._connection.execute("SELECT counts FROM results WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    stored_counts = json.loads(row[0])
+                    # Rows written before the counters had tie shares are misses, the next put replaces them
+                    if len(stored_counts) == 4:
+                        wins, ties, tie_shares, total = stored_counts
+                        counts = (wins, ties, tie_shares, total)
+            if counts is None:
+                self.misses += 1
+                return None
+            self._remember(key, counts)
+            self.hits += 1
+
+        wins, ties, tie_shares, total = counts
+        caller_wins = [0] * len(wins)
+        caller_ties = [0] * len(ties)
+        caller_tie_shares = [0] * len(tie_shares)
+        for canonical_index, caller_index in enumerate(player_order):
+            caller_wins[caller_index] = wins[canonical_index]
+            caller_ties[caller_index] = ties[canonical_index]
+            caller_tie_shares[caller_index] = tie_shares[canonical_index]
+        return caller_wins, caller_ties, caller_tie_shares, total
+
+    def put(self, all_player_cards: List[List[Card]], table_cards: List[Card], division: int, numerators_to_check: Sequence[int], counts: Tuple[List[int], List[int], List[int], int]):
+        key, player_order = get_canonical_situation([cards_to_mask(cards) for cards in all_player_cards], cards_to_mask(table_cards), division, numerators_to_check)
+        wins, ties, tie_shares, total = counts
+        canonical_counts = ([wins[i] for i in player_order], [ties[i] for i in player_order], [tie_shares[i] for i in player_order], total)
+        with self._lock:
+            self._remember(key, canonical_counts)
+            if self._connection is not None:
+                self._connection.execute("INSERT OR REPLACE INTO results (key, counts) VALUES (?, ?)", (key, json.dumps(canonical_counts)))
+                self._connection.commit()
+
+    def clear(self):
+        """Empties the in-memory LRU, the disk store is kept."""
+        with self._lock:
+            self._entries.clear()
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
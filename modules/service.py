@@ -0,0 +1,236 @@
+"""
+Local equity service: a long-running process that keeps the engine's worker pool, the lookup tables
+and the result cache warm, and answers requests over HTTP on localhost or a unix socket (stdlib only).
+
+POST /odds with a scenario in the batch runner format ({"players": ["AhKh", "QsQd"], "board": "2h9hTs"}) returns
+the same result JSON as a batch runner line. GET /health returns counters.
+
+Requests are handled concurrently with asyncio. Identical requests that arrive while the first one is still being
+calculated wait for that calculation instead of starting their own. Every request waits at most timeout seconds (504 after that).
+The calculation itself keeps running for the other waiters and the cache. Invalid scenarios get 400, failed calculations 500.
+Small scenarios run whole on one pool worker each, large ones one at a time on the whole pool.
+
+Usage: python -m modules.service [--host 127.0.0.1] [--port 8765] [--unix PATH] [--processes N] [--timeout 30] [--cache-path PATH]
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+import argparse
+import asyncio
+import contextlib
+import json
+import sys
+import time
+from .card import cards_to_mask
+from .engine import CalculationEngine, SerialEngine
+from .result_cache import ResultCache
+from .preflop_tables import get_preflop_table
+from .planner import SERIAL
+from .batch_runner import BATCH_JOB_CONTEXT, EXACT, SMALL_SCENARIO_EVALUATIONS, Scenario, get_exact_result, parse_scenario, run_scenario
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_TIMEOUT = 30.0
+MAX_BODY_SIZE = 1 << 20
+
+_STATUS_TEXTS = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large", 500: "Internal Server Error", 504: "Gateway Timeout"}
+
+
+def process_job_scenario(job_context, scenario: Scenario) -> Dict[str, Any]:
+    """Worker task: one small scenario, run whole in the worker. Errors are raised to the waiting request."""
+    return run_scenario(scenario, backend=SERIAL)
+
+
+class EquityService:
+    """
+    Calculates scenarios for concurrent requests on one warm engine, see the module docstring.
+    Pass an engine to share it, otherwise the service creates (and closes) its own.
+    """
+    def __init__(self, engine=None, cache: Optional[ResultCache] = None, timeout: float = DEFAULT_TIMEOUT):
+        self.owns_engine = engine is None
+        self.engine = CalculationEngine() if engine is None else engine
+        self.cache = ResultCache() if cache is None else cache
+        self.timeout = timeout
+        self.requests = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self._in_flight: Dict[str, "asyncio.Future"] = {}
+        # Large scenarios use the whole pool, so they run one at a time in this thread
+        self._large_executor = ThreadPoolExecutor(max_workers=1)
+        # Small scenarios are single pool tasks, one waiting thread per worker slot.
+        # Without a pool they run in-process, in the same single thread (calculations print and redirect stdout)
+        if isinstance(self.engine, CalculationEngine):
+            self._small_executor = ThreadPoolExecutor(max_workers=self.engine.processes * 2)
+        else:
+            self._small_executor = self._large_executor
+
+    def warm_up(self):
+        """Loads the lookup tables before the first request."""
+        get_preflop_table()
+
+    def _get_request_key(self, scenario: Scenario) -> str:
+        # Everything that changes the result, but not the id
+        return json.dumps([
+            scenario.mode, [cards_to_mask(player_cards) for player_cards in scenario.all_player_cards], cards_to_mask(scenario.table_cards),
+            scenario.precision, scenario.max_samples, scenario.time_budget, scenario.seed
+        ])
+
+    def _run(self, scenario: Scenario, is_small: bool) -> Dict[str, Any]:
+        if is_small:
+            return self.engine.map(process_job_scenario, BATCH_JOB_CONTEXT, [scenario])[0]
+        return run_scenario(scenario, engine=self.engine)
+
+    async def _calculate(self, scenario: Scenario) -> Dict[str, Any]:
+        is_small = scenario.estimate_evaluations() <= SMALL_SCENARIO_EVALUATIONS
+        executor = self._small_executor if is_small else self._large_executor
+        result = await asyncio.get_running_loop().run_in_executor(executor, self._run, scenario, is_small)
+        if scenario.mode == EXACT:
+            self.cache.put(scenario.all_player_cards, scenario.table_cards, 1, [0], (result["player_wins"], result["player_ties"], result["player_tie_shares"], result["total"]))
+        return result
+
+    async def calculate(self, scenario: Scenario) -> Dict[str, Any]:
+        """
+        Result dict of the scenario, raises asyncio.TimeoutError after timeout seconds.
+        If the calculation fails, its exception is raised to every request waiting for it.
+        """
+        start_time = time.time()
+        self.requests += 1
+        if scenario.mode == EXACT:
+            counts = self.cache.get(scenario.all_player_cards, scenario.table_cards, 1, [0])
+            if counts is not None:
+                return get_exact_result(scenario, counts, time.time() - start_time)
+
+        key = self._get_request_key(scenario)
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._calculate(scenario))
+            self._in_flight[key] = future
+            future.add_done_callback(lambda done_future: self._finish_calculation(key, done_future))
+        else:
+            self.coalesced += 1
+        try:
+            # Shielded, a timed out waiter must not cancel the calculation the others wait for
+            result = await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        return {**result, "id": scenario.id}
+
+    def _finish_calculation(self, key: str, future: "asyncio.Future"):
+        self._in_flight.pop(key, None)
+        # Retrieved here, in case every waiter timed out before the calculation failed
+        if not future.cancelled():
+            future.exception()
+
+    def get_health(self) -> Dict[str, Any]:
+        return {
+            "status": "ok", "requests": self.requests, "coalesced": self.coalesced, "timeouts": self.timeouts,
+            "in_flight": len(self._in_flight), "cache_hits": self.cache.hits, "cache_misses": self.cache.misses,
+        }
+
+    async def _respond(self, method: str, path: str, body: bytes) -> Tuple[int, Dict[str, Any]]:
+        if path == "/health" and method == "GET":
+            return 200, self.get_health()
+        if path != "/odds" or method != "POST":
+            return 404, {"error": f"Unknown endpoint {method} {path}, use POST /odds or GET /health"}
+        try:
+            scenario = parse_scenario(body.decode("utf-8", errors="replace"), self.requests + 1)
+            return 200, await self.calculate(scenario)
+        except ValueError as error:
+            return 400, {"error": str(error)}
+        except asyncio.TimeoutError:
+            return 504, {"error": f"Not finished within {self.timeout}s"}
+        except Exception as error:
+            return 500, {"error": f"{type(error).__name__}: {error}"}
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Minimal HTTP/1.1 with keep-alive: request line, headers, Content-Length body."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                parts = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    content_length = int(headers.get("content-length", 0) or 0)
+                except ValueError:
+                    content_length = -1
+                if content_length < 0:
+                    # The body can't be skipped without a valid length, so the connection is closed after the answer
+                    status, response = 400, {"error": "Invalid Content-Length header"}
+                elif content_length > MAX_BODY_SIZE:
+                    status, response = 413, {"error": f"Request body over {MAX_BODY_SIZE} bytes"}
+                else:
+                    body = await reader.readexactly(content_length) if content_length else b""
+                    if len(parts) < 2:
+                        status, response = 400, {"error": "Invalid request line"}
+                    else:
+                        status, response = await self._respond(parts[0].upper(), parts[1], body)
+
+                keep_alive = headers.get("connection", "").lower() != "close" and content_length >= 0 and status != 413
+                payload = json.dumps(response).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {_STATUS_TEXTS[status]}\r\nContent-Type: application/json\r\nContent-Length: {len(payload)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + payload
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    async def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, unix_path: Optional[str] = None, started: Optional[asyncio.Event] = None):
+        """Serves until cancelled, on a unix socket if unix_path is given, otherwise on host:port."""
+        if unix_path is not None:
+            server = await asyncio.start_unix_server(self.handle_connection, path=unix_path)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host=host, port=port)
+        print(f"Equity service listening on {unix_path or f'http://{host}:{port}'}", file=sys.stderr)
+        if started is not None:
+            started.set()
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self._large_executor.shutdown(wait=True)
+        self._small_executor.shutdown(wait=True)
+        if self.owns_engine:
+            self.engine.close()
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Local equity service with a warm worker pool")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", help="Serve on this unix socket path instead of host:port")
+    parser.add_argument("--processes", type=int, help="Worker processes, 0 calculates in the service process")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="Seconds a request waits for its result")
+    parser.add_argument("--cache-path", help="sqlite file that keeps cached results across restarts")
+    args = parser.parse_args(args)
+
+    engine = SerialEngine() if args.processes == 0 else CalculationEngine(args.processes)
+    service = EquityService(engine, ResultCache(path=args.cache_path), timeout=args.timeout)
+    service.owns_engine = True
+    try:
+        # Calculation progress output goes to stderr
+        with contextlib.redirect_stdout(sys.stderr):
+            service.warm_up()
+            asyncio.run(service.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Street-to-street session: enumerates the runouts of a flop (or turn) once and answers the later streets from it.
+
+The turn result is just the subset of flop runouts containing the turn card, and the river result is a single runout,
+so the session keeps who won every runout plus counters per next card. Moving to the turn or river is a lookup,
+and the same counters give the equity for every possible next card.
+"""
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import math
+import time
+from .card import Card, FULL_DECK_MASK, cards_to_mask, card_from_id, mask_to_ids, popcount
+from .evaluator import evaluate_players, get_rank_key
+from .all_cards import get_runout_cards
+from .combinatorics import iter_combination_masks, split_index_ranges
+from .engine import CalculationEngine, engine_for_plan
+from .planner import plan_execution
+from .utils import get_equities, get_tie_share
+
+# Counters as returned by calc_counts: (wins, ties, tie shares, total), tie shares in utils.TIE_SHARE_UNIT
+Counts = Tuple[List[int], List[int], List[int], int]
+
+
+def iter_runout_winners(job_context, index_ranges) -> Iterator[Tuple[int, int]]:
+    """(runout mask, bitmask of the players with the best hand) for every runout of the index ranges."""
+    all_player_masks, table_mask = job_context
+    available_cards, remaining_cards = get_runout_cards(table_mask, all_player_masks)
+    all_player_rank_keys = [get_rank_key(player_mask) for player_mask in all_player_masks]
+
+    for start, end in index_ranges:
+        for runout_mask in iter_combination_masks(available_cards, remaining_cards, start, end):
+            all_player_strengths = evaluate_players(table_mask | runout_mask, all_player_masks, all_player_rank_keys)
+            highest_strength = max(all_player_strengths)
+            winners = 0
+            for i, strength in enumerate(all_player_strengths):
+                if strength == highest_strength:
+                    winners |= 1 << i
+            yield runout_mask, winners
+
+def process_job_runout_winners(job_context, index_ranges):
+    """Worker task: iter_runout_winners as a list."""
+    return list(iter_runout_winners(job_context, index_ranges))
+
+def count_winners(winner_amounts: Iterable[Tuple[int, int]], player_amount: int) -> Counts:
+    """Counters like calc_counts from (bitmask of the players with the best hand, amount of runouts) pairs."""
+    wins = [0] * player_amount
+    ties = [0] * player_amount
+    tie_shares = [0] * player_amount
+    total = 0
+    for winners, amount in winner_amounts:
+        if winners & (winners - 1) == 0:
+            wins[winners.bit_length() - 1] += amount
+        else:
+            tie_share = get_tie_share(popcount(winners)) * amount
+            for i in range(player_amount):
+                if winners >> i & 1:
+                    ties[i] += amount
+                    tie_shares[i] += tie_share
+        total += amount
+    return wins, ties, tie_shares, total
+
+def _to_odds(counts: Counts) -> Tuple[List[float], List[float], List[int], List[int], List[float]]:
+    wins, ties, tie_shares, total = counts
+    return [win / total * 100 for win in wins], [tie / total * 100 for tie in ties], wins, ties, get_equities(wins, tie_shares, total)
+
+
+class StreetSession:
+    """
+    Created on the flop (or turn), enumerates all runouts once. Later streets are answered with
+    get_odds(new table cards) without enumerating again, results have the shape of calc_odds.
+    """
+    def __init__(self, all_player_cards: List[List[Card]], table_cards: List[Card], engine: Optional[CalculationEngine] = None, backend: Optional[str] = None):
+        if len(table_cards) not in (3, 4):
+            raise ValueError("A street session starts on the flop or the turn (3 or 4 table cards)")
+        self.all_player_cards = all_player_cards
+        self.table_cards = list(table_cards)
+        self.table_mask = cards_to_mask(table_cards)
+        all_player_masks = tuple(cards_to_mask(player_cards) for player_cards in all_player_cards)
+        self.dead_mask = self.table_mask
+        for player_mask in all_player_masks:
+            self.dead_mask |= player_mask
+        self.player_amount = len(all_player_masks)
+
+        available_amount = popcount(FULL_DECK_MASK & ~self.dead_mask)
+        total_runouts = math.comb(available_amount, 5 - len(table_cards))
+        plan = plan_execution(total_runouts, self.player_amount, backend=backend, has_warm_engine=engine is not None)
+        print(f"Execution plan: {plan}")
+
+        start_time = time.time()
+        # runout mask -> bitmask of the players with the best hand
+        self.runout_winners: Dict[int, int] = {}
+        with engine_for_plan(plan, engine) as engine:
+            shard_size = max(1, math.ceil(total_runouts / engine.processes))
+            tasks = split_index_ranges([(0, total_runouts)], shard_size)
+            for runout_winners in engine.imap_unordered(process_job_runout_winners, (all_player_masks, self.table_mask), tasks):
+                self.runout_winners.update(runout_winners)
+        print(f"Time taken to enumerate all runouts: {round(time.time() - start_time, 2)}s")
+
+        # Counters for the whole enumeration and per next card, so every street after this one is a lookup
+        self.total_counts = self._count_runouts(self.runout_winners.values())
+        next_card_winners: Dict[int, List[int]] = {}
+        for runout_mask, winners in self.runout_winners.items():
+            for card_id in mask_to_ids(runout_mask):
+                next_card_winners.setdefault(card_id, []).append(winners)
+        self.next_card_counts: Dict[int, Counts] = {card_id: self._count_runouts(winners) for card_id, winners in next_card_winners.items()}
+
+    def _count_runouts(self, all_winners) -> Counts:
+        return count_winners(Counter(all_winners).items(), self.player_amount)
+
+    def get_counts(self, table_cards: List[Card]) -> Counts:
+        """(wins, ties, tie shares, total) like calc_counts, for the session's table plus any cards dealt since."""
+        table_mask = cards_to_mask(table_cards)
+        new_cards_mask = table_mask & ~self.table_mask
+        if table_mask & self.table_mask != self.table_mask or popcount(table_mask) != len(table_cards):
+            raise ValueError("table_cards must contain the session's table cards, without duplicates")
+        if new_cards_mask & self.dead_mask or len(table_cards) > 5:
+            raise ValueError("The new table cards must be unused cards, with at most 5 table cards in total")
+
+        new_card_amount = popcount(new_cards_mask)
+        if new_card_amount == 0:
+            return self.total_counts
+        if new_card_amount == 5 - len(self.table_cards):
+            # River: a single runout
+            return self._count_runouts([self.runout_winners[new_cards_mask]])
+        # Turn after a flop session
+        return self.next_card_counts[new_cards_mask.bit_length() - 1]
+
+    def get_odds(self, table_cards: List[Card]) -> Tuple[List[float], List[float], List[int], List[int], List[float]]:
+        """Same result as calc_odds(all_player_cards, table_cards, ...), without enumerating again."""
+        return _to_odds(self.get_counts(table_cards))
+
+    def get_next_card_odds(self) -> Dict[Card, Tuple[List[float], List[float], List[int], List[int], List[float]]]:
+        """calc_odds result for every possible next card."""
+        return {card_from_id(card_id): _to_odds(counts) for card_id, counts in sorted(self.next_card_counts.items())}
@@ -1,17 +1,34 @@
-def get_results_str(all_player_cards, total_win_percentages, total_tie_percentages, total_player_wins, total_player_ties):
+from typing import List
+import math
+from .card import cards_to_mask, popcount
+
+# Holdem deals at most 23 hands (46 hole cards + 5 table cards), ties are split between 2 to 23 players
+MAX_PLAYERS = 23
+# Tie shares are counted in units of this per pot, divisible by every possible amount of tied players,
+# so the counters stay exact integers that add up across shards and files
+TIE_SHARE_UNIT = math.lcm(*range(2, MAX_PLAYERS + 1))
+
+def get_tie_share(tied_player_amount: int) -> int:
+    """Share of the pot (in TIE_SHARE_UNIT) each of tied_player_amount tied players gets."""
+    return TIE_SHARE_UNIT // tied_player_amount
+
+def get_equities(player_wins: List[int], player_tie_shares: List[int], total: int) -> List[float]:
+    """Equity percentage per player: wins plus the pot shares won in ties, over all counted boards."""
+    return [(win + tie_share / TIE_SHARE_UNIT) / total * 100 for win, tie_share in zip(player_wins, player_tie_shares)]
+
+def get_results_str(all_player_cards, total_win_percentages, total_tie_percentages, total_player_wins, total_player_ties, total_equities):
     result_str = ""
     for j in range(len(all_player_cards)):
         result_str += f'Player {j+1} wins {total_player_wins[j]} times or {round(total_win_percentages[j], 2)}%\n'
         result_str += f'Player {j+1} ties {total_player_ties[j]} times or {round(total_tie_percentages[j], 2)}%\n'
-        total_equity = total_win_percentages[j] + (total_tie_percentages[j] / len(all_player_cards))
-        result_str += f'Player {j+1} total equity: {round(total_equity, 2)}%\n'
+        result_str += f'Player {j+1} total equity: {round(total_equities[j], 2)}%\n'
         result_str += '-' * 40 + '\n'
     return result_str
 
 def check_validity(all_player_cards, table_cards):
-    # Check for duplicate cards
+    # Check for duplicate cards, every card is one bit so duplicates collapse in the mask
     all_cards = [card for player_cards in all_player_cards for card in player_cards] + table_cards
-    if len(all_cards) != len(set(all_cards)):
+    if popcount(cards_to_mask(all_cards)) != len(all_cards):
         raise ValueError("Duplicate cards found in all_player_cards or table_cards")
     
     for player_cards in all_player_cards:
@@ -0,0 +1,36 @@
+import asyncio
+import contextlib
+import io
+import pytest
+from modules.card import cards_from_str
+from modules.calculator import aiter_odds
+
+PLAYERS = [cards_from_str("AhKh"), cards_from_str("QsQd")]
+
+
+@pytest.fixture(autouse=True)
+def quiet():
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def test_cancel_yields_the_running_round():
+    async def consume(snapshots, first_snapshot_received):
+        async for snapshot in aiter_odds(PLAYERS, [], division=64, backend="serial", use_preflop_table=False):
+            snapshots.append(snapshot)
+            first_snapshot_received.set()
+
+    async def main():
+        snapshots = []
+        first_snapshot_received = asyncio.Event()
+        task = asyncio.ensure_future(consume(snapshots, first_snapshot_received))
+        await first_snapshot_received.wait()
+        # The second round is running now
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return snapshots
+
+    snapshots = asyncio.run(main())
+    assert [snapshot.numerators_done for snapshot in snapshots] == [1, 2]
+    assert not snapshots[-1].is_final
@@ -0,0 +1,64 @@
+import contextlib
+import io
+import json
+import pytest
+from modules import batch_runner
+from modules.batch_runner import parse_scenario, run_batch
+from modules.engine import SerialEngine
+
+
+@pytest.fixture(autouse=True)
+def quiet():
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+@pytest.mark.parametrize("line", [
+    '{"players": 5}',
+    '{"players": ["AhKh", 7]}',
+    '{"players": ["AhKh", "QsQd"], "board": 7}',
+    '{"players": ["AhKh", "QsQd"], "mode": "monte_carlo", "precision": "x"}',
+    '{"players": ["AhKh", "QsQd"], "mode": "monte_carlo", "precision": -1}',
+    '{"players": ["AhKh", "QsQd"], "mode": "monte_carlo", "max_samples": 1.5}',
+    '{"players": ["AhKh", "QsQd"], "mode": "monte_carlo", "time_budget": true}',
+    '{"players": ["AhKh", "QsQd"], "mode": "monte_carlo", "seed": "1"}',
+])
+def test_parse_scenario_rejects_wrong_types(line):
+    with pytest.raises(ValueError):
+        parse_scenario(line, 1)
+
+
+def test_bad_lines_become_error_records():
+    lines = [
+        '{"id": "ok", "players": ["AhKh", "QsQd"], "board": "2h9hTs3c"}',
+        '{"players": 5}',
+        '{"players": ["AhKh", "QsQd"], "board": 7}',
+        '{"id": "mc", "players": ["AhKh", "QsQd"], "board": "2h9hTs3c", "mode": "monte_carlo", "precision": "x"}',
+        '{"id": "river", "players": ["AhKh", "QsQd"], "board": "2h9hTs3cJd"}',
+    ]
+    output = io.StringIO()
+    assert run_batch(lines, output, SerialEngine()) == (2, 3)
+    results = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert sorted(str(result["id"]) for result in results if "error" not in result) == ["ok", "river"]
+    assert sorted(str(result["id"]) for result in results if "error" in result) == ["2", "3", "4"]
+
+
+def test_failing_scenario_does_not_stop_the_batch(monkeypatch):
+    original_run_scenario = batch_runner.run_scenario
+
+    def run_scenario(scenario, engine=None, backend=None):
+        if scenario.id == "bad":
+            raise RuntimeError("worker failed")
+        return original_run_scenario(scenario, engine=engine, backend=backend)
+
+    monkeypatch.setattr(batch_runner, "run_scenario", run_scenario)
+    monkeypatch.setattr(batch_runner, "SMALL_SCENARIO_EVALUATIONS", 100)
+    lines = [
+        '{"id": "bad", "players": ["AhKh", "QsQd"], "board": "2h9hTs"}',
+        '{"id": "bad", "players": ["AhKh", "QsQd"], "board": "2h9hTs3cJd"}',
+        '{"id": "ok", "players": ["AhKh", "QsQd"], "board": "2h9hTs3cJd"}',
+    ]
+    output = io.StringIO()
+    assert run_batch(lines, output, SerialEngine()) == (1, 2)
+    results = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [result["error"] for result in results if "error" in result] == ["RuntimeError: worker failed"] * 2
@@ -0,0 +1,58 @@
+import contextlib
+import io
+import json
+import pytest
+from modules.card import cards_from_str
+from modules.calculator import calc_counts
+from modules.engine import SerialEngine
+
+PLAYERS = [cards_from_str("AhKd"), cards_from_str("AsKc"), cards_from_str("QsQd")]
+# 903 runouts, 10 shards of up to 100 boards
+TABLE = cards_from_str("2h9hTs")
+SHARD_SIZE = 100
+
+
+@pytest.fixture(autouse=True)
+def quiet():
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+class InterruptedEngine(SerialEngine):
+    """Serial engine that dies after finishing a given amount of tasks, and records how many tasks it was given."""
+    def __init__(self, task_limit=None):
+        self.task_limit = task_limit
+        self.task_amount = 0
+
+    def imap_unordered(self, func, context, items, max_in_flight=None):
+        for item in items:
+            if self.task_amount == self.task_limit:
+                raise RuntimeError("worker died")
+            self.task_amount += 1
+            yield func(context, item)
+
+
+def calc_checkpointed_counts(path, engine, table_cards=TABLE):
+    # A process plan with a given engine runs on that engine
+    return calc_counts(PLAYERS, table_cards, 1, [0], engine=engine, backend="process", checkpoint_path=path, stream_chunk_size=SHARD_SIZE)
+
+
+def test_interrupted_run_resumes_to_the_same_counts(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    with pytest.raises(RuntimeError, match="worker died"):
+        calc_checkpointed_counts(path, InterruptedEngine(task_limit=4))
+    with open(path) as file:
+        assert len(json.load(file)["state"]["done_shards"]) == 4
+
+    resumed_engine = InterruptedEngine()
+    counts = calc_checkpointed_counts(path, resumed_engine)
+    # Only the shards the first run didn't finish are counted again
+    assert resumed_engine.task_amount == 10 - 4
+    assert counts == calc_counts(PLAYERS, TABLE, 1, [0], backend="serial")
+
+
+def test_checkpoint_of_another_spot_is_rejected(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    calc_checkpointed_counts(path, InterruptedEngine())
+    with pytest.raises(ValueError, match="different job"):
+        calc_checkpointed_counts(path, InterruptedEngine(), table_cards=cards_from_str("2h9hTc"))
@@ -0,0 +1,71 @@
+import contextlib
+import io
+import json
+import socket
+import threading
+import pytest
+from modules.card import cards_from_str
+from modules.calculator import calc_counts
+from modules.distributed import Coordinator, calc_odds_distributed, run_worker
+from modules.utils import get_equities
+
+PLAYERS = [cards_from_str("AhKd"), cards_from_str("AsKc"), cards_from_str("QsQd")]
+# 903 runouts, split into 10 units of up to 100 boards
+TABLE = cards_from_str("2h9hTs")
+UNIT_SIZE = 100
+
+
+@pytest.fixture(autouse=True)
+def quiet():
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def get_exact_counts():
+    return calc_counts(PLAYERS, TABLE, 1, [0], backend="serial")
+
+
+def test_local_workers_match_calc_counts():
+    wins, ties, tie_shares, total = get_exact_counts()
+    _, _, player_wins, player_ties, equities = calc_odds_distributed(PLAYERS, TABLE, local_workers=3, unit_size=UNIT_SIZE)
+    assert (player_wins, player_ties) == (wins, ties)
+    assert equities == pytest.approx(get_equities(wins, tie_shares, total))
+
+
+@pytest.mark.parametrize("stuck_worker", ["hangs", "exits"])
+def test_units_of_a_stuck_worker_are_counted_once(stuck_worker):
+    coordinator = Coordinator(PLAYERS, TABLE, port=0, unit_size=UNIT_SIZE, unit_timeout=0.5)
+    listening = threading.Event()
+    results = []
+    coordinator_thread = threading.Thread(target=lambda: results.append(coordinator.run(lambda port: listening.set())))
+    coordinator_thread.start()
+    assert listening.wait(5)
+
+    # A worker that takes a unit and never answers, it either keeps the connection open or drops it
+    connection = socket.create_connection(("127.0.0.1", coordinator.port))
+    stream = connection.makefile("rwb")
+    stream.write(json.dumps({"type": "hello", "name": "stuck", "capacity": 1}).encode() + b"\n")
+    stream.flush()
+    assert json.loads(stream.readline())["type"] == "job"
+    stuck_unit = json.loads(stream.readline())["unit"]
+    if stuck_worker == "exits":
+        stream.close()
+        connection.close()
+
+    worker_thread = threading.Thread(target=run_worker, args=("127.0.0.1", coordinator.port), kwargs={"processes": 0, "name": "healthy"})
+    worker_thread.start()
+    worker_thread.join(30)
+    coordinator_thread.join(30)
+    if stuck_worker == "hangs":
+        stream.close()
+        connection.close()
+
+    assert not coordinator_thread.is_alive() and not worker_thread.is_alive()
+    assert stuck_unit in coordinator._done
+    if stuck_worker == "hangs":
+        # Only the timeout gets the unit to the healthy worker
+        assert coordinator.reassigned_units >= 1
+    wins, ties, tie_shares, total = get_exact_counts()
+    [(_, _, player_wins, player_ties, _)] = results
+    assert coordinator.board_amount == total
+    assert (player_wins, player_ties, coordinator.player_tie_shares) == (wins, ties, tie_shares)
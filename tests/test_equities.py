@@ -0,0 +1,72 @@
+import contextlib
+import io
+import pytest
+from modules.card import cards_from_str
+from modules.calculator import calc_counts, calc_next_card_breakdown, iter_odds
+from modules.monte_carlo import monte_carlo_odds
+from modules.random_opponents import random_opponents_odds
+from modules.batch_runner import Scenario, run_scenario
+from modules.utils import TIE_SHARE_UNIT, get_equities
+
+# Three way turn where the two ace-king hands often split the pot without the third player
+PLAYERS = [cards_from_str("AhKd"), cards_from_str("AsKc"), cards_from_str("QsQd")]
+TABLE = cards_from_str("2h9hTs3c")
+
+
+@pytest.fixture(autouse=True)
+def quiet():
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def get_exact_equities():
+    wins, _, tie_shares, total = calc_counts(PLAYERS, TABLE, 1, [0], backend="serial")
+    return get_equities(wins, tie_shares, total)
+
+
+def test_multiway_ties_are_partial():
+    _, ties, tie_shares, _ = calc_counts(PLAYERS, TABLE, 1, [0], backend="serial")
+    # Ties between the ace-king hands alone, the case where the tie share matters
+    assert ties[0] > ties[2]
+    # Those split the pot in half, the three way ties (the board plays, so the queens are in all of them) in thirds
+    assert tie_shares[0] == (ties[0] - ties[2]) * TIE_SHARE_UNIT // 2 + ties[2] * TIE_SHARE_UNIT // 3
+
+
+# Sharing every tie between all players gave about 96.8% and 91.2% in total here
+@pytest.mark.parametrize("player_strs, table_str", [
+    (["AhKd", "AsKc", "QsQd"], "2h9hTs3c"),
+    (["AhKd", "AsKc", "QsQd", "JcTc"], "2h9h3c"),
+])
+@pytest.mark.parametrize("calc_kwargs", [{}, {"sharded": True}, {"evaluator": "numpy"}])
+def test_exact_equities_sum_to_100(player_strs, table_str, calc_kwargs):
+    wins, _, tie_shares, total = calc_counts([cards_from_str(player) for player in player_strs], cards_from_str(table_str), 1, [0], backend="serial", **calc_kwargs)
+    assert sum(get_equities(wins, tie_shares, total)) == pytest.approx(100)
+
+
+def test_exact_modes_share_ties_the_same_way():
+    exact_equities = get_exact_equities()
+    snapshot = list(iter_odds(PLAYERS, TABLE, 1, backend="serial"))[-1]
+    breakdown = calc_next_card_breakdown(PLAYERS, TABLE, backend="serial")
+    batch_result = run_scenario(Scenario("spot", PLAYERS, TABLE), backend="serial")
+    assert snapshot.equities == pytest.approx(exact_equities)
+    assert breakdown.equities == pytest.approx(exact_equities)
+    assert batch_result["equities"] == pytest.approx(exact_equities)
+
+
+def test_monte_carlo_matches_exact_multiway():
+    exact_equities = get_exact_equities()
+    result = monte_carlo_odds(PLAYERS, TABLE, target_precision=None, max_samples=20_000, seed=1, backend="serial")
+    for equity, exact_equity, standard_error in zip(result.equities, exact_equities, result.standard_errors):
+        assert abs(equity - exact_equity) <= 4 * standard_error
+    assert sum(result.equities) == pytest.approx(100)
+
+
+def test_random_opponents_sampling_matches_exact_multiway():
+    player_cards, table_cards = cards_from_str("AhKd"), cards_from_str("2h9hTs3cJd")
+    exact = random_opponents_odds(player_cards, 2, table_cards, exact=True, evaluator="lookup", backend="serial")
+    sampled = random_opponents_odds(player_cards, 2, table_cards, exact=False, target_precision=None, max_samples=20_000, seed=1, backend="serial")
+    # Both tie sizes happen here: split with one opponent (half the pot) and with both (a third)
+    assert exact.tie_counts[0] > 0 and exact.tie_counts[1] > 0
+    assert abs(sampled.equity - exact.equity) <= 4 * sampled.standard_error
+    expected_shares = exact.wins + exact.tie_counts[0] / 2 + exact.tie_counts[1] / 3
+    assert exact.equity == pytest.approx(expected_shares / exact.deals * 100)
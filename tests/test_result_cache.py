@@ -0,0 +1,57 @@
+import contextlib
+import io
+import pytest
+from modules.card import cards_from_str
+from modules.calculator import calc_counts
+from modules.result_cache import ResultCache
+
+PLAYER_STRS = ["AhKd", "AsKc", "QsQd"]
+TABLE_STR = "2h9hTs"
+# Hearts <-> spades and diamonds <-> clubs
+SWAPPED_SUITS = str.maketrans("hsdc", "shcd")
+
+
+@pytest.fixture(autouse=True)
+def quiet():
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def calc_spot(player_strs, table_str, cache=None):
+    return calc_counts([cards_from_str(player) for player in player_strs], cards_from_str(table_str), 1, [0], backend="serial", cache=cache)
+
+
+def test_suit_permuted_spot_hits_the_same_entry():
+    cache = ResultCache()
+    calc_spot(PLAYER_STRS, TABLE_STR, cache)
+    permuted_player_strs = [player.translate(SWAPPED_SUITS) for player in PLAYER_STRS]
+    permuted_table_str = TABLE_STR.translate(SWAPPED_SUITS)
+    assert calc_spot(permuted_player_strs, permuted_table_str, cache) == calc_spot(permuted_player_strs, permuted_table_str)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_reordered_players_get_their_own_order():
+    cache = ResultCache()
+    calc_spot(PLAYER_STRS, TABLE_STR, cache)
+    reordered_player_strs = [PLAYER_STRS[2], PLAYER_STRS[0], PLAYER_STRS[1]]
+    wins, ties, tie_shares, total = calc_spot(reordered_player_strs, TABLE_STR, cache)
+    expected_wins, expected_ties, expected_tie_shares, expected_total = calc_spot(PLAYER_STRS, TABLE_STR)
+    assert cache.hits == 1
+    assert wins == [expected_wins[2], expected_wins[0], expected_wins[1]]
+    assert ties == [expected_ties[2], expected_ties[0], expected_ties[1]]
+    assert tie_shares == [expected_tie_shares[2], expected_tie_shares[0], expected_tie_shares[1]]
+    assert total == expected_total
+
+
+def test_sqlite_store_survives_reopening(tmp_path):
+    path = str(tmp_path / "results.sqlite")
+    cache = ResultCache(path=path)
+    counts = calc_spot(PLAYER_STRS, TABLE_STR, cache)
+    cache.close()
+
+    reopened_cache = ResultCache(path=path)
+    try:
+        assert reopened_cache.get([cards_from_str(player) for player in PLAYER_STRS], cards_from_str(TABLE_STR), 1, [0]) == counts
+        assert (reopened_cache.hits, reopened_cache.misses) == (1, 0)
+    finally:
+        reopened_cache.close()
@@ -0,0 +1,79 @@
+import asyncio
+import contextlib
+import io
+import json
+import time
+import pytest
+from modules import service as service_module
+from modules.engine import SerialEngine
+from modules.service import EquityService
+
+
+@pytest.fixture(autouse=True)
+def quiet():
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+async def send(port: int, request: bytes):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(request)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(payload), head
+
+
+def run_raw_requests(service: EquityService, requests):
+    async def main():
+        server = await asyncio.start_server(service.handle_connection, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            return await asyncio.gather(*(send(port, request) for request in requests))
+
+    try:
+        return asyncio.run(main())
+    finally:
+        service.close()
+
+
+def run_requests(service: EquityService, bodies):
+    requests = [f"POST /odds HTTP/1.1\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n{body}".encode() for body in bodies]
+    return [(status, response) for status, response, _ in run_raw_requests(service, requests)]
+
+
+def test_valid_request():
+    [(status, response)] = run_requests(EquityService(SerialEngine()), ['{"id": "a", "players": ["AhKh", "QsQd"], "board": "2h9hTs3c"}'])
+    assert status == 200
+    assert response["id"] == "a" and response["total"] == 44
+
+
+def test_malformed_requests_get_400():
+    responses = run_requests(EquityService(SerialEngine()), ['{"players": 5}', '{"players": ["AhKh", "QsQd"], "board": 7}', "not json"])
+    assert [status for status, _ in responses] == [400, 400, 400]
+    assert all("error" in response for _, response in responses)
+
+
+def test_failing_request_gets_500_for_every_waiter(monkeypatch):
+    def run_scenario(scenario, engine=None, backend=None):
+        # Slow enough for the second request to join the first one
+        time.sleep(0.2)
+        raise RuntimeError("worker failed")
+
+    monkeypatch.setattr(service_module, "run_scenario", run_scenario)
+    service = EquityService(SerialEngine())
+    body = '{"players": ["AhKh", "QsQd"], "board": "2h9hTs3c"}'
+    responses = run_requests(service, [body, body])
+    assert responses == [(500, {"error": "RuntimeError: worker failed"})] * 2
+    assert service.coalesced == 1
+
+
+@pytest.mark.parametrize("content_length", ["abc", "-5"])
+def test_invalid_content_length_gets_400_and_close(content_length):
+    # Keep-alive is asked for, the server still has to close since it can't find the end of the body
+    request = f"POST /odds HTTP/1.1\r\nContent-Length: {content_length}\r\n\r\n{{}}".encode()
+    [(status, response, head)] = run_raw_requests(EquityService(SerialEngine()), [request])
+    assert status == 400
+    assert "error" in response
+    assert b"Connection: close" in head